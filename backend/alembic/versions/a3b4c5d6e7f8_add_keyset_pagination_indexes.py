@@ -0,0 +1,28 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: a3b4c5d6e7f8
+Revises: f2a3b4c5d6e7
+Create Date: 2026-10-17
+
+(created_at, id) indexes so newest-first order and media lists page with an
+index range read at any depth (see app/pagination.py). Lists ordered by id
+use the primary key.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3b4c5d6e7f8'
+down_revision = 'f2a3b4c5d6e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'], unique=False)
+    op.create_index('ix_media_items_created_at_id', 'media_items', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_media_items_created_at_id', table_name='media_items')
+    op.drop_index('ix_orders_created_at_id', table_name='orders')
@@ -0,0 +1,24 @@
+"""add_inverter_configuration_to_sizing_results
+
+Revision ID: a7b8c9d0e1f2
+Revises: f7a8b9c0d1e2
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7b8c9d0e1f2'
+down_revision = 'f7a8b9c0d1e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sizing_results', sa.Column('inverter_configuration', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('sizing_results', 'inverter_configuration')
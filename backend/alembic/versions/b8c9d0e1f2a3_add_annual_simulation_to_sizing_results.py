@@ -0,0 +1,24 @@
+"""add_annual_simulation_to_sizing_results
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8c9d0e1f2a3'
+down_revision = 'a7b8c9d0e1f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sizing_results', sa.Column('annual_simulation', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('sizing_results', 'annual_simulation')
@@ -0,0 +1,48 @@
+"""add_payment_events
+
+Revision ID: d0e1f2a3b4c5
+Revises: c9d0e1f2a3b4
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd0e1f2a3b4c5'
+down_revision = 'c9d0e1f2a3b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'payment_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('provider', sa.String(), nullable=False, server_default='paystack'),
+        sa.Column('event_key', sa.String(), nullable=False),
+        sa.Column('event_type', sa.String(), nullable=False),
+        sa.Column('reference', sa.String(), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='received'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('received_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('event_key', name='uq_payment_events_event_key'),
+    )
+    op.create_index('ix_payment_events_id', 'payment_events', ['id'], unique=False)
+    op.create_index('ix_payment_events_reference', 'payment_events', ['reference'], unique=False)
+    # Worker scan: due events by status
+    op.create_index('ix_payment_events_status_next_attempt_at', 'payment_events', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payment_events_status_next_attempt_at', table_name='payment_events')
+    op.drop_index('ix_payment_events_reference', table_name='payment_events')
+    op.drop_index('ix_payment_events_id', table_name='payment_events')
+    op.drop_table('payment_events')
@@ -0,0 +1,51 @@
+"""add_product_search_indexes
+
+Revision ID: f2a3b4c5d6e7
+Revises: e1f2a3b4c5d6
+Create Date: 2026-10-17
+
+PostgreSQL only: generated full-text and trigram columns on products with GIN
+indexes (see app/services/product_search.py). Other databases search with
+the in-memory index and need no schema change.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a3b4c5d6e7'
+down_revision = 'e1f2a3b4c5d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Names/brands/models unstemmed (weight A), descriptions stemmed (B, C)
+    op.execute("""
+        ALTER TABLE products ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple',
+                coalesce(name, '') || ' ' || coalesce(brand, '') || ' ' || coalesce(model, '') || ' ' || coalesce(sku, '')
+            ), 'A') ||
+            setweight(to_tsvector('english', coalesce(category, '') || ' ' || coalesce(short_description, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'C')
+        ) STORED
+    """)
+    # Typo-tolerant matching on what customers type most: name, brand, model
+    op.execute("""
+        ALTER TABLE products ADD COLUMN search_text text GENERATED ALWAYS AS (
+            lower(coalesce(name, '') || ' ' || coalesce(brand, '') || ' ' || coalesce(model, ''))
+        ) STORED
+    """)
+    op.execute('CREATE INDEX ix_products_search_vector ON products USING gin (search_vector)')
+    op.execute('CREATE INDEX ix_products_search_text_trgm ON products USING gin (search_text gin_trgm_ops)')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('DROP INDEX IF EXISTS ix_products_search_text_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_products_search_vector')
+    op.execute('ALTER TABLE products DROP COLUMN IF EXISTS search_text')
+    op.execute('ALTER TABLE products DROP COLUMN IF EXISTS search_vector')
@@ -33,11 +33,56 @@ class Settings(BaseSettings):
     # Paystack (live keys only via env — never commit secrets)
     PAYSTACK_SECRET_KEY: Optional[str] = None
     PAYSTACK_PUBLIC_KEY: Optional[str] = None
+    PAYSTACK_BASE_URL: Optional[str] = None  # Default https://api.paystack.co (override for a local stub)
+    PAYSTACK_CONNECT_TIMEOUT_SEC: float = 3.0
+    PAYSTACK_READ_TIMEOUT_SEC: float = 10.0
+    PAYSTACK_POOL_SIZE: int = 10
+    PAYSTACK_BREAKER_FAILURES: int = 5
+    PAYSTACK_BREAKER_RESET_SEC: float = 30.0
+    PAYSTACK_VERIFY_CACHE_SEC: float = 300.0
+    PAYSTACK_VERIFY_PENDING_CACHE_SEC: float = 3.0
+
+    # Idempotency-Key support (POST /api/ecommerce/orders, /api/payments/paystack/initialize)
+    IDEMPOTENCY_KEY_TTL_HOURS: float = 24.0
+    IDEMPOTENCY_LOCK_SEC: float = 60.0  # An unfinished attempt blocks retries for this long
+
+    # List endpoints: above this many rows (PostgreSQL planner estimate) X-Total-Count is estimated
+    PAGINATION_EXACT_COUNT_LIMIT: int = 10000
 
     # E-commerce shipping (GHS). Subtotal >= threshold => free shipping.
     ECOMMERCE_SHIPPING_FLAT_GHS: float = 0.0
     ECOMMERCE_FREE_SHIPPING_THRESHOLD_GHS: Optional[float] = 5000.0
 
+    # Rendered PDF cache under the static root (least recently used evicted above this size)
+    PDF_CACHE_MAX_MB: int = 256
+
+    # PDF rendering process pool (0 workers = render in a thread)
+    PDF_RENDER_WORKERS: int = 2
+    PDF_RENDER_MAX_QUEUE: int = 16
+    PDF_RENDER_TIMEOUT_SEC: float = 60.0
+
+    # Bulk quote PDF export (POST /api/quotes/export)
+    QUOTE_EXPORT_MAX_QUOTES: int = 1000
+
+    # Email outbox dispatcher. EMAIL_TRANSPORT: "sendgrid" or "file" (writes .eml files
+    # to EMAIL_FILE_SINK_DIR, default ./email_sink, for offline testing)
+    EMAIL_TRANSPORT: str = "sendgrid"
+    EMAIL_FILE_SINK_DIR: Optional[str] = None
+    EMAIL_OUTBOX_DISPATCHER_ENABLED: bool = True
+    EMAIL_OUTBOX_POLL_SEC: float = 5.0
+    EMAIL_OUTBOX_BATCH_SIZE: int = 20
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 8
+    EMAIL_OUTBOX_BACKOFF_BASE_SEC: float = 30.0
+    EMAIL_OUTBOX_BACKOFF_MAX_SEC: float = 3600.0
+
+    # Paystack webhook events are stored on receipt and applied by a background worker
+    PAYMENT_EVENTS_WORKER_ENABLED: bool = True
+    PAYMENT_EVENTS_POLL_SEC: float = 2.0
+    PAYMENT_EVENTS_BATCH_SIZE: int = 50
+    PAYMENT_EVENTS_MAX_ATTEMPTS: int = 10
+    PAYMENT_EVENTS_BACKOFF_BASE_SEC: float = 5.0
+    PAYMENT_EVENTS_BACKOFF_MAX_SEC: float = 600.0
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
@@ -25,9 +26,22 @@ def get_db():
         db.close()
 
 
-
-
-
-
-
-
+def insert_ignore(db, model, values: dict, conflict_columns) -> bool:
+    """
+    INSERT one row unless it would violate the unique constraint on conflict_columns.
+    Returns True if a row was inserted. Uses ON CONFLICT DO NOTHING where supported.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(model).values(**values).on_conflict_do_nothing(index_elements=list(conflict_columns))
+        return db.execute(stmt).rowcount > 0
+    try:
+        with db.begin_nested():
+            db.add(model(**values))
+        return True
+    except IntegrityError:
+        return False
@@ -0,0 +1,64 @@
+"""
+HTTP validation helpers
+
+Strong ETags and ``If-None-Match`` handling for responses whose bytes are
+fully determined by a content hash: a client that already holds the current
+version gets ``304 Not Modified`` with no body.
+"""
+import hashlib
+from typing import Callable, Optional, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Previews and other per-user documents: browsers must revalidate every time
+PRIVATE_REVALIDATE = "private, no-cache"
+# Public catalog data: shared caches may reuse it briefly, then revalidate (cheap 304s)
+PUBLIC_SHORT_LIVED = "public, max-age=30, stale-while-revalidate=60"
+# Data that only changes on deploy (e.g. the appliance catalog)
+PUBLIC_LONG_LIVED = "public, max-age=3600, stale-while-revalidate=86400"
+
+
+def strong_etag(value: Union[str, bytes]) -> str:
+    """Quoted strong ETag: SHA-256 of the body bytes, or a given content key as-is."""
+    if isinstance(value, bytes):
+        value = hashlib.sha256(value).hexdigest()
+    return f'"{value}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if If-None-Match lists etag (or ``*``). Weak validators compare by opaque tag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def conditional_response(
+    request: Request,
+    body: Union[bytes, Callable[[], bytes]],
+    media_type: str,
+    etag: Optional[str] = None,
+    cache_control: str = PRIVATE_REVALIDATE,
+) -> Response:
+    """
+    200 with body, or 304 when the client's copy is current
+
+    ``body`` may be a callable so callers that know the ETag up front (from a
+    content key) skip producing the body on a 304. Without ``etag`` the ETag
+    is the hash of the body.
+    """
+    if etag is None:
+        body = body() if callable(body) else body
+        etag = strong_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    body = body() if callable(body) else body
+    return Response(content=body, media_type=media_type, headers=headers)
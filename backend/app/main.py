@@ -9,6 +9,7 @@ import logging
 from contextlib import asynccontextmanager
 from app.database import engine, Base
 from app.storage import get_static_root
+from app.pagination import PAGINATION_HEADERS
 # Import e-commerce models to register them
 from app import models_ecommerce
 from app.routers import auth, customers, projects, appliances, sizing, products, quotes, settings, reports, dashboard, users
@@ -62,10 +63,27 @@ def _run_init_and_seed():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Run migrations and seed on startup"""
+    """Run migrations and seed on startup; start and stop the PDF render workers, email outbox dispatcher and payment event worker"""
     _run_migrations()
     _run_init_and_seed()
+    from app.services.pdf_renderer import get_pdf_renderer
+    from app.services.email_outbox import get_outbox_dispatcher
+    from app.services.payment_events import get_payment_event_worker
+    from app.config import settings as app_settings
+    renderer = get_pdf_renderer()
+    renderer.start()
+    dispatcher = get_outbox_dispatcher()
+    if app_settings.EMAIL_OUTBOX_DISPATCHER_ENABLED:
+        dispatcher.start()
+    payment_worker = get_payment_event_worker()
+    if app_settings.PAYMENT_EVENTS_WORKER_ENABLED:
+        payment_worker.start()
     yield
+    await payment_worker.stop()
+    await dispatcher.stop()
+    renderer.shutdown()
+    from app.services.paystack_service import paystack_service
+    paystack_service.close()
 
 
 # Create database tables (fallback if migrations don't create them)
@@ -104,6 +122,7 @@ cors_kwargs = dict(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=PAGINATION_HEADERS,  # Cross-origin clients read the next cursor and total
 )
 if cors_origin_regex:
     cors_kwargs["allow_origin_regex"] = cors_origin_regex
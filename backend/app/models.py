@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum, JSON, Index
 from sqlalchemy.dialects.postgresql import ENUM
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -336,7 +336,9 @@ class SizingResult(Base):
     inverter_size_kw = Column(Float)  # Total inverter capacity (selected product size)
     inverter_count = Column(Integer, default=1)  # Number of parallel inverters
     inverter_unit_size_kw = Column(Float)  # Size of each inverter unit (selected product size)
+    inverter_configuration = Column(JSON)  # Unit sizes in kW, largest first (may mix sizes)
     battery_capacity_kwh = Column(Float)
+    annual_simulation = Column(JSON)  # Hourly (8760) simulation summary, see services/energy_simulation.py
     
     # Design factors used
     system_efficiency = Column(Float)  # e.g., 0.77
@@ -501,6 +503,10 @@ class MediaItem(Base):
     file_size = Column(Integer)  # Size in bytes
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_media_items_created_at_id", "created_at", "id"),  # Media library keyset pagination
+    )
+
 
 class NewsletterSubscriber(Base):
     __tablename__ = "newsletter_subscribers"
@@ -523,3 +529,32 @@ class ContactInquiry(Base):
     source = Column(String, default="website")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+
+
+class EmailOutbox(Base):
+    """Outgoing email, written in the same transaction as the change that triggers it.
+
+    Delivered by the background dispatcher (app/services/email_outbox.py).
+    status: pending -> sending -> sent, or failed after EMAIL_OUTBOX_MAX_ATTEMPTS.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String, unique=True, nullable=False)  # e.g. order-paid:42:customer
+    kind = Column(String, nullable=False)  # order_confirmation, admin_order_notification, quotation, ...
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_content = Column(Text, nullable=False)
+    text_content = Column(Text)
+    attachments = Column(JSON)  # [{"type": "quotation_pdf", "quote_id": 1, "document_type": "quotation", "filename": "..."}]
+    status = Column(String, default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_until = Column(DateTime(timezone=True))  # Claimed by a dispatcher until then
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
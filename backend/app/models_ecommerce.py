@@ -2,7 +2,7 @@
 E-commerce Models
 Additional models for e-commerce functionality
 """
-from sqlalchemy import Column, Integer, String, Float, Boolean, Text, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, ForeignKey, DateTime, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -51,6 +51,10 @@ class Order(Base):
     customer = relationship("Customer", foreign_keys=[customer_id])
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_orders_created_at_id", "created_at", "id"),  # Admin list keyset pagination
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -109,4 +113,53 @@ class Coupon(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
+class PaymentEvent(Base):
+    """Verified payment provider webhook, stored as received (one row per provider event).
+
+    The webhook only inserts; the payment event worker (app/services/payment_events.py)
+    applies rows in order. status: received -> processing -> processed / ignored / rejected,
+    or failed after PAYMENT_EVENTS_MAX_ATTEMPTS.
+    """
+    __tablename__ = "payment_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String, nullable=False, default="paystack")
+    event_key = Column(String, unique=True, nullable=False)  # e.g. paystack:charge.success:ORD-2026-0001
+    event_type = Column(String, nullable=False)  # charge.success, ...
+    reference = Column(String, index=True)  # Paystack reference (our order number)
+    payload = Column(Text, nullable=False)  # Raw verified request body
+    status = Column(String, default="received", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_until = Column(DateTime(timezone=True))  # Claimed by a worker until then
+    result = Column(Text)  # Outcome or last error
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_payment_events_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+
+class IdempotencyKey(Base):
+    """Client Idempotency-Key for a non-idempotent endpoint, with the response it produced.
+
+    See app/services/idempotency.py. status: in_progress -> completed. Rows past
+    expires_at are treated as absent and purged.
+    """
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String, nullable=False)  # Endpoint, e.g. ecommerce.orders.create
+    key = Column(String, nullable=False)  # Idempotency-Key header value
+    request_hash = Column(String, nullable=False)  # SHA-256 of the canonical request
+    status = Column(String, default="in_progress", nullable=False)
+    response_status = Column(Integer)
+    response_body = Column(Text)  # Serialized JSON response
+    locked_until = Column(DateTime(timezone=True))  # in_progress: another attempt may take over after this
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
 
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_idempotency_keys_scope_key"),
+    )
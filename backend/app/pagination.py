@@ -0,0 +1,154 @@
+"""
+Keyset (cursor) pagination
+
+``offset(skip)`` makes the database read and discard every skipped row, so
+page 500 of the order history costs 500 times page one. List endpoints
+instead order by a sort key plus ``id`` (a unique tiebreaker) and continue
+from the last row a client saw:
+
+    WHERE (created_at, id) < (:last_created_at, :last_id)
+    ORDER BY created_at DESC, id DESC LIMIT :limit
+
+With an index on the ordering every page is one index range read. The
+position is returned as an opaque ``X-Next-Cursor`` header (absent on the
+last page); pass it back as ``?cursor=``. Responses keep their list shape.
+
+The first page (no cursor) also reports ``X-Total-Count``. Counting a large
+filtered set is itself a full scan, so on PostgreSQL when the planner expects
+more than PAGINATION_EXACT_COUNT_LIMIT rows its estimate is returned instead,
+with ``X-Total-Count-Estimated: true``.
+
+``skip`` still works when no cursor is sent, for existing clients. Page
+size is 1 to MAX_PAGE_LIMIT rows.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from sqlalchemy import DateTime, and_, func, or_, text
+from sqlalchemy.orm import Query, Session
+
+from app.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_ESTIMATED_HEADER = "X-Total-Count-Estimated"
+PAGINATION_HEADERS = [NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_ESTIMATED_HEADER]
+MAX_PAGE_LIMIT = 500  # Largest page one request may read
+
+
+@dataclass(frozen=True, slots=True)
+class KeysetOrder:
+    """Ordering for a list endpoint: optional sort column, then the id tiebreaker"""
+    name: str  # Cursors are only valid for the ordering that produced them
+    id_column: Any
+    sort_column: Any = None  # None = order by id only
+    descending: bool = False
+
+    def order_by(self) -> list:
+        columns = [self.id_column] if self.sort_column is None else [self.sort_column, self.id_column]
+        if not self.descending:
+            return [c.asc().nulls_last() if c is self.sort_column else c.asc() for c in columns]
+        return [c.desc().nulls_last() if c is self.sort_column else c.desc() for c in columns]
+
+    def after(self, value: Any, last_id: int):
+        """Filter for rows strictly after the position (value, last_id) in this ordering"""
+        beyond = (lambda col, v: col < v) if self.descending else (lambda col, v: col > v)
+        id_after = beyond(self.id_column, last_id)
+        if self.sort_column is None:
+            return id_after
+        if value is None:
+            # NULL sort keys come last; only later ids among them remain
+            return and_(self.sort_column.is_(None), id_after)
+        return or_(
+            beyond(self.sort_column, value),
+            self.sort_column.is_(None),
+            and_(self.sort_column == value, id_after),
+        )
+
+    def _is_datetime(self) -> bool:
+        return self.sort_column is not None and isinstance(self.sort_column.type, DateTime)
+
+    def encode(self, value: Any, last_id: int) -> str:
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        raw = json.dumps([self.name, value, last_id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode(self, cursor: str) -> Tuple[Any, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            name, value, last_id = json.loads(raw)
+            if name != self.name or not isinstance(last_id, int):
+                raise ValueError(name)
+            if value is not None and self._is_datetime():
+                value = datetime.fromisoformat(value)
+        except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail="Invalid or expired cursor")
+        return value, last_id
+
+
+def count_rows(db: Session, query: Query, id_column) -> Tuple[int, bool]:
+    """
+    (row count, estimated) for query. Exact unless on PostgreSQL the planner
+    expects more than PAGINATION_EXACT_COUNT_LIMIT rows, then its estimate.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        estimate = _planner_estimate(db, query.with_entities(id_column).order_by(None))
+        if estimate is not None and estimate > settings.PAGINATION_EXACT_COUNT_LIMIT:
+            return estimate, True
+    return query.with_entities(func.count(id_column)).order_by(None).scalar() or 0, False
+
+
+def _planner_estimate(db: Session, query: Query) -> Optional[int]:
+    try:
+        sql = str(query.statement.compile(
+            dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+        ))
+    except Exception:
+        return None  # A value with no literal form; count exactly instead
+    # text() re-escapes % for the driver and would read ":name" in literals as binds
+    plan = db.execute(text("EXPLAIN (FORMAT JSON) " + sql.replace("%%", "%").replace(":", r"\:"))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def paginate(
+    db: Session,
+    query: Query,
+    response: Response,
+    order: KeysetOrder,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> List[Any]:
+    """
+    One page of query in order, continuing after cursor (or offset by skip
+    when there is none). Sets the pagination headers on response.
+    """
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+    if skip < 0:
+        raise HTTPException(status_code=400, detail="skip must not be negative")
+    if cursor:
+        query_page = query.filter(order.after(*order.decode(cursor)))
+    else:
+        total, estimated = count_rows(db, query, order.id_column)
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+        if estimated:
+            response.headers[TOTAL_ESTIMATED_HEADER] = "true"
+        query_page = query.offset(skip) if skip else query
+
+    rows = query_page.order_by(None).order_by(*order.order_by()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        sort_value = getattr(last, order.sort_column.key) if order.sort_column is not None else None
+        response.headers[NEXT_CURSOR_HEADER] = order.encode(sort_value, getattr(last, order.id_column.key))
+    return rows
@@ -1,5 +1,6 @@
+from io import BytesIO
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
@@ -7,8 +8,10 @@ from app.auth import get_current_active_user
 from app.models import User, Appliance, Project, ApplianceCategory
 from app.schemas import Appliance as ApplianceSchema, ApplianceCreate, ApplianceUpdate
 from app.services.load_calculator import calculate_appliance_daily_kwh
-from app.services.appliance_catalog import get_appliances_by_category, search_appliances
-from app.services.appliance_pdf_generator import generate_appliance_report_pdf
+from app.services.appliance_catalog import catalog_json, search_json
+from app.http_cache import conditional_response
+from app.services.appliance_pdf_generator import build_appliance_report_document
+from app.services.pdf_renderer import RenderQueueFull, RenderTimeout, render_pdf
 
 router = APIRouter(prefix="/appliances", tags=["appliances"])
 
@@ -245,22 +248,23 @@ async def get_appliance_categories(
 
 @router.get("/catalog/list")
 async def get_appliance_catalog(
+    request: Request,
     category: Optional[str] = Query(None, description="Filter by category"),
     search: Optional[str] = Query(None, description="Search appliances"),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get appliance catalog - predefined appliances with typical ratings"""
+    """Get appliance catalog - predefined appliances with typical ratings (pre-encoded, ETag)"""
     if search:
-        return search_appliances(search)
-    
-    if category:
+        body, etag = search_json(search.strip())
+    elif category:
         try:
             cat_enum = ApplianceCategory(category)
-            return get_appliances_by_category(cat_enum)
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid category: {category}")
-    
-    return get_appliances_by_category()
+        body, etag = catalog_json(cat_enum)
+    else:
+        body, etag = catalog_json()
+    return conditional_response(request, body, "application/json", etag=etag)
 
 
 @router.get("/project/{project_id}/pdf")
@@ -277,7 +281,7 @@ async def get_appliance_report_pdf(
             raise HTTPException(status_code=404, detail="Project not found")
         
         # Generate PDF
-        pdf_bytes = generate_appliance_report_pdf(db, project_id)
+        pdf_bytes = BytesIO(await render_pdf(build_appliance_report_document(db, project_id)))
         
         # Generate filename
         project_name_safe = project.name.replace(' ', '_').replace('/', '_')
@@ -290,9 +294,27 @@ async def get_appliance_report_pdf(
         )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
         logger.error(f"Error generating PDF for project {project_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
 
+
+@router.get("/project/{project_id}/preview")
+async def get_appliance_report_preview(
+    project_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """HTML preview of the appliance load analysis report (no PDF layout)"""
+    try:
+        document = build_appliance_report_document(db, project_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return conditional_response(request, document.standalone_html().encode("utf-8"), media_type="text/html; charset=utf-8")
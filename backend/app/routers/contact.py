@@ -17,6 +17,7 @@ from app.database import get_db
 from app.models import ContactInquiry, User
 from app.auth import require_role
 from app.services.email_service import email_service
+from app.services.email_outbox import enqueue_email
 from app.config import settings
 
 router = APIRouter(prefix="/api/contact", tags=["contact"])
@@ -100,13 +101,12 @@ async def submit_contact(
         source=src,
     )
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    db.flush()
 
+    # Admin notification goes out via the outbox, committed with the inquiry
     admin_email = os.getenv("ADMIN_EMAIL", settings.COMPANY_EMAIL)
     if admin_email:
-        email_service.send_contact_inquiry(
-            admin_email,
+        subject, html = email_service.compose_contact_inquiry(
             {
                 "name": row.name,
                 "email": row.email,
@@ -116,6 +116,9 @@ async def submit_contact(
                 "topic": data.topic or "",
             },
         )
+        enqueue_email(db, f"contact:{row.id}:admin", "contact_inquiry", admin_email, subject, html)
+
+    db.commit()
 
     return {"message": "Thank you for your message. We will contact you soon.", "status": "success"}
 
@@ -9,6 +9,7 @@ from app.database import get_db
 from app.models import User, UserRole
 from app.models_content import SiteSetting, CmsBlogPost, CmsFaqItem
 from app.auth import require_role
+from app.services.settings_cache import bump_settings_version
 
 router = APIRouter(prefix="/api/content", tags=["content"])
 
@@ -146,6 +147,7 @@ async def admin_put_setting(
         row = SiteSetting(key=key, value=body.value)
         db.add(row)
     db.commit()
+    bump_settings_version()
     return {"key": key, "value": body.value}
 
 
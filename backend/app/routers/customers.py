@@ -1,24 +1,28 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import get_current_active_user
 from app.models import User, Customer
 from app.schemas import Customer as CustomerSchema, CustomerCreate, CustomerUpdate
+from app.pagination import MAX_PAGE_LIMIT, KeysetOrder, paginate
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
+_LIST_ORDER = KeysetOrder("customers.id", Customer.id)
+
 
 @router.get("/", response_model=List[CustomerSchema])
 async def list_customers(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """List all customers"""
-    customers = db.query(Customer).offset(skip).limit(limit).all()
-    return customers
+    """List all customers (keyset paginated: pass X-Next-Cursor back as cursor)"""
+    return paginate(db, db.query(Customer), response, _LIST_ORDER, limit, cursor=cursor, skip=skip)
 
 
 @router.get("/{customer_id}", response_model=CustomerSchema)
@@ -2,10 +2,12 @@
 E-commerce API Routes
 Public-facing e-commerce endpoints and admin order management
 """
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+import json
+from typing import Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Request, Response, Query
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_, desc
+from pydantic import TypeAdapter
 from app.database import get_db
 from app.models import Product, ProductType, Customer, User
 from app.models_ecommerce import Order, OrderItem, CartItem, Coupon
@@ -15,16 +17,25 @@ from app.schemas_ecommerce import (
     CouponAdmin, CouponCreate, CouponUpdate,
 )
 from app.auth import get_current_active_user, get_current_user_optional, require_role
+from app.pagination import MAX_PAGE_LIMIT, PAGINATION_HEADERS, KeysetOrder, paginate
 from app.services.ecommerce_pricing import catalog_unit_price
 from app.services.ecommerce_shipping import compute_shipping_cost
 from app.services.coupon_order import compute_order_coupon_discount
 from app.services.stock import deduct_stock_on_order_paid
+from app.services.order_payment import queue_order_emails
+from app.services.idempotency import begin_idempotent_request
+from app.services.product_search import search_products
+from app.services.public_catalog_cache import cached_catalog_response
 from datetime import datetime, timezone
 import uuid
 
 # Category dropdown on shop may send product_type values (panel, inverter, …)
 _ECOM_CATEGORY_AS_PRODUCT_TYPE = {pt.value for pt in ProductType}
 
+_PUBLIC_PRODUCTS_ORDER = KeysetOrder("shop.products.id", Product.id)
+_PRODUCT_LIST = TypeAdapter(List[ProductPublic])
+_ADMIN_ORDERS_ORDER = KeysetOrder("orders.created_at.desc", Order.id, Order.created_at, descending=True)
+
 router = APIRouter(prefix="/api/ecommerce", tags=["ecommerce"])
 
 
@@ -40,16 +51,15 @@ async def shipping_estimate(subtotal: float = Query(..., ge=0)):
     }
 
 
-@router.get("/products", response_model=List[ProductPublic])
-async def get_public_products(
-    category: Optional[str] = None,
-    search: Optional[str] = None,
-    product_type: Optional[ProductType] = None,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
-):
-    """Get products for public website/e-commerce (no auth required)"""
+def _public_products_body(
+    db: Session,
+    category: Optional[str],
+    search: Optional[str],
+    product_type: Optional[ProductType],
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+) -> Tuple[bytes, Dict[str, str]]:
     query = db.query(Product).filter(
         Product.is_active == True,
         Product.base_price.isnot(None),  # Only return products with prices
@@ -69,51 +79,85 @@ async def get_public_products(
         query = query.filter(Product.product_type == product_type)
     
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Product.name.ilike(search_term),
-                Product.description.ilike(search_term),
-                Product.brand.ilike(search_term),
-                Product.model.ilike(search_term)
+        # Ranked, typo-tolerant search (full text + trigram on PostgreSQL, in-memory index otherwise).
+        # Ranks are not a stable sort key, so search results page with skip.
+        if cursor:
+            raise HTTPException(status_code=400, detail="cursor is not supported with search; use skip")
+        products = [
+            ProductPublic.model_validate(hit.product).model_copy(
+                update={"search_rank": round(hit.rank, 4), "search_snippet": hit.snippet}
             )
-        )
-    
-    products = query.offset(skip).limit(limit).all()
-    return products
+            for hit in search_products(db, query, search, skip=skip, limit=limit)
+        ]
+        return _PRODUCT_LIST.dump_json(products), {}
+
+    page = Response()
+    rows = paginate(db, query, page, _PUBLIC_PRODUCTS_ORDER, limit, cursor=cursor, skip=skip)
+    headers = {name: page.headers[name] for name in PAGINATION_HEADERS if name in page.headers}
+    return _PRODUCT_LIST.dump_json(_PRODUCT_LIST.validate_python(rows, from_attributes=True)), headers
+
+
+@router.get("/products", response_model=List[ProductPublic])
+async def get_public_products(
+    request: Request,
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    product_type: Optional[ProductType] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Get products for public website/e-commerce (no auth required). Keyset paginated unless searching.
+
+    Served from the versioned public catalog cache with a strong ETag.
+    """
+    search = search.strip() if search else None
+    key = ("products", category, search, product_type, skip, limit, cursor)
+    return cached_catalog_response(
+        request, key,
+        lambda: _public_products_body(db, category, search, product_type, skip, limit, cursor),
+    )
 
 
 @router.get("/products/{product_id}", response_model=ProductPublic)
 async def get_public_product(
     product_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
-    """Get single product details (no auth required)"""
-    product = db.query(Product).filter(
-        Product.id == product_id,
-        Product.is_active == True,
-        Product.base_price.isnot(None),
-        or_(
-            Product.price_type.is_(None),
-            Product.price_type != "percentage",
-        ),
-    ).first()
-    
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    return product
+    """Get single product details (no auth required). Cached like the product list."""
+    def build() -> Tuple[bytes, Dict[str, str]]:
+        product = db.query(Product).filter(
+            Product.id == product_id,
+            Product.is_active == True,
+            Product.base_price.isnot(None),
+            or_(
+                Product.price_type.is_(None),
+                Product.price_type != "percentage",
+            ),
+        ).first()
+        
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        return ProductPublic.model_validate(product).model_dump_json().encode("utf-8"), {}
+
+    return cached_catalog_response(request, ("product", product_id), build)
 
 
 @router.get("/categories")
-async def get_categories(db: Session = Depends(get_db)):
-    """Get all product categories"""
-    categories = db.query(Product.category).filter(
-        Product.is_active == True,
-        Product.category.isnot(None)
-    ).distinct().all()
-    
-    return [cat[0] for cat in categories if cat[0]]
+async def get_categories(request: Request, db: Session = Depends(get_db)):
+    """Get all product categories (cached per catalog version; the DISTINCT runs once per change)"""
+    def build() -> Tuple[bytes, Dict[str, str]]:
+        categories = db.query(Product.category).filter(
+            Product.is_active == True,
+            Product.category.isnot(None)
+        ).distinct().all()
+        
+        return json.dumps([cat[0] for cat in categories if cat[0]], separators=(",", ":")).encode("utf-8"), {}
+
+    return cached_catalog_response(request, ("categories",), build)
 
 
 @router.post("/cart/add", response_model=CartItemResponse)
@@ -322,12 +366,8 @@ async def update_cart_item(
     return {"message": "Cart item updated"}
 
 
-@router.post("/orders", response_model=OrderResponse)
-async def create_order(
-    order_data: OrderCreate,
-    db: Session = Depends(get_db)
-):
-    """Create a new order"""
+def _create_order(db: Session, order_data: OrderCreate) -> Order:
+    """Price and add the order, its items and its emails to the session (the caller commits)"""
     # Generate order number
     order_number = f"EP-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}"
 
@@ -401,55 +441,53 @@ async def create_order(
     if coupon_applied:
         coupon_applied.used_count = (coupon_applied.used_count or 0) + 1
 
-    db.commit()
-    db.refresh(order)
-    
-    # Send order confirmation email
-    from app.services.email_service import email_service
-    from app.config import settings
-    import os
-    
-    order_dict = {
-        "order_number": order.order_number,
-        "customer_name": order.customer_name or "Customer",
-        "customer_email": order.customer_email,
-        "subtotal": float(order.subtotal),
-        "shipping_cost": float(order.shipping_cost),
-        "total_amount": float(order.total_amount),
-        "items": [
-            {
-                "product_name": item.product_name,
-                "quantity": item.quantity,
-                "unit_price": float(item.unit_price),
-                "total_price": float(item.total_price),
-            }
-            for item in order.items
-        ]
-    }
-    
-    # Customer email: COD only here; Paystack sends after successful payment (webhook/verify)
-    if order.customer_email and pm != "paystack":
-        email_service.send_order_confirmation(order_dict, order.customer_email)
+    # Emails go out via the outbox, committed with the order.
+    # Customer email: COD only here; Paystack sends after successful payment (webhook/verify).
+    # Admin is notified for all new orders.
+    db.flush()
+    queue_order_emails(db, order, "created", notify_customer=(pm != "paystack"), notify_admin=True)
+    return order
 
-    # Notify admin for all new orders
-    admin_email = os.getenv("ADMIN_EMAIL", settings.COMPANY_EMAIL)
-    if admin_email:
-        email_service.send_admin_notification(order_dict, admin_email)
+
+@router.post("/orders", response_model=OrderResponse)
+async def create_order(
+    order_data: OrderCreate,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """Create a new order. Retries with the same Idempotency-Key return the original order."""
+    idem = begin_idempotent_request(db, "ecommerce.orders.create", idempotency_key, order_data.model_dump(mode="json"))
+    if idem and idem.replay:
+        return idem.replay
+    try:
+        order = _create_order(db, order_data)
+        if idem:
+            db.refresh(order)  # Server-side defaults (created_at) for the stored response
+            idem.complete(db, OrderResponse.model_validate(order).model_dump(mode="json"))
+        db.commit()
+    except Exception:
+        db.rollback()
+        if idem:
+            idem.release(db)
+        raise
+    db.refresh(order)
 
     return order
 
 
 @router.get("/orders", response_model=List[OrderResponse])
 async def list_orders_admin(
+    response: Response,
     status: Optional[str] = Query(None),
     payment_status: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
-    skip: int = 0,
-    limit: int = 50,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Admin: List all e-commerce orders (auth required)"""
+    """Admin: List all e-commerce orders, newest first, keyset paginated (auth required)"""
     query = db.query(Order)
     if status:
         query = query.filter(Order.status == status)
@@ -465,8 +503,7 @@ async def list_orders_admin(
                 Order.customer_phone.ilike(term)
             )
         )
-    orders = query.order_by(desc(Order.created_at)).offset(skip).limit(limit).all()
-    return orders
+    return paginate(db, query, response, _ADMIN_ORDERS_ORDER, limit, cursor=cursor, skip=skip)
 
 
 @router.patch("/orders/{order_number}", response_model=OrderDetailResponse)
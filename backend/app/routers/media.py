@@ -2,7 +2,7 @@ from pathlib import Path
 import uuid
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File, Form, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 
@@ -10,6 +10,7 @@ from app.database import get_db
 from app.auth import get_current_active_user, require_role
 from app.models import User, MediaItem
 from app.schemas_media import MediaItemResponse
+from app.pagination import MAX_PAGE_LIMIT, KeysetOrder, paginate
 from app.storage import get_static_root
 
 router = APIRouter(prefix="/media", tags=["media"])
@@ -17,17 +18,20 @@ router = APIRouter(prefix="/media", tags=["media"])
 MEDIA_DIR = get_static_root() / "media"
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".pdf"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+_LIST_ORDER = KeysetOrder("media.created_at.desc", MediaItem.id, MediaItem.created_at, descending=True)
 
 
 @router.get("/", response_model=List[MediaItemResponse])
 async def list_media(
+    response: Response,
     search: Optional[str] = None,
-    skip: int = 0,
-    limit: int = 50,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """List all media items with optional search and pagination."""
+    """List all media items, newest first, with optional search and keyset pagination."""
     query = db.query(MediaItem)
     if search:
         search_term = f"%{search}%"
@@ -38,8 +42,7 @@ async def list_media(
                 MediaItem.alt_text.ilike(search_term),
             )
         )
-    items = query.order_by(MediaItem.created_at.desc()).offset(skip).limit(limit).all()
-    return items
+    return paginate(db, query, response, _LIST_ORDER, limit, cursor=cursor, skip=skip)
 
 
 @router.post("/", response_model=MediaItemResponse, status_code=status.HTTP_201_CREATED)
@@ -2,17 +2,21 @@
 Payment API Routes
 Paystack payment integration endpoints
 """
+import asyncio
 import json
 import logging
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from sqlalchemy.orm import Session, joinedload
 
 from app.database import get_db
 from app.models_ecommerce import Order
 from app.schemas_ecommerce import PaystackVerifyResponse
-from app.services.paystack_service import paystack_service
+from app.services.idempotency import begin_idempotent_request
+from app.services.paystack_service import PaystackUnavailable, paystack_service
 from app.services.order_payment import finalize_order_paid_from_paystack, order_confirmation_public
+from app.services.payment_events import record_paystack_event
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +26,30 @@ router = APIRouter(prefix="/api/payments", tags=["payments"])
 @router.post("/paystack/initialize")
 async def initialize_paystack_payment(
     order_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
-    """Initialize Paystack payment for an order"""
+    """
+    Initialize Paystack payment for an order.
+    Retries with the same Idempotency-Key return the original authorization URL without calling Paystack.
+    """
+    idem = begin_idempotent_request(db, "payments.paystack.initialize", idempotency_key, {"order_id": order_id})
+    if idem and idem.replay:
+        return idem.replay
+    try:
+        result = await _initialize_paystack_payment(db, order_id)
+        if idem:
+            idem.complete(db, result)
+            db.commit()
+    except Exception:
+        db.rollback()
+        if idem:
+            idem.release(db)
+        raise
+    return result
+
+
+async def _initialize_paystack_payment(db: Session, order_id: int) -> dict:
     order = db.query(Order).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -40,7 +65,9 @@ async def initialize_paystack_payment(
     callback_url = f"{settings.FRONTEND_URL}/checkout/success?order={order.order_number}"
     
     try:
-        response = paystack_service.initialize_transaction(
+        # Blocking HTTP call: run it off the event loop
+        response = await asyncio.to_thread(
+            paystack_service.initialize_transaction,
             email=order.customer_email or "customer@example.com",
             amount=amount_kobo,
             reference=order.order_number,
@@ -60,6 +87,10 @@ async def initialize_paystack_payment(
             }
         else:
             raise HTTPException(status_code=400, detail="Failed to initialize payment")
+    except HTTPException:
+        raise
+    except PaystackUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -69,7 +100,7 @@ async def paystack_webhook(
     request: Request,
     db: Session = Depends(get_db)
 ):
-    """Handle Paystack webhook notifications"""
+    """Receive Paystack webhook notifications (stored, then applied in the background)"""
     # Get signature from header
     signature = request.headers.get("x-paystack-signature")
     if not signature:
@@ -82,25 +113,15 @@ async def paystack_webhook(
     if not paystack_service.verify_webhook_signature(body, signature):
         raise HTTPException(status_code=401, detail="Invalid signature")
     
-    # Parse payload
-    payload = json.loads(body.decode('utf-8'))
-    event = payload.get("event")
-    data = payload.get("data", {})
-    
-    if event == "charge.success":
-        reference = data.get("reference")
-        amount_kobo = data.get("amount")
-        order = db.query(Order).filter(Order.order_number == reference).first()
-
-        if order:
-            ok, err = finalize_order_paid_from_paystack(db, order, reference, amount_kobo)
-            if ok:
-                db.commit()
-                return {"status": "success", "message": "Payment confirmed"}
-            db.rollback()
-            logger.error("Paystack webhook: could not finalize order %s: %s", reference, err)
-            return {"status": "rejected", "message": err}
-    
+    try:
+        payload = json.loads(body.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    # Store and acknowledge; the payment event worker applies it (redeliveries are no-ops)
+    record_paystack_event(db, body, payload)
     return {"status": "received"}
 
 
@@ -132,7 +153,9 @@ async def verify_payment(
         )
 
     try:
-        response = paystack_service.verify_transaction(reference)
+        response = await asyncio.to_thread(paystack_service.verify_transaction, reference)
+    except PaystackUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
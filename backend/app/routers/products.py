@@ -1,30 +1,35 @@
-from typing import List
+from typing import List, Optional
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import get_current_active_user, require_role
 from app.models import User, Product, ProductType
 from app.schemas import Product as ProductSchema, ProductCreate, ProductUpdate
+from app.pagination import MAX_PAGE_LIMIT, KeysetOrder, paginate
+from app.services.product_catalog import bump_catalog_version
 from app.storage import get_static_root
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+_LIST_ORDER = KeysetOrder("products.id", Product.id)
+
 
 @router.get("/", response_model=List[ProductSchema])
 async def list_products(
+    response: Response,
     product_type: ProductType = None,
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """List all products (admin sees all including inactive; shop filters by is_active)"""
+    """List all products (admin sees all including inactive; shop filters by is_active). Keyset paginated."""
     query = db.query(Product)
     if product_type:
         query = query.filter(Product.product_type == product_type)
-    products = query.offset(skip).limit(limit).all()
-    return products
+    return paginate(db, query, response, _LIST_ORDER, limit, cursor=cursor, skip=skip)
 
 
 @router.post("/upload-image")
@@ -77,6 +82,7 @@ async def create_product(
     db_product = Product(**data)
     db.add(db_product)
     db.commit()
+    bump_catalog_version()
     db.refresh(db_product)
     return db_product
 
@@ -99,6 +105,7 @@ async def update_product(
     if "stock_quantity" in update_data and product.manage_stock:
         product.in_stock = product.stock_quantity > 0
     db.commit()
+    bump_catalog_version()
     db.refresh(product)
     return product
 
@@ -116,6 +123,7 @@ async def delete_product(
     
     product.is_active = False
     db.commit()
+    bump_catalog_version()
     return None
 
 
@@ -1,14 +1,17 @@
-from typing import List, Dict
-from fastapi import APIRouter, Depends, HTTPException, status
+from io import BytesIO
+from typing import List, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from app.database import get_db
 from app.auth import get_current_active_user
 from app.models import User, Project, Customer, ProjectStatusUpdate, ProjectStatus
 from app.schemas import Project as ProjectSchema, ProjectCreate, ProjectUpdate, ProjectStatusUpdateCreate
-from app.services.sizing_pdf_generator import generate_sizing_report_pdf
+from app.http_cache import conditional_response
+from app.pagination import MAX_PAGE_LIMIT, KeysetOrder, paginate
+from app.services.sizing_pdf_generator import build_sizing_report_document
+from app.services.pdf_renderer import RenderQueueFull, RenderTimeout, render_pdf
 from app.services.stock import (
-    check_stock_availability,
     deduct_stock_on_project_accept,
     restore_stock_on_project_reject,
 )
@@ -17,24 +20,27 @@ import uuid
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
+_LIST_ORDER = KeysetOrder("projects.id", Project.id)
+
 
 @router.get("/", response_model=List[ProjectSchema])
 async def list_projects(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_LIMIT),
     customer_id: int = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """List all projects"""
+    """List all projects (keyset paginated: pass X-Next-Cursor back as cursor)"""
     query = db.query(Project).options(
         joinedload(Project.customer),
         joinedload(Project.created_by_user)
     )
     if customer_id:
         query = query.filter(Project.customer_id == customer_id)
-    projects = query.offset(skip).limit(limit).all()
-    return projects
+    return paginate(db, query, response, _LIST_ORDER, limit, cursor=cursor, skip=skip)
 
 
 @router.get("/status-messages", response_model=Dict[str, List[str]])
@@ -142,16 +148,13 @@ async def update_project_status(
     old_status = project.status
     new_status = data.status
 
-    # Transition TO ACCEPTED: check stock and deduct
+    # Transition TO ACCEPTED: check stock and deduct (one atomic step; nothing deducted on failure)
     if new_status == ProjectStatus.ACCEPTED and old_status != ProjectStatus.ACCEPTED:
-        ok, errors = check_stock_availability(db, project_id)
+        ok, errors = deduct_stock_on_project_accept(db, project_id, current_user.id)
         if not ok:
+            db.rollback()
             msg = "Cannot accept project: insufficient stock. " + "; ".join(errors)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=msg)
-        success, deduct_errors = deduct_stock_on_project_accept(db, project_id, current_user.id)
-        if not success:
-            msg = "Stock deduction failed. " + "; ".join(deduct_errors)
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=msg)
 
     # Transition FROM ACCEPTED to REJECTED: restore stock
     if new_status == ProjectStatus.REJECTED and old_status == ProjectStatus.ACCEPTED:
@@ -200,7 +203,7 @@ async def get_sizing_report_pdf(
             raise HTTPException(status_code=404, detail="Project not found")
         
         # Generate PDF
-        pdf_bytes = generate_sizing_report_pdf(db, project_id)
+        pdf_bytes = BytesIO(await render_pdf(build_sizing_report_document(db, project_id)))
         
         # Generate filename
         project_name_safe = project.name.replace(' ', '_').replace('/', '_')
@@ -213,9 +216,27 @@ async def get_sizing_report_pdf(
         )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
         logger.error(f"Error generating sizing PDF for project {project_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
 
+
+@router.get("/{project_id}/sizing/preview")
+async def get_sizing_report_preview(
+    project_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """HTML preview of the system sizing report (no PDF layout)"""
+    try:
+        document = build_sizing_report_document(db, project_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return conditional_response(request, document.standalone_html().encode("utf-8"), media_type="text/html; charset=utf-8")
@@ -4,15 +4,17 @@ Public load calculator — same catalog and kWh math as PMS; no auth; rate-limit
 import time
 from collections import defaultdict
 from threading import Lock
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response
 from pydantic import BaseModel, Field, field_validator
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import ApplianceCategory
-from app.services.appliance_catalog import get_appliances_by_category, search_appliances
+from app.http_cache import PUBLIC_LONG_LIVED, conditional_response
+from app.services.appliance_catalog import catalog_json, search_json
 from app.services.load_calculator import preview_load_from_lines
 
 router = APIRouter(prefix="/api/public/load", tags=["public-load"])
@@ -111,17 +113,20 @@ async def public_load_catalog(
     request: Request,
     category: Optional[str] = Query(None),
     search: Optional[str] = Query(None, max_length=120),
-) -> Union[Dict[str, List[dict]], List[dict]]:
+) -> Response:
+    """Appliance catalog (grouped by category) or search results; pre-encoded JSON with a strong ETag"""
     _check_catalog_rate_limit(request)
     if search and search.strip():
-        return search_appliances(search.strip())
-    if category:
+        body, etag = search_json(search.strip())
+    elif category:
         try:
             cat_enum = ApplianceCategory(category)
-            return get_appliances_by_category(cat_enum)
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid category: {category}")
-    return get_appliances_by_category()
+        body, etag = catalog_json(cat_enum)
+    else:
+        body, etag = catalog_json()
+    return conditional_response(request, body, "application/json", etag=etag, cache_control=PUBLIC_LONG_LIVED)
 
 
 @router.post("/preview")
@@ -1,17 +1,24 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import get_current_active_user
-from app.models import User, Quote, QuoteItem, Project, Product, SizingResult as SizingResultModel, Customer
-from app.schemas import Quote as QuoteSchema, QuoteCreate, QuoteUpdate, QuoteItem as QuoteItemSchema, QuoteItemUpdate
+from app.models import User, Quote, QuoteItem, Project, Product, SizingResult as SizingResultModel, EmailOutbox
+from app.schemas import Quote as QuoteSchema, QuoteCreate, QuoteUpdate, QuoteItem as QuoteItemSchema, QuoteItemUpdate, QuoteExportRequest
 from app.services.pricing import generate_quote_items_from_sizing
-from app.services.pdf_generator import generate_quotation_pdf
-from app.services.email_service import send_quotation_email
+from app.http_cache import conditional_response, strong_etag
+from app.services.pdf_generator import get_quotation_pdf, quotation_pdf_cache_key, render_quotation_document
+from app.services.pdf_renderer import RenderQueueFull, RenderTimeout, render_pdf
+from app.services.email_service import compose_quotation_email
+from app.services.email_outbox import OUTBOX_PENDING, OUTBOX_SENDING, enqueue_email
+from app.services.proposal_pack import build_proposal_pack_document
+from app.services.quote_document import load_quote_document, load_quote_documents
+from app.services.quote_export import ExportTooLarge, get_progress, select_export_quote_ids, start_progress, stream_quote_export
 from app.services.quote_recalculator import recalculate_dependent_items
 from pydantic import BaseModel
 from datetime import datetime
+from io import BytesIO
 import uuid
 
 router = APIRouter(prefix="/quotes", tags=["quotes"])
@@ -37,6 +44,53 @@ async def list_quotes(
     return quotes
 
 
+@router.post("/export")
+async def export_quote_pdfs(
+    export: QuoteExportRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Download the PDFs of all matching quotes as a ZIP, streamed as each PDF is ready.
+    
+    Rendering runs in parallel in the PDF worker pool (cached PDFs are reused).
+    Progress: GET /quotes/export/{export_id}/progress, with the export_id sent in
+    the request or returned in the X-Export-Id header. A filter matching more than
+    QUOTE_EXPORT_MAX_QUOTES quotes is rejected with 400.
+    """
+    try:
+        quote_ids = select_export_quote_ids(db, export)
+    except ExportTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not quote_ids:
+        raise HTTPException(status_code=404, detail="No quotes match the export filter")
+    documents = load_quote_documents(db, quote_ids)
+    export_id = export.export_id or uuid.uuid4().hex
+    progress = start_progress(export_id, len(documents))
+    is_proforma = (export.document_type or "").strip().lower() == "proforma_invoice"
+    filename = f"{'proforma_invoices' if is_proforma else 'quotations'}_{datetime.utcnow():%Y%m%d_%H%M%S}.zip"
+    return StreamingResponse(
+        stream_quote_export(db, documents, export.document_type, progress),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Export-Id": export_id,
+            "X-Export-Total": str(len(documents)),
+        }
+    )
+
+
+@router.get("/export/{export_id}/progress")
+async def get_quote_export_progress(
+    export_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Progress of a running (or recently finished) bulk export"""
+    progress = get_progress(export_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return progress.as_dict()
+
+
 @router.get("/{quote_id}", response_model=QuoteSchema)
 async def get_quote(
     quote_id: int,
@@ -61,22 +115,28 @@ async def get_quote_pdf(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Generate and download quote PDF. Use document_type=proforma_invoice for Proforma Invoice (includes bank details)."""
+    """Generate and download quote PDF. Use document_type=proforma_invoice for Proforma Invoice (includes bank details).
+    
+    Served from the disk PDF cache when nothing the document depends on has changed.
+    """
     try:
-        quote = db.query(Quote).filter(Quote.id == quote_id).first()
-        if not quote:
-            raise HTTPException(status_code=404, detail=f"Quote {quote_id} not found")
-        pdf_bytes = generate_quotation_pdf(db, quote_id, document_type=document_type or "quotation")
+        document = load_quote_document(db, quote_id)
+        pdf_path = await get_quotation_pdf(db, quote_id, document_type=document_type or "quotation", document=document)
         is_proforma = (document_type or "").strip().lower() == "proforma_invoice"
-        filename = f"proforma_invoice_{quote.quote_number}.pdf" if is_proforma else f"quotation_{quote.quote_number}.pdf"
+        quote_number = document.quote.quote_number
+        filename = f"proforma_invoice_{quote_number}.pdf" if is_proforma else f"quotation_{quote_number}.pdf"
 
-        return StreamingResponse(
-            pdf_bytes,
+        return FileResponse(
+            pdf_path,
             media_type="application/pdf",
             headers={"Content-Disposition": f'attachment; filename="{filename}"'}
         )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -84,6 +144,79 @@ async def get_quote_pdf(
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
 
 
+@router.get("/{quote_id}/preview")
+async def get_quote_preview(
+    quote_id: int,
+    request: Request,
+    document_type: str = "quotation",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """HTML preview of the quote PDF (same template, stylesheet and logo inlined).
+    
+    The ETag is the PDF cache key, so an unchanged quote answers 304 without rendering.
+    """
+    try:
+        document = load_quote_document(db, quote_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return conditional_response(
+        request,
+        lambda: render_quotation_document(document, document_type).standalone_html().encode("utf-8"),
+        media_type="text/html; charset=utf-8",
+        etag=strong_etag(f"html-{quotation_pdf_cache_key(document, document_type)}"),
+    )
+
+
+@router.get("/{quote_id}/proposal-pack")
+async def get_proposal_pack_pdf(
+    quote_id: int,
+    document_type: str = "quotation",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Download the quotation, sizing report and appliance report as one bookmarked PDF.
+    
+    Reports are included when the project has a sizing result / appliances.
+    """
+    try:
+        document = load_quote_document(db, quote_id)
+        pack = build_proposal_pack_document(db, quote_id, document_type=document_type or "quotation", document=document)
+        pdf_bytes = BytesIO(await render_pdf(pack))
+        return StreamingResponse(
+            pdf_bytes,
+            media_type="application/pdf",
+            headers={"Content-Disposition": f'attachment; filename="proposal_{document.quote.quote_number}.pdf"'}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        import logging
+        logger = logging.getLogger(__name__)
+        logger.error(f"Error generating proposal pack for quote {quote_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
+
+
+@router.get("/{quote_id}/proposal-pack/preview")
+async def get_proposal_pack_preview(
+    quote_id: int,
+    request: Request,
+    document_type: str = "quotation",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """HTML preview of the proposal pack"""
+    try:
+        pack = build_proposal_pack_document(db, quote_id, document_type=document_type or "quotation")
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return conditional_response(request, pack.standalone_html().encode("utf-8"), media_type="text/html; charset=utf-8")
+
+
 @router.post("/{quote_id}/send-email")
 async def send_quote_email(
     quote_id: int,
@@ -91,34 +224,50 @@ async def send_quote_email(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Send quote PDF via email"""
-    quote = db.query(Quote).filter(Quote.id == quote_id).first()
-    if not quote:
-        raise HTTPException(status_code=404, detail="Quote not found")
-    
-    project = db.query(Project).filter(Project.id == quote.project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    customer = db.query(Customer).filter(Customer.id == project.customer_id).first()
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
+    """Queue the quote PDF for email delivery (see services/email_outbox.py)
     
-    # Generate PDF
-    pdf_bytes = generate_quotation_pdf(db, quote_id)
-    
-    # Send email
-    success = send_quotation_email(quote, customer, pdf_bytes, recipient_email)
+    The PDF is rendered (or taken from the cache) by the outbox dispatcher, not
+    in this request; a draft quote becomes "sent" when the email is delivered.
+    While an email of this quote to the same recipient is still queued, sending
+    again returns that one instead of queueing a duplicate.
+    """
+    try:
+        document = load_quote_document(db, quote_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    quote = document.quote
+    recipient = recipient_email or document.customer.email
+    if not recipient:
+        raise HTTPException(status_code=400, detail="No recipient email address provided")
+    
+    key_prefix = f"quote-email:{quote_id}:{recipient.lower()}:"
+    queued = db.query(EmailOutbox).filter(
+        EmailOutbox.idempotency_key.startswith(key_prefix, autoescape=True),
+        EmailOutbox.status.in_((OUTBOX_PENDING, OUTBOX_SENDING)),
+    ).first()
+    if queued:
+        return {"message": "Email already queued", "outbox_id": queued.id}
+    
+    subject, html = compose_quotation_email(document)
+    row = enqueue_email(
+        db,
+        key_prefix + uuid.uuid4().hex,
+        "quotation",
+        recipient,
+        subject,
+        html,
+        attachments=[{
+            "type": "quotation_pdf",
+            "quote_id": quote_id,
+            "document_type": "quotation",
+            "filename": f"quotation_{quote.quote_number or quote.id}.pdf",
+        }],
+    )
     
-    if success:
-        # Update quote tracking
-        quote.emailed_at = datetime.utcnow()
-        quote.emailed_by = current_user.id
-        quote.status = "sent"
-        db.commit()
-        return {"message": "Email sent successfully"}
-    else:
-        raise HTTPException(status_code=500, detail="Failed to send email. Check SMTP configuration.")
+    # The dispatcher marks the quote sent (and sets emailed_at) once delivered
+    quote.emailed_by = current_user.id
+    db.commit()
+    return {"message": "Email queued for delivery", "outbox_id": row.id}
 
 
 @router.post("/", response_model=QuoteSchema, status_code=status.HTTP_201_CREATED)
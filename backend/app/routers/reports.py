@@ -1,5 +1,5 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
@@ -9,8 +9,10 @@ from app.database import get_db
 from app.auth import get_current_active_user
 from app.models import User, Quote, Project, Customer, QuoteStatus, SizingResult
 from app.models_ecommerce import Order
-from app.services.report_pdf_generator import generate_report_pdf
-from io import StringIO
+from app.http_cache import conditional_response
+from app.services.report_pdf_generator import build_report_document
+from app.services.pdf_renderer import RenderQueueFull, RenderTimeout, render_pdf
+from io import BytesIO, StringIO
 import csv
 
 router = APIRouter(prefix="/reports", tags=["reports"])
@@ -351,15 +353,8 @@ async def export_projects_csv(
     )
 
 
-@router.get("/pdf")
-async def get_report_pdf(
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """Generate and download analytics report as PDF"""
-    # Parse dates (same logic as get_analytics)
+def _report_period(start_date: Optional[str], end_date: Optional[str]):
+    """Parse the report date range (same logic as get_analytics)"""
     if start_date:
         start = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
     else:
@@ -369,11 +364,40 @@ async def get_report_pdf(
         end = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
     else:
         end = datetime.utcnow()
+    return start, end
+
+
+@router.get("/preview")
+async def get_report_preview(
+    request: Request,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """HTML preview of the analytics report (no PDF layout)"""
+    analytics = _compute_analytics(db, *_report_period(start_date, end_date))
+    document = build_report_document(db, analytics)
+    return conditional_response(request, document.standalone_html().encode("utf-8"), media_type="text/html; charset=utf-8")
 
-    analytics = _compute_analytics(db, start, end)
 
-    # Generate PDF
-    pdf_bytes = generate_report_pdf(db, analytics)
+@router.get("/pdf")
+async def get_report_pdf(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Generate and download analytics report as PDF"""
+    analytics = _compute_analytics(db, *_report_period(start_date, end_date))
+
+    # Generate PDF (layout runs in the render pool)
+    try:
+        pdf_bytes = BytesIO(await render_pdf(build_report_document(db, analytics)))
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     
     # Generate filename
     start_str = start_date[:10] if start_date else "all"
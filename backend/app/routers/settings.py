@@ -7,6 +7,8 @@ from app.database import get_db
 from app.auth import get_current_active_user, require_role
 from app.models import User, Setting, PeakSunHours
 from app.schemas import Setting as SettingSchema, SettingCreate, PeakSunHours as PeakSunHoursSchema, PeakSunHoursCreate, PeakSunHoursUpdate
+from app.services.location_resolver import bump_location_index_version
+from app.services.settings_cache import bump_settings_version
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
@@ -53,6 +55,7 @@ async def create_setting(
     db_setting = Setting(**setting_data.dict(), updated_by=current_user.id)
     db.add(db_setting)
     db.commit()
+    bump_settings_version()
     db.refresh(db_setting)
     return db_setting
 
@@ -76,6 +79,7 @@ async def update_setting(
     setting.updated_by = current_user.id
     
     db.commit()
+    bump_settings_version()
     db.refresh(setting)
     return setting
 
@@ -110,6 +114,7 @@ async def create_peak_sun_hours(
     db_psd = PeakSunHours(**data.dict())
     db.add(db_psd)
     db.commit()
+    bump_location_index_version()
     db.refresh(db_psd)
     return db_psd
 
@@ -131,6 +136,7 @@ async def update_peak_sun_hours(
         setattr(psh, field, value)
     
     db.commit()
+    bump_location_index_version()
     db.refresh(psh)
     return psh
 
@@ -159,6 +165,7 @@ async def update_peak_sun_hours_by_location(
         setattr(psh, field, value)
     
     db.commit()
+    bump_location_index_version()
     db.refresh(psh)
     return psh
 
@@ -199,6 +206,8 @@ async def upload_logo(
         with open(logo_jpg_path, "wb") as buffer:
             buffer.write(contents)
     
+    # Documents locate the logo once per settings version; look it up again
+    bump_settings_version()
     return {"message": "Logo uploaded successfully", "path": f"/static/logo{file_ext}"}
 
 
@@ -1,15 +1,35 @@
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import get_current_active_user
 from app.models import User, Project, SizingResult as SizingResultModel
-from app.schemas import SizingInput, SizingResult, SizingFromAppliancesInput
-from app.services.sizing import calculate_sizing
+from app.schemas import (
+    SizingInput, SizingResult, SizingFromAppliancesInput, SizingBatchInput, SizingSweepInput, OutageAutonomyInput
+)
+from app.services.sizing import calculate_sizing, get_sizing_factors
+from app.services.energy_simulation import SimulationParams, simulate_sizing
+from app.services.outage_autonomy import OutageDistribution, run_outage_analysis
+from app.services.settings_cache import get_settings_snapshot
+from app.services.batch_sizing import calculate_sizing_batch
+from app.services.scenario_sweep import MAX_SWEEP_CELLS, run_sizing_sweep, sweep_cell_count
 from app.services.load_calculator import calculate_total_daily_kwh, calculate_from_monthly_consumption
 
 router = APIRouter(prefix="/sizing", tags=["sizing"])
 
 
+def _attach_annual_simulation(db: Session, sizing_result: SizingResult, system_type=None, factors=None) -> SizingResult:
+    """Run the hourly (8760) simulation for a sizing result about to be saved"""
+    factors = factors or get_sizing_factors(db)
+    sizing_result.annual_simulation = simulate_sizing(
+        sizing_result,
+        SimulationParams.from_factors(factors),
+        system_type=system_type,
+        default_peak_sun_hours=factors.default_peak_sun_hours,
+    )
+    return sizing_result
+
+
 @router.post("/calculate", response_model=SizingResult, status_code=status.HTTP_201_CREATED)
 async def calculate_system_sizing(
     sizing_input: SizingInput,
@@ -24,6 +44,7 @@ async def calculate_system_sizing(
     
     # Calculate sizing
     sizing_result = calculate_sizing(db, sizing_input)
+    _attach_annual_simulation(db, sizing_result, project.system_type)
     
     # Save to database
     # Convert Pydantic model to dict, excluding id and created_at (will be set by DB)
@@ -55,6 +76,91 @@ async def calculate_system_sizing(
         return db_sizing
 
 
+@router.post("/batch", response_model=List[SizingResult])
+def calculate_system_sizing_batch(
+    batch: SizingBatchInput,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Calculate PV system sizing for many inputs in one vectorized pass
+    
+    Results are returned in input order. With persist=true each result replaces
+    the project's stored sizing result (same as /calculate).
+    
+    Plain def: FastAPI runs it in the threadpool, so the per-result hourly
+    simulations and DB writes don't block the event loop.
+    """
+    project_ids = {item.project_id for item in batch.inputs}
+    found = {row.id for row in db.query(Project.id).filter(Project.id.in_(project_ids)).all()}
+    missing = sorted(project_ids - found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Project(s) not found: {missing}")
+    
+    results = calculate_sizing_batch(db, batch.inputs)
+    if not batch.persist:
+        return results
+    
+    # Simulate each saved result, then upsert one SizingResult per project
+    # (last input wins for duplicate project IDs)
+    factors = get_sizing_factors(db)
+    system_types = dict(db.query(Project.id, Project.system_type).filter(Project.id.in_(project_ids)).all())
+    for result in results:
+        _attach_annual_simulation(db, result, system_types.get(result.project_id), factors)
+    existing = {
+        row.project_id: row
+        for row in db.query(SizingResultModel).filter(SizingResultModel.project_id.in_(project_ids)).all()
+    }
+    saved = []
+    for result in results:
+        sizing_dict = result.model_dump(exclude={'id', 'created_at'})
+        row = existing.get(result.project_id)
+        if row:
+            for field, value in sizing_dict.items():
+                setattr(row, field, value)
+        else:
+            row = SizingResultModel(**sizing_dict)
+            db.add(row)
+            existing[result.project_id] = row
+        saved.append(row)
+    db.commit()
+    for row in {id(r): r for r in saved}.values():
+        db.refresh(row)
+    return saved
+
+
+@router.post("/sweep")
+async def sweep_system_sizing(
+    sweep: SizingSweepInput,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Evaluate a sizing sensitivity grid (not persisted)
+    
+    Returns axis values, grid shape and one flat row-major list per metric
+    (system kW, panels, inverter config, battery kWh, indicative price).
+    """
+    axes = {
+        name: sweep.axis(name)
+        for name in ("backup_hours", "panel_brand", "essential_load_percent", "peak_sun_hours", "design_factor")
+    }
+    if sweep_cell_count(*axes.values()) > MAX_SWEEP_CELLS:
+        raise HTTPException(status_code=400, detail=f"Sweep grid exceeds {MAX_SWEEP_CELLS} cells")
+    if any(v <= 0 for v in axes["peak_sun_hours"] + axes["design_factor"]):
+        raise HTTPException(status_code=400, detail="peak_sun_hours and design_factor must be positive")
+    
+    return run_sizing_sweep(
+        db,
+        total_daily_kwh=sweep.total_daily_kwh,
+        backup_hours=axes["backup_hours"],
+        panel_brands=axes["panel_brand"],
+        essential_load_percent=axes["essential_load_percent"],
+        peak_sun_hours=axes["peak_sun_hours"],
+        design_factor=axes["design_factor"],
+        system_type=sweep.system_type,
+        location=sweep.location,
+    )
+
+
 @router.get("/project/{project_id}", response_model=SizingResult)
 async def get_sizing_result(
     project_id: int,
@@ -72,6 +178,57 @@ async def get_sizing_result(
     return sizing_result
 
 
+@router.post("/project/{project_id}/outage-autonomy")
+def analyze_outage_autonomy(
+    project_id: int,
+    options: OutageAutonomyInput,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Monte Carlo grid-outage analysis for the project's battery (not persisted)
+    
+    Draws random outage schedules and reports the probability that the battery
+    rides through on the essential load, plus the smallest capacity that meets
+    target_percentile of outages.
+    
+    Plain def: FastAPI runs it in the threadpool, so the NumPy simulation
+    (seconds at the largest trials/outage lengths) doesn't block the event loop.
+    """
+    sizing = db.query(SizingResultModel).filter(SizingResultModel.project_id == project_id).first()
+    if not sizing:
+        raise HTTPException(status_code=404, detail="Sizing result not found")
+    
+    factors = get_sizing_factors(db)
+    try:
+        distribution = OutageDistribution.from_settings(
+            get_settings_snapshot(db),
+            kind=options.distribution,
+            median_hours=options.median_outage_hours,
+            sigma=options.duration_sigma,
+            max_hours=options.max_outage_hours,
+            start_hour_weights=options.start_hour_weights,
+            initial_soc_min=options.initial_soc_min,
+            initial_soc_max=options.initial_soc_max,
+        )
+        essential_percent = options.essential_load_percent or sizing.essential_load_percent or 0.5
+        pv_kw = (sizing.number_of_panels or 0) * (sizing.panel_wattage or 0) / 1000 if options.include_pv else 0.0
+        return run_outage_analysis(
+            essential_daily_kwh=sizing.total_daily_kwh * essential_percent,
+            pv_kw=pv_kw,
+            peak_sun_hours=sizing.peak_sun_hours or factors.default_peak_sun_hours,
+            battery_kwh=options.battery_capacity_kwh or sizing.battery_capacity_kwh,
+            params=SimulationParams.from_factors(factors),
+            distribution=distribution,
+            trials=options.trials,
+            target_percentile=options.target_percentile,
+            seed=options.seed,
+            min_battery_kwh=factors.min_battery_size_kwh,
+            candidate_capacities=options.candidate_capacities_kwh,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/from-appliances/{project_id}", response_model=SizingResult, status_code=status.HTTP_201_CREATED)
 async def calculate_from_appliances(
     project_id: int,
@@ -112,6 +269,7 @@ async def calculate_from_appliances(
     
     # Calculate sizing
     sizing_result = calculate_sizing(db, sizing_input)
+    _attach_annual_simulation(db, sizing_result, project.system_type)
     
     # Save to database
     # Convert Pydantic model to dict, excluding id and created_at (will be set by DB)
@@ -182,6 +340,7 @@ async def calculate_from_monthly(
     
     # Calculate sizing
     sizing_result = calculate_sizing(db, sizing_input)
+    _attach_annual_simulation(db, sizing_result, project.system_type)
     
     # Save to database
     # Convert Pydantic model to dict, excluding id and created_at (will be set by DB)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, field_validator, model_validator
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import Any, Dict, Optional, List, Union
 from datetime import datetime
 from app.models import (
     UserRole, CustomerType, SystemType, ProjectStatus, ApplianceType,
@@ -211,6 +211,49 @@ class SizingInput(BaseModel):
     system_type: Optional[SystemType] = None  # For determining battery requirements
 
 
+class SizingBatchInput(BaseModel):
+    inputs: List[SizingInput] = Field(..., min_length=1, max_length=5000)
+    persist: bool = False  # Save each result as the project's SizingResult
+
+
+MAX_SWEEP_AXIS_POINTS = 1000  # Longest range one sweep axis may expand to
+
+
+class SweepAxisRange(BaseModel):
+    """Inclusive numeric range for a sweep axis, e.g. 4.5 to 5.5 step 0.25"""
+    start: float
+    stop: float
+    step: float = Field(..., gt=0)
+
+    @model_validator(mode="after")
+    def check_point_count(self):
+        if self.point_count() > MAX_SWEEP_AXIS_POINTS:
+            raise ValueError(f"Sweep axis range expands to more than {MAX_SWEEP_AXIS_POINTS} points")
+        return self
+
+    def point_count(self) -> int:
+        return int(round((self.stop - self.start) / self.step)) + 1 if self.stop >= self.start else 0
+
+    def expand(self) -> List[float]:
+        return [round(self.start + i * self.step, 6) for i in range(self.point_count())]
+
+
+class SizingSweepInput(BaseModel):
+    total_daily_kwh: float = Field(..., gt=0)
+    system_type: Optional[SystemType] = None
+    location: Optional[str] = None  # Used for peak sun hours when that axis is empty
+    # Each numeric axis takes a list of values or a {start, stop, step} range; empty = default
+    backup_hours: Union[List[float], SweepAxisRange] = []
+    panel_brand: List[str] = ["Jinko"]
+    essential_load_percent: Union[List[float], SweepAxisRange] = []
+    peak_sun_hours: Union[List[float], SweepAxisRange] = []
+    design_factor: Union[List[float], SweepAxisRange] = []
+
+    def axis(self, name: str) -> list:
+        value = getattr(self, name)
+        return value.expand() if isinstance(value, SweepAxisRange) else list(value)
+
+
 class SizingFromAppliancesInput(BaseModel):
     location: Optional[str] = None
     panel_brand: str = "Jinko"
@@ -218,6 +261,24 @@ class SizingFromAppliancesInput(BaseModel):
     essential_load_percent: Optional[float] = None
 
 
+class OutageAutonomyInput(BaseModel):
+    """Monte Carlo outage analysis options; unset distribution fields come from the outage_* settings"""
+    battery_capacity_kwh: Optional[float] = Field(None, gt=0)  # Defaults to the stored sizing result
+    essential_load_percent: Optional[float] = Field(None, gt=0, le=1)
+    distribution: Optional[str] = None  # lognormal, exponential or uniform
+    median_outage_hours: Optional[float] = Field(None, gt=0)
+    duration_sigma: Optional[float] = Field(None, ge=0)
+    max_outage_hours: Optional[float] = Field(None, gt=0, le=168)
+    start_hour_weights: Optional[List[float]] = Field(None, min_length=24, max_length=24)
+    initial_soc_min: Optional[float] = Field(None, ge=0, le=1)
+    initial_soc_max: Optional[float] = Field(None, ge=0, le=1)
+    include_pv: bool = True
+    trials: int = Field(10000, ge=100, le=50000)
+    target_percentile: float = Field(0.95, gt=0, le=1)
+    seed: Optional[int] = None
+    candidate_capacities_kwh: List[float] = Field(default_factory=list, max_length=20)
+
+
 class SizingResult(BaseModel):
     id: Optional[int] = None
     project_id: int
@@ -236,7 +297,9 @@ class SizingResult(BaseModel):
     inverter_size_kw: Optional[float] = None  # Total inverter capacity (selected product size)
     inverter_count: Optional[int] = None  # Number of parallel inverters
     inverter_unit_size_kw: Optional[float] = None  # Size of each inverter unit (selected product size)
+    inverter_configuration: Optional[List[float]] = None  # Unit sizes in kW, largest first (may mix sizes)
     battery_capacity_kwh: Optional[float] = None
+    annual_simulation: Optional[Dict[str, Any]] = None  # Hourly simulation summary (set when saved)
     system_efficiency: Optional[float] = None
     dc_ac_ratio: Optional[float] = None
     design_factor: Optional[float] = None
@@ -385,6 +448,16 @@ class Quote(QuoteBase):
         from_attributes = True
 
 
+class QuoteExportRequest(BaseModel):
+    """Bulk PDF export filter: quotes created in [start_date, end_date] with the status and/or IDs given"""
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None  # A date without time covers the whole day
+    status: Optional[QuoteStatus] = None
+    quote_ids: Optional[List[int]] = Field(None, max_length=5000)
+    document_type: str = "quotation"  # or proforma_invoice
+    export_id: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{8,64}$")  # Client-chosen ID for progress polling
+
+
 # Settings Schemas
 class SettingBase(BaseModel):
     key: str
@@ -32,6 +32,9 @@ class ProductPublic(BaseModel):
     in_stock: bool = True
     # Same formula as PMS quotes for one catalog unit (panel / inverter / battery)
     catalog_unit_price: float = 0.0
+    # Set only on search results: relevance and an escaped description excerpt with <mark> highlights
+    search_rank: Optional[float] = None
+    search_snippet: Optional[str] = None
 
     @model_validator(mode="after")
     def set_catalog_unit_price(self):
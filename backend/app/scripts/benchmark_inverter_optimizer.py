@@ -0,0 +1,65 @@
+"""
+Benchmark for the mixed-size parallel inverter optimizer (no database needed)
+Usage: python -m app.scripts.benchmark_inverter_optimizer
+
+For catalogs of 10 to 100 inverter SKUs it reports:
+- table build time (once per catalog / settings version)
+- cold solve time (new required_kw, tables already built)
+- memoized solve time (repeat of an earlier required_kw)
+"""
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.services import inverter_optimizer
+from app.services.inverter_optimizer import optimize_inverter_mix
+
+
+def _catalog(sku_count: int, rng: random.Random):
+    """Synthetic inverter sizes (3-100 kW in 0.5 kW steps) with per-kW prices around 1,000"""
+    sizes = sorted(rng.sample([x / 2 for x in range(6, 201)], sku_count))
+    costs = [round(s * rng.uniform(800, 1200), 2) for s in sizes]
+    return sizes, costs
+
+
+def _time_us(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def run_benchmark(max_parallel: int = 4, solves: int = 500) -> bool:
+    rng = random.Random(42)
+    print(f"{'SKUs':>5} {'build ms':>9} {'cold solve us':>14} {'memo solve us':>14}")
+    all_sub_ms = True
+    for sku_count in (10, 25, 50, 100):
+        sizes, costs = _catalog(sku_count, rng)
+        inverter_optimizer._mix_tables.cache_clear()
+        inverter_optimizer._solve.cache_clear()
+
+        start = time.perf_counter()
+        optimize_inverter_mix(35.0, sizes, max_parallel, 30.0, costs)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        required = [rng.uniform(31, 90 * max_parallel) for _ in range(solves)]
+        it = iter(required)
+        cold = _time_us(lambda: optimize_inverter_mix(next(it), sizes, max_parallel, 30.0, costs), solves)
+        memo = _time_us(lambda: optimize_inverter_mix(required[0], sizes, max_parallel, 30.0, costs), solves)
+
+        print(f"{sku_count:>5} {build_ms:>9.2f} {cold:>14.1f} {memo:>14.1f}")
+        all_sub_ms = all_sub_ms and cold < 1000
+    print("Cold solves sub-millisecond:", "yes" if all_sub_ms else "NO")
+    return all_sub_ms
+
+
+if __name__ == "__main__":
+    success = run_benchmark()
+    sys.exit(0 if success else 1)
@@ -10,13 +10,29 @@ Power consumption values are based on real-world research from multiple sources
 
 Values represent typical/average power consumption and may vary by model, size, and usage patterns.
 Typical ranges are provided to account for variations across different models and brands.
+
+The catalog is static, so it is compiled once at import (see CompiledApplianceCatalog):
+each template's JSON is encoded once, every category response (and the full
+catalog) is held as JSON bytes with a strong ETag, and search goes through an
+inverted index of word prefixes and word suffixes. The catalog endpoints do no per-request work
+beyond a lookup.
 """
-from typing import Dict, List, Optional
+import json
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from app.http_cache import strong_etag
 from app.models import ApplianceCategory, ApplianceType, PowerUnit
 
 
 class ApplianceTemplate:
     """Template for a predefined appliance"""
+    __slots__ = (
+        "category", "appliance_type", "name", "description", "power_value", "power_unit",
+        "default_hours", "default_quantity", "is_essential", "typical_range",
+    )
+
     def __init__(
         self,
         category: ApplianceCategory,
@@ -605,35 +621,136 @@ APPLIANCE_CATALOG: Dict[ApplianceCategory, List[ApplianceTemplate]] = {
 }
 
 
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SEARCH_CACHE_SIZE = 1024
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _json_bytes(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class _PrefixIndex:
+    """Sorted keys with postings; a lookup unions the postings of every key starting with a prefix"""
+    __slots__ = ("keys", "postings")
+
+    def __init__(self, postings: Dict[str, set]):
+        self.keys: Tuple[str, ...] = tuple(sorted(postings))
+        self.postings: Tuple[FrozenSet[int], ...] = tuple(frozenset(postings[k]) for k in self.keys)
+
+    def lookup(self, prefix: str) -> FrozenSet[int]:
+        matches: set = set()
+        idx = bisect_left(self.keys, prefix)
+        while idx < len(self.keys) and self.keys[idx].startswith(prefix):
+            matches |= self.postings[idx]
+            idx += 1
+        return frozenset(matches)
+
+
+def _intersect(index: _PrefixIndex, words: List[str]) -> FrozenSet[int]:
+    result = index.lookup(words[0])
+    for word in words[1:]:
+        if not result:
+            break
+        result &= index.lookup(word)
+    return result
+
+
+class CompiledApplianceCatalog:
+    """Read-only indexes and pre-encoded JSON over APPLIANCE_CATALOG, built once."""
+    __slots__ = ("templates", "dicts", "fragments", "bodies", "_by_type", "_words", "_suffixes")
+
+    def __init__(self, catalog: Dict[ApplianceCategory, List[ApplianceTemplate]]):
+        self.templates: Tuple[ApplianceTemplate, ...] = tuple(t for templates in catalog.values() for t in templates)
+        self.dicts: Tuple[dict, ...] = tuple(t.to_dict() for t in self.templates)
+        self.fragments: Tuple[bytes, ...] = tuple(_json_bytes(d) for d in self.dicts)
+        self._by_type: Dict[Tuple[ApplianceCategory, ApplianceType], ApplianceTemplate] = {}
+        for t in self.templates:
+            self._by_type.setdefault((t.category, t.appliance_type), t)
+
+        # Response bodies: None -> whole catalog, else {category: [...]} for one category
+        by_category: Dict[ApplianceCategory, List[bytes]] = {cat: [] for cat in catalog}
+        for t, fragment in zip(self.templates, self.fragments):
+            by_category[t.category].append(fragment)
+        self.bodies: Dict[Optional[ApplianceCategory], Tuple[bytes, str]] = {}
+        for cat in ApplianceCategory:
+            body = b"{" + _json_bytes(cat.value) + b":[" + b",".join(by_category.get(cat, [])) + b"]}"
+            self.bodies[cat] = (body, strong_etag(body))
+        full = b"{" + b",".join(
+            _json_bytes(cat.value) + b":[" + b",".join(fragments) + b"]"
+            for cat, fragments in by_category.items()
+        ) + b"}"
+        self.bodies[None] = (full, strong_etag(full))
+
+        # Inverted indexes over name + description words -> template positions. A prefix
+        # lookup in the word index matches word starts ("bu" -> bulb); in the suffix
+        # index it matches anywhere inside a word ("wash" -> dishwasher)
+        words: Dict[str, set] = {}
+        suffixes: Dict[str, set] = {}
+        for i, t in enumerate(self.templates):
+            for word in _words(f"{t.name} {t.description}"):
+                words.setdefault(word, set()).add(i)
+                for start in range(len(word)):
+                    suffixes.setdefault(word[start:], set()).add(i)
+        self._words = _PrefixIndex(words)
+        self._suffixes = _PrefixIndex(suffixes)
+
+    def template(self, category: ApplianceCategory, appliance_type: ApplianceType) -> Optional[ApplianceTemplate]:
+        return self._by_type.get((category, appliance_type))
+
+    def search(self, query: str) -> List[int]:
+        """
+        Positions of templates where every query word occurs in a word of the
+        name or description. Templates where every query word starts a word
+        ("led bu" -> LED Bulb) come first, then the rest ("tv" -> CCTV
+        Camera), each in catalog order. Finds everything the plain substring
+        match of the whole query finds.
+        """
+        words = sorted(set(_words(query)), key=len, reverse=True)  # Longest (most selective) first
+        if not words:
+            return []
+        anywhere = _intersect(self._suffixes, words)
+        if not anywhere:
+            return []
+        starts = _intersect(self._words, words) & anywhere
+        return sorted(starts) + sorted(anywhere - starts)
+
+
+_COMPILED = CompiledApplianceCatalog(APPLIANCE_CATALOG)
+
+
+def catalog_json(category: Optional[ApplianceCategory] = None) -> Tuple[bytes, str]:
+    """(JSON body, strong ETag) of get_appliances_by_category(category), pre-encoded"""
+    return _COMPILED.bodies[category]
+
+
+@lru_cache(maxsize=_SEARCH_CACHE_SIZE)
+def search_json(query: str) -> Tuple[bytes, str]:
+    """(JSON body, strong ETag) of search_appliances(query), encoded once per query"""
+    body = b"[" + b",".join(_COMPILED.fragments[i] for i in _COMPILED.search(query)) + b"]"
+    return body, strong_etag(body)
+
+
 def get_appliances_by_category(category: Optional[ApplianceCategory] = None) -> Dict[str, List[dict]]:
     """Get appliances grouped by category"""
     if category:
         return {
-            category.value: [t.to_dict() for t in APPLIANCE_CATALOG.get(category, [])]
+            category.value: [dict(d) for t, d in zip(_COMPILED.templates, _COMPILED.dicts) if t.category == category]
         }
-    return {
-        cat.value: [t.to_dict() for t in templates]
-        for cat, templates in APPLIANCE_CATALOG.items()
-    }
+    grouped: Dict[str, List[dict]] = {cat.value: [] for cat in APPLIANCE_CATALOG}
+    for t, d in zip(_COMPILED.templates, _COMPILED.dicts):
+        grouped[t.category.value].append(dict(d))
+    return grouped
 
 
 def get_appliance_template(category: ApplianceCategory, appliance_type: ApplianceType) -> Optional[ApplianceTemplate]:
     """Get a specific appliance template"""
-    templates = APPLIANCE_CATALOG.get(category, [])
-    for template in templates:
-        if template.appliance_type == appliance_type:
-            return template
-    return None
+    return _COMPILED.template(category, appliance_type)
 
 
 def search_appliances(query: str) -> List[dict]:
-    """Search appliances by name or description"""
-    results = []
-    query_lower = query.lower()
-    for templates in APPLIANCE_CATALOG.values():
-        for template in templates:
-            if (query_lower in template.name.lower() or 
-                query_lower in template.description.lower()):
-                results.append(template.to_dict())
-    return results
-
+    """Search appliances by name or description (word prefixes; see CompiledApplianceCatalog.search)"""
+    return [dict(_COMPILED.dicts[i]) for i in _COMPILED.search(query)]
@@ -2,14 +2,12 @@
 PDF Generation Service for Appliance Load Analysis
 """
 from io import BytesIO
-from pathlib import Path
-import base64
-from jinja2 import Template, Environment
-from weasyprint import HTML
 from datetime import datetime
 from sqlalchemy.orm import Session
-from app.models import Project, Appliance, Setting
-from app.config import settings
+from app.models import Project, Appliance
+from app.services.document_rendering import RenderedDocument, company_logo_data_uri, register_template, write_pdf
+from app.services.quote_document import CompanyProfile
+from app.services.settings_cache import get_settings_snapshot
 
 
 APPLIANCE_REPORT_TEMPLATE = """
@@ -371,14 +369,46 @@ APPLIANCE_REPORT_TEMPLATE = """
 """
 
 
-def generate_appliance_report_pdf(
+APPLIANCE_REPORT = register_template("appliance_report", APPLIANCE_REPORT_TEMPLATE, presentational_hints=True)
+
+
+def render_appliance_report(project, customer, appliances, company: CompanyProfile) -> RenderedDocument:
+    """Render the appliance load analysis report from loaded rows (no database access)"""
+    # Calculate totals
+    total_daily_kwh = sum(app.daily_kwh or 0 for app in appliances)
+    essential_appliances = [app for app in appliances if app.is_essential]
+    essential_count = len(essential_appliances)
+    essential_kwh = sum(app.daily_kwh or 0 for app in essential_appliances)
+    non_essential_count = len(appliances) - essential_count
+    non_essential_kwh = total_daily_kwh - essential_kwh
+    
+    return APPLIANCE_REPORT.render(
+        company_name=company.name,
+        company_address=company.address,
+        company_phone=company.phone,
+        company_email=company.email,
+        project=project,
+        customer=customer,
+        appliances=appliances,
+        total_daily_kwh=total_daily_kwh,
+        essential_count=essential_count,
+        essential_kwh=essential_kwh,
+        non_essential_count=non_essential_count,
+        non_essential_kwh=non_essential_kwh,
+        generated_date=datetime.now().strftime('%B %d, %Y at %I:%M %p'),
+        # Logo data URI (located and encoded once per logo file version)
+        logo_data_uri=company_logo_data_uri(company.logo_url)
+    )
+
+
+def build_appliance_report_document(
     db: Session,
     project_id: int
-) -> BytesIO:
+) -> RenderedDocument:
     """
-    Generate a PDF report for appliance load analysis
+    Render the appliance load analysis report (body HTML + stylesheet)
     
-    Returns a BytesIO object containing the PDF
+    Needs the database session; layout happens separately (see pdf_renderer.py)
     """
     # Fetch project with customer
     from sqlalchemy.orm import joinedload
@@ -396,118 +426,19 @@ def generate_appliance_report_pdf(
     if not appliances:
         raise ValueError(f"No appliances found for project {project_id}")
     
-    # Calculate totals
-    total_daily_kwh = sum(app.daily_kwh or 0 for app in appliances)
-    essential_appliances = [app for app in appliances if app.is_essential]
-    essential_count = len(essential_appliances)
-    essential_kwh = sum(app.daily_kwh or 0 for app in essential_appliances)
-    non_essential_count = len(appliances) - essential_count
-    non_essential_kwh = total_daily_kwh - essential_kwh
-    
-    # Fetch company settings
-    company_name_setting = db.query(Setting).filter(Setting.key == "company_name").first()
-    company_address_setting = db.query(Setting).filter(Setting.key == "company_address").first()
-    company_phone_setting = db.query(Setting).filter(Setting.key == "company_phone").first()
-    company_email_setting = db.query(Setting).filter(Setting.key == "company_email").first()
-    company_logo_url_setting = db.query(Setting).filter(Setting.key == "company_logo_url").first()
-    
-    # Get company details (prefer database settings, fallback to config)
-    company_name = company_name_setting.value if company_name_setting else settings.COMPANY_NAME
-    company_address = company_address_setting.value if company_address_setting else settings.COMPANY_ADDRESS
-    company_phone = company_phone_setting.value if company_phone_setting else settings.COMPANY_PHONE
-    company_email = company_email_setting.value if company_email_setting else settings.COMPANY_EMAIL
-    
-    # Find and encode logo for PDF
-    logo_data_uri = None
-    logo_path = None
-    
-    # First, try to get logo from settings
-    if company_logo_url_setting and company_logo_url_setting.value:
-        logo_url = company_logo_url_setting.value
-        # Remove leading slash if present
-        if logo_url.startswith('/'):
-            logo_url = logo_url[1:]
-        
-        # Try static directory first
-        static_logo = Path("static") / logo_url.split('/')[-1]
-        if static_logo.exists():
-            logo_path = static_logo
-        else:
-            # Try the full path from settings
-            full_path = Path(logo_url)
-            if full_path.exists():
-                logo_path = full_path
-    
-    # If no logo from settings, try default locations
-    if not logo_path:
-        static_dir = Path("static")
-        if static_dir.exists():
-            for logo_file in ["logo.jpg", "logo.png", "logo.jpeg"]:
-                logo_file_path = static_dir / logo_file
-                if logo_file_path.exists():
-                    logo_path = logo_file_path
-                    break
-    
-    # If still no logo, try frontend public directory (mounted in container)
-    if not logo_path:
-        # Try multiple possible paths
-        possible_paths = [
-            Path("frontend_public/logo.jpg"),  # Mounted volume
-            Path("static/logo.jpg"),  # Backend static directory
-            Path("../frontend/public/logo.jpg"),  # Relative path (if not in container)
-            Path("logo.jpg"),  # Current directory
-        ]
-        for possible_path in possible_paths:
-            if possible_path.exists():
-                logo_path = possible_path
-                break
-    
-    # Convert logo to base64 data URI for WeasyPrint
-    if logo_path and logo_path.exists():
-        try:
-            with open(logo_path, 'rb') as f:
-                logo_data = f.read()
-                # Determine MIME type from extension
-                ext = logo_path.suffix.lower()
-                mime_type = {
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.png': 'image/png',
-                    '.gif': 'image/gif'
-                }.get(ext, 'image/jpeg')
-                logo_base64 = base64.b64encode(logo_data).decode('utf-8')
-                logo_data_uri = f"data:{mime_type};base64,{logo_base64}"
-        except Exception as e:
-            print(f"Error reading logo file: {e}")
-            logo_data_uri = None
-    
-    generated_date = datetime.now().strftime('%B %d, %Y at %I:%M %p')
-    
-    # Render template
-    env = Environment()
-    
-    template = env.from_string(APPLIANCE_REPORT_TEMPLATE)
-    html_content = template.render(
-        company_name=company_name,
-        company_address=company_address,
-        company_phone=company_phone,
-        company_email=company_email,
-        project=project,
-        customer=customer,
-        appliances=appliances,
-        total_daily_kwh=total_daily_kwh,
-        essential_count=essential_count,
-        essential_kwh=essential_kwh,
-        non_essential_count=non_essential_count,
-        non_essential_kwh=non_essential_kwh,
-        generated_date=generated_date,
-        logo_data_uri=logo_data_uri
-    )
-    
-    # Generate PDF
-    pdf_bytes = BytesIO()
-    HTML(string=html_content).write_pdf(pdf_bytes, presentational_hints=True)
-    pdf_bytes.seek(0)
+    company = CompanyProfile.from_settings(get_settings_snapshot(db))
+    return render_appliance_report(project, customer, appliances, company)
+
+
+def generate_appliance_report_pdf(
+    db: Session,
+    project_id: int
+) -> BytesIO:
+    """
+    Generate a PDF report for appliance load analysis
     
-    return pdf_bytes
+    Returns a BytesIO object containing the PDF
+    """
+    document = build_appliance_report_document(db, project_id)
+    return BytesIO(write_pdf(document.html, document.css, presentational_hints=document.presentational_hints))
 
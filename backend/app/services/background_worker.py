@@ -0,0 +1,96 @@
+"""
+Background Workers
+
+In-process polling loop shared by the table-backed queues (email outbox,
+payment events). A worker runs as an asyncio task started from the app
+lifespan: it drains batches until a short batch comes back, then sleeps for
+``poll_sec`` or until ``wake()`` is called, typically right after the commit
+that queued new work.
+"""
+import asyncio
+import logging
+import random
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay_sec(attempts: int, base_sec: float, max_sec: float) -> float:
+    """Exponential backoff with +/-20% jitter"""
+    delay = base_sec * (2 ** max(attempts - 1, 0))
+    return min(delay, max_sec) * random.uniform(0.8, 1.2)
+
+
+class PollingWorker(ABC):
+    """Subclasses implement ``run_batch`` (returns how many rows it claimed) and ``batch_size``."""
+
+    name = "worker"
+
+    def __init__(self, poll_sec: float):
+        self.poll_sec = poll_sec
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    @abstractmethod
+    def batch_size(self) -> int:
+        """Rows claimed per batch; a shorter batch means the queue is drained."""
+
+    @abstractmethod
+    async def run_batch(self) -> int:
+        """Process one batch and return how many rows it claimed."""
+
+    def on_start(self) -> None:
+        """Hook run in the event loop before the first batch."""
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self.on_start()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def wake(self) -> None:
+        """Thread-safe: start the next batch now instead of after the poll interval."""
+        if self._loop is not None and self._wake is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def wake_after_commit(self, db: Session) -> None:
+        if self._task is not None:
+            event.listen(db, "after_commit", lambda session: self.wake(), once=True)
+
+    async def _run(self) -> None:
+        logger.info("%s started", self.name)
+        while True:
+            try:
+                # Keep going while full batches come back
+                while await self.run_batch() >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # Database down etc.: try again next round
+                logger.error("%s batch failed: %s", self.name, e, exc_info=True)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
@@ -0,0 +1,230 @@
+"""
+Batch PV System Sizing
+
+Vectorized version of ``calculate_sizing`` for hundreds or thousands of
+inputs at once. Settings and inverter sizes come from a single
+``SizingFactors`` snapshot, peak sun hours are resolved once per distinct
+location, and every formula step runs as a NumPy array operation.
+
+Results match ``calculate_sizing`` row for row (same rounding, same inverter
+selection rules) and are returned as ``SizingResult`` schemas.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.schemas import SizingInput, SizingResult
+from app.services.sizing import (
+    SizingFactors,
+    get_panel_wattage,
+    get_peak_sun_hours,
+    get_sizing_factors,
+    resolve_backup_hours,
+    select_inverter_configuration,
+)
+
+
+def _fallback_inverter_size(required_kw: np.ndarray) -> np.ndarray:
+    """Calculated single size when no catalog size fits: max(6.5, ceil(kW * 2) / 2)."""
+    return np.maximum(6.5, np.ceil(required_kw * 2) / 2)
+
+
+def parallel_inverters_vectorized(
+    required_kw: np.ndarray,
+    available_sizes: Sequence[float],
+    max_parallel: int = 4,
+    use_parallel: bool = True,
+    prefer_parallel_above_kw: float = 30.0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Array form of ``calculate_parallel_inverters``
+
+    Returns (count, unit_size_kw, total_capacity_kw) arrays, one entry per required_kw.
+    Selection rules are identical to the scalar version:
+    1. Below prefer_parallel_above_kw: smallest single size >= required_kw
+    2. Otherwise N identical units (N <= max_parallel) with the least excess capacity,
+       ties broken by fewer units
+    3. Otherwise a calculated single size
+    """
+    required_kw = np.asarray(required_kw, dtype=float)
+    n = required_kw.shape[0]
+    count = np.ones(n, dtype=np.int64)
+    unit = _fallback_inverter_size(required_kw)
+    if not len(available_sizes):
+        return count, unit, unit.copy()
+
+    sizes = np.asarray(sorted(available_sizes), dtype=float)
+    resolved = np.zeros(n, dtype=bool)
+
+    # PRIORITY 1: single inverter for systems that don't prefer parallel
+    prefer_parallel = (required_kw > prefer_parallel_above_kw) & use_parallel
+    idx = np.searchsorted(sizes, required_kw, side="left")
+    single_ok = ~prefer_parallel & (idx < sizes.shape[0])
+    unit[single_ok] = sizes[idx[single_ok]]
+    resolved |= single_ok
+
+    if not use_parallel:
+        return count, unit, unit.copy()
+
+    # PRIORITY 2: N identical units, least waste then fewest units
+    todo = np.flatnonzero(~resolved)
+    if todo.size:
+        req = required_kw[todo][:, None]
+        counts = np.ceil(req / sizes[None, :])
+        waste = counts * sizes[None, :] - req
+        waste[counts > max_parallel] = np.inf
+        best_waste = waste.min(axis=1)
+        feasible = np.isfinite(best_waste)
+        tied_counts = np.where(waste == best_waste[:, None], counts, np.inf)
+        best = np.argmin(tied_counts, axis=1)
+        rows = todo[feasible]
+        count[rows] = counts[feasible, best[feasible]].astype(np.int64)
+        unit[rows] = sizes[best[feasible]]
+
+    return count, unit, count * unit
+
+
+class BatchSizing:
+    """Column arrays for a batch of sizing inputs (one entry per input)."""
+
+    __slots__ = (
+        "effective_daily_kwh",
+        "system_size_kw",
+        "number_of_panels",
+        "roof_area_m2",
+        "min_inverter_kw",
+        "inverter_count",
+        "inverter_unit_size_kw",
+        "inverter_size_kw",
+        "inverter_configuration",
+        "dc_ac_ratio",
+        "battery_capacity_kwh",
+    )
+
+
+def size_arrays(
+    factors: SizingFactors,
+    total_daily_kwh: np.ndarray,
+    peak_sun_hours: np.ndarray,
+    panel_wattage: np.ndarray,
+    backup_hours: np.ndarray,
+    essential_load_percent: np.ndarray,
+    design_factor: Optional[np.ndarray] = None,
+) -> BatchSizing:
+    """
+    Core sizing formulas over equally shaped arrays
+
+    backup_hours must already be resolved (0 = no battery). battery_capacity_kwh
+    is NaN where no battery is needed. design_factor defaults to the settings value.
+    """
+    if design_factor is None:
+        design_factor = factors.design_factor
+    out = BatchSizing()
+
+    # Steps 1-3: losses, base size, design factor
+    out.effective_daily_kwh = total_daily_kwh / factors.system_efficiency
+    out.system_size_kw = out.effective_daily_kwh / peak_sun_hours * design_factor
+
+    # Steps 4-5: panels and roof area
+    out.number_of_panels = np.ceil(out.system_size_kw * 1000 / panel_wattage).astype(np.int64)
+    panel_array_capacity_kw = (out.number_of_panels * panel_wattage) / 1000
+    out.roof_area_m2 = out.number_of_panels * factors.panel_area_m2 * factors.spacing_factor
+
+    # Step 6: inverter
+    out.min_inverter_kw = out.system_size_kw / factors.max_dc_ac_ratio
+    shape = out.min_inverter_kw.shape
+    if factors.allow_mixed_inverter_sizes and factors.use_parallel_inverters:
+        # Mixed-size banks: per-row optimizer solves (memoized, sub-millisecond)
+        configs = [select_inverter_configuration(factors, kw) for kw in out.min_inverter_kw.ravel().tolist()]
+        count = np.array([c["count"] for c in configs], dtype=np.int64)
+        unit = np.array([c["unit_size"] for c in configs], dtype=float)
+        total = np.array([c["total_capacity"] for c in configs], dtype=float)
+        out.inverter_configuration = [c["configuration"] for c in configs]
+    else:
+        count, unit, total = parallel_inverters_vectorized(
+            out.min_inverter_kw.ravel(),
+            factors.inverter_sizes,
+            max_parallel=factors.max_parallel_inverters,
+            use_parallel=factors.use_parallel_inverters,
+            prefer_parallel_above_kw=factors.prefer_parallel_above_kw,
+        )
+        # Identical units: configuration is [unit_size] * count
+        out.inverter_configuration = None
+    out.inverter_count = count.reshape(shape)
+    out.inverter_unit_size_kw = unit.reshape(shape)
+    out.inverter_size_kw = total.reshape(shape)
+    out.dc_ac_ratio = panel_array_capacity_kw / out.inverter_size_kw
+
+    # Step 7: battery — larger of energy and C-rate (power) requirement, rounded up to 5 kWh
+    essential_load_kw_dc = (total_daily_kwh / 24) * essential_load_percent / factors.battery_discharge_efficiency
+    energy_kwh = essential_load_kw_dc * backup_hours / factors.battery_dod
+    power_kwh = essential_load_kw_dc / (factors.battery_c_rate * factors.battery_dod)
+    battery = np.maximum(factors.min_battery_size_kwh, np.ceil(np.maximum(energy_kwh, power_kwh) / 5) * 5)
+    out.battery_capacity_kwh = np.where(backup_hours > 0, battery, np.nan)
+    return out
+
+
+def _resolve_peak_sun_hours(db: Session, locations: List[Optional[str]], default: float) -> np.ndarray:
+    """Peak sun hours per input, looking each distinct location up once."""
+    resolved: Dict[Optional[str], float] = {}
+    for location in set(locations):
+        resolved[location] = get_peak_sun_hours(db, location) or default
+    return np.array([resolved[loc] for loc in locations], dtype=float)
+
+
+def calculate_sizing_batch(db: Session, inputs: List[SizingInput]) -> List[SizingResult]:
+    """Size many inputs in one vectorized pass (same results as calculate_sizing per input)."""
+    if not inputs:
+        return []
+    factors = get_sizing_factors(db)
+
+    total_daily_kwh = np.array([i.total_daily_kwh for i in inputs], dtype=float)
+    peak_sun_hours = _resolve_peak_sun_hours(db, [i.location for i in inputs], factors.default_peak_sun_hours)
+    wattages = [get_panel_wattage(i.panel_brand) for i in inputs]
+    essential = [i.essential_load_percent or 0.5 for i in inputs]
+    backup = [resolve_backup_hours(getattr(i, "system_type", None), i.backup_hours) for i in inputs]
+    battery_hours = np.array([hours if needs and hours > 0 else 0.0 for needs, hours in backup], dtype=float)
+
+    out = size_arrays(
+        factors,
+        total_daily_kwh,
+        peak_sun_hours,
+        np.array(wattages, dtype=float),
+        battery_hours,
+        np.array(essential, dtype=float),
+    )
+
+    # Round with Python's round() so values match calculate_sizing exactly
+    results = []
+    for k, item in enumerate(inputs):
+        needs_battery, backup_hours_to_use = backup[k]
+        battery_kwh = out.battery_capacity_kwh[k]
+        results.append(SizingResult(
+            project_id=item.project_id,
+            total_daily_kwh=item.total_daily_kwh,
+            location=item.location,
+            peak_sun_hours=float(peak_sun_hours[k]),
+            panel_brand=item.panel_brand,
+            panel_wattage=wattages[k],
+            backup_hours=backup_hours_to_use if needs_battery else (item.backup_hours or 0),
+            essential_load_percent=essential[k],
+            effective_daily_kwh=round(float(out.effective_daily_kwh[k]), 2),
+            system_size_kw=round(float(out.system_size_kw[k]), 2),
+            number_of_panels=int(out.number_of_panels[k]),
+            roof_area_m2=round(float(out.roof_area_m2[k]), 2),
+            min_inverter_kw=round(float(out.min_inverter_kw[k]), 1),
+            inverter_size_kw=round(float(out.inverter_size_kw[k]), 1),
+            inverter_count=int(out.inverter_count[k]),
+            inverter_unit_size_kw=round(float(out.inverter_unit_size_kw[k]), 1),
+            inverter_configuration=(
+                out.inverter_configuration[k]
+                if out.inverter_configuration is not None
+                else [float(out.inverter_unit_size_kw[k])] * int(out.inverter_count[k])
+            ),
+            battery_capacity_kwh=None if np.isnan(battery_kwh) else round(float(battery_kwh), 1),
+            system_efficiency=factors.system_efficiency,
+            dc_ac_ratio=round(float(out.dc_ac_ratio[k]), 2),
+            design_factor=factors.design_factor,
+        ))
+    return results
@@ -0,0 +1,321 @@
+"""
+Shared Document Rendering
+
+Fixed per-render work shared by all PDF generators, done once per process:
+
+- Templates are compiled once at import through ``register_template``. Each
+  template's ``<style>`` block is split out: the body is rendered per document
+  and the CSS is parsed once into a WeasyPrint ``CSS`` object (per worker
+  process, see ``pdf_renderer.py``). Autoescaping is on: the same HTML is
+  served by the preview routes, so every value is escaped unless marked safe.
+- One ``FontConfiguration`` is reused for every render in a process.
+- The company logo is located once per logo setting (until the next settings
+  write or LOGO_LOOKUP_MAX_AGE_SEC) and its base64 data URI is cached, keyed by
+  the file's mtime and size.
+
+Generators return a ``RenderedDocument`` (body HTML + CSS). ``pdf_renderer``
+lays it out; ``standalone_html()`` re-inlines the CSS for HTML previews and
+``combine_documents`` merges several into one bookmarked document.
+WeasyPrint is imported lazily so HTML-only paths don't need it.
+"""
+import base64
+from html import escape
+import logging
+import re
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional, Sequence, Tuple
+
+from jinja2 import Environment, Template
+
+from app.services.settings_cache import get_settings_version
+
+logger = logging.getLogger(__name__)
+
+_STYLE_BLOCK = re.compile(r"<style[^>]*>(.*?)</style>", re.S | re.I)
+_HEAD_CLOSE = re.compile(r"</head>", re.I)
+
+LOGO_LOOKUP_MAX_AGE_SEC = 30.0
+
+_LOGO_MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif'
+}
+
+
+def format_currency(value):
+    """Format number with commas and 2 decimal places"""
+    if value is None:
+        return "0.00"
+    return f"{float(value):,.2f}"
+
+
+_env = Environment(autoescape=True)
+_env.filters['format_currency'] = format_currency
+
+
+@dataclass(frozen=True, slots=True)
+class RenderedDocument:
+    """Rendered body HTML plus the template's stylesheet, ready for layout."""
+
+    html: str
+    css: str = ""
+    presentational_hints: bool = False
+
+    def standalone_html(self) -> str:
+        """Single HTML document with the stylesheet inlined (previews, browsers)."""
+        if not self.css:
+            return self.html
+        style = f"<style>{self.css}</style>"
+        if _HEAD_CLOSE.search(self.html):
+            return _HEAD_CLOSE.sub(lambda _: style + "</head>", self.html, count=1)
+        return style + self.html
+
+
+@dataclass(frozen=True, slots=True)
+class DocumentTemplate:
+    """A compiled template whose <style> block has been split out."""
+
+    name: str
+    template: Template
+    css: str
+    presentational_hints: bool = False
+
+    def render(self, **context) -> RenderedDocument:
+        return RenderedDocument(self.template.render(**context), self.css, self.presentational_hints)
+
+
+_templates: Dict[str, DocumentTemplate] = {}
+
+
+def register_template(name: str, source: str, presentational_hints: bool = False) -> DocumentTemplate:
+    """Compile a template once; its <style> blocks become the document stylesheet."""
+    css = "\n".join(block.strip() for block in _STYLE_BLOCK.findall(source))
+    body = _STYLE_BLOCK.sub("", source)
+    document = DocumentTemplate(name, _env.from_string(body), css, presentational_hints)
+    _templates[name] = document
+    return document
+
+
+def get_template(name: str) -> DocumentTemplate:
+    return _templates[name]
+
+
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_CSS_RULE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+_BODY = re.compile(r"<body[^>]*>(.*)</body>", re.S | re.I)
+
+# Layout of a combined document: each section starts a new page and gets a
+# top-level PDF bookmark labelled from its data-bookmark attribute
+_COMBINED_CSS = """
+.doc-section { break-before: page; bookmark-level: 1; bookmark-label: attr(data-bookmark); }
+.doc-section:first-child { break-before: auto; }
+"""
+
+
+def _scope_selector(selector: str, scope: str) -> str:
+    if selector in ("html", "body"):
+        return scope
+    if selector == "*":
+        return f"{scope}, {scope} *"
+    for root in ("html ", "body "):
+        if selector.startswith(root):
+            return f"{scope} {selector[len(root):]}"
+    return f"{scope} {selector}"
+
+
+@lru_cache(maxsize=32)
+def scope_css(css: str, scope: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Prefix every style rule in css with the ``scope`` selector (body/html map to scope)
+
+    Returns (scoped rules, at-rules). At-rules such as @page are returned
+    separately so a combined document declares each one once. Only flat
+    stylesheets are supported, which is what the document templates use.
+    """
+    rules, at_rules = [], []
+    for match in _CSS_RULE.finditer(_CSS_COMMENT.sub("", css)):
+        selectors, declarations = match.group(1).strip(), match.group(2).strip()
+        if selectors.startswith("@"):
+            at_rules.append(f"{selectors} {{ {declarations} }}")
+            continue
+        scoped = ", ".join(_scope_selector(sel.strip(), scope) for sel in selectors.split(","))
+        rules.append(f"{scoped} {{ {declarations} }}")
+    return "\n".join(rules), tuple(at_rules)
+
+
+def combine_documents(sections: Sequence[Tuple[str, str, RenderedDocument]], title: str = "") -> RenderedDocument:
+    """
+    Merge rendered documents into one, laid out in a single pass
+
+    sections: (key, bookmark label, document). Each document's body is wrapped
+    in ``<section class="doc-section doc-<key>">`` and its stylesheet scoped to
+    that class, so templates with overlapping class names don't interfere. The
+    combined stylesheet depends only on the templates, so workers parse it
+    once. Shared assets such as the logo data URI are identical across
+    sections and decoded once by WeasyPrint.
+    """
+    at_rules: Dict[str, None] = {}
+    css_parts = [_COMBINED_CSS.strip()]
+    body_parts = []
+    for key, label, document in sections:
+        scope = f".doc-{key}"
+        scoped, section_at_rules = scope_css(document.css, scope)
+        at_rules.update(dict.fromkeys(section_at_rules))
+        css_parts.append(scoped)
+        match = _BODY.search(document.html)
+        body = match.group(1) if match else document.html
+        body_parts.append(
+            f'<section class="doc-section doc-{key}" data-bookmark="{escape(label)}">{body}</section>'
+        )
+    html = (
+        '<!DOCTYPE html><html><head><meta charset="UTF-8">'
+        f'<title>{escape(title)}</title></head><body>' + "".join(body_parts) + '</body></html>'
+    )
+    css = "\n".join(list(at_rules) + css_parts)
+    return RenderedDocument(html, css, any(d.presentational_hints for _, _, d in sections))
+
+
+def _locate_company_logo(logo_url: Optional[str]) -> Optional[Path]:
+    logo_path = None
+
+    # First, try to get logo from settings
+    if logo_url:
+        # Remove leading slash if present
+        if logo_url.startswith('/'):
+            logo_url = logo_url[1:]
+
+        # Try static directory first
+        static_logo = Path("static") / logo_url.split('/')[-1]
+        if static_logo.exists():
+            logo_path = static_logo
+        else:
+            # Try the full path from settings
+            full_path = Path(logo_url)
+            if full_path.exists():
+                logo_path = full_path
+
+    # If no logo from settings, try default locations
+    if not logo_path:
+        static_dir = Path("static")
+        if static_dir.exists():
+            for logo_file in ["logo.jpg", "logo.png", "logo.jpeg"]:
+                logo_file_path = static_dir / logo_file
+                if logo_file_path.exists():
+                    logo_path = logo_file_path
+                    break
+
+    # If still no logo, try frontend public directory (mounted in container)
+    if not logo_path:
+        # Try multiple possible paths
+        possible_paths = [
+            Path("frontend_public/logo.jpg"),  # Mounted volume
+            Path("static/logo.jpg"),  # Backend static directory
+            Path("../frontend/public/logo.jpg"),  # Relative path (if not in container)
+            Path("logo.jpg"),  # Current directory
+        ]
+        for possible_path in possible_paths:
+            if possible_path.exists():
+                logo_path = possible_path
+                break
+
+    return logo_path
+
+
+_logo_lock = Lock()
+
+# logo setting -> (settings version, located at (monotonic), located path)
+_logo_paths: Dict[Optional[str], Tuple[int, float, Optional[Path]]] = {}
+
+
+def find_company_logo(logo_url: Optional[str]) -> Optional[Path]:
+    """
+    Logo file from the company_logo_url setting, else the default locations
+
+    The lookup is memoized per setting value until the next settings write in
+    this process (see ``settings_cache.bump_settings_version``), for at most
+    LOGO_LOOKUP_MAX_AGE_SEC so other workers see an uploaded logo, and only
+    while the located file still exists.
+    """
+    version = get_settings_version()
+    now = time.monotonic()
+    cached = _logo_paths.get(logo_url)
+    if (
+        cached
+        and cached[0] == version
+        and now - cached[1] < LOGO_LOOKUP_MAX_AGE_SEC
+        and (cached[2] is None or cached[2].exists())
+    ):
+        return cached[2]
+    logo_path = _locate_company_logo(logo_url)
+    with _logo_lock:
+        _logo_paths[logo_url] = (version, now, logo_path)
+    return logo_path
+
+
+# path -> (mtime_ns, size, data URI)
+_logo_uris: Dict[str, Tuple[int, int, str]] = {}
+
+
+def logo_data_uri(logo_path: Optional[Path]) -> Optional[str]:
+    """Base64 data URI for an image file, re-encoded only when its mtime or size changes."""
+    if not logo_path:
+        return None
+    try:
+        stat = logo_path.stat()
+    except OSError:
+        return None
+    key = str(logo_path)
+    cached = _logo_uris.get(key)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    try:
+        data = logo_path.read_bytes()
+    except OSError as e:
+        logger.warning("Error reading logo file %s: %s", logo_path, e)
+        return None
+    mime_type = _LOGO_MIME_TYPES.get(logo_path.suffix.lower(), 'image/jpeg')
+    uri = f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+    with _logo_lock:
+        _logo_uris[key] = (stat.st_mtime_ns, stat.st_size, uri)
+    return uri
+
+
+def company_logo_data_uri(logo_url: Optional[str]) -> Optional[str]:
+    """Data URI of the company logo (see find_company_logo), or None"""
+    return logo_data_uri(find_company_logo(logo_url))
+
+
+# WeasyPrint objects (one set per process)
+_font_config = None
+
+
+def get_font_config():
+    global _font_config
+    if _font_config is None:
+        from weasyprint.text.fonts import FontConfiguration
+        _font_config = FontConfiguration()
+    return _font_config
+
+
+@lru_cache(maxsize=32)
+def get_stylesheet(css: str):
+    """Parsed WeasyPrint CSS for a template stylesheet (cached per process by content)."""
+    from weasyprint import CSS
+    return CSS(string=css, font_config=get_font_config())
+
+
+def write_pdf(html: str, css: str = "", presentational_hints: bool = False) -> bytes:
+    """Lay out body HTML with a pre-parsed stylesheet and return the PDF bytes."""
+    from weasyprint import HTML
+    stylesheets = [get_stylesheet(css)] if css else []
+    return HTML(string=html).write_pdf(
+        stylesheets=stylesheets,
+        font_config=get_font_config(),
+        presentational_hints=presentational_hints,
+    )
@@ -0,0 +1,301 @@
+"""
+Email Outbox
+
+Request handlers never talk to the mail provider. They call ``enqueue_email``,
+which adds an ``email_outbox`` row to the caller's session, so the email is
+committed (or rolled back) together with the order, payment or quote change
+that triggered it. A background dispatcher started with the app delivers due
+rows:
+
+- claims due rows one at a time, up to ``EMAIL_OUTBOX_BATCH_SIZE`` per batch
+  (``SELECT ... FOR UPDATE SKIP LOCKED`` on PostgreSQL), each leased for
+  ``CLAIM_LEASE_SEC`` just before it is delivered, so a crashed dispatcher's
+  rows are picked up again but a long batch never outlives its leases
+- sends through the configured transport in a thread (SendGrid calls block)
+- on failure retries with exponential backoff plus jitter, and marks the row
+  ``failed`` after ``EMAIL_OUTBOX_MAX_ATTEMPTS``
+- once a row is sent, applies its kind's follow-up in the same commit (a
+  quotation email marks a draft quote ``sent``)
+
+Every row has a unique idempotency key (e.g. ``order-paid:42:customer``):
+enqueueing the same key again returns the existing row, so retried webhooks
+never queue a second email. The key is also passed to the transport
+(``X-Idempotency-Key`` header / sink file name).
+
+``EMAIL_TRANSPORT=file`` writes each email as an ``.eml`` file to
+``EMAIL_FILE_SINK_DIR`` instead of sending it, for offline testing.
+"""
+import asyncio
+import logging
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import EmailOutbox, Quote, QuoteStatus
+from app.services.background_worker import PollingWorker, backoff_delay_sec
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENDING = "sending"
+OUTBOX_SENT = "sent"
+OUTBOX_FAILED = "failed"
+
+CLAIM_LEASE_SEC = 300  # One delivery: render the PDF (PDF_RENDER_TIMEOUT_SEC) and send it
+DEFAULT_FILE_SINK_DIR = "email_sink"  # Not under the static root: emails hold customer data
+
+
+@dataclass(frozen=True, slots=True)
+class OutgoingEmail:
+    """What a transport sends: an outbox row with its attachments loaded."""
+
+    idempotency_key: str
+    to_email: str
+    subject: str
+    html_content: str
+    text_content: Optional[str] = None
+    attachments: Tuple[Tuple[str, str, bytes], ...] = ()  # (filename, mime type, content)
+
+
+class SendGridTransport:
+    name = "sendgrid"
+
+    def send(self, email: OutgoingEmail) -> None:
+        from app.services.email_service import email_service
+        email_service.deliver(
+            email.to_email,
+            email.subject,
+            email.html_content,
+            text_content=email.text_content,
+            attachments=email.attachments,
+            headers={"X-Idempotency-Key": email.idempotency_key},
+        )
+
+
+class FileSinkTransport:
+    """Writes each email to ``<directory>/<idempotency key>.eml`` (re-sends overwrite)."""
+
+    name = "file"
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def path_for(self, idempotency_key: str) -> Path:
+        return self.directory / (re.sub(r"[^A-Za-z0-9_.-]", "_", idempotency_key) + ".eml")
+
+    def send(self, email: OutgoingEmail) -> None:
+        message = EmailMessage()
+        message["To"] = email.to_email
+        message["From"] = os.getenv("SENDGRID_FROM_EMAIL", "noreply@energyprecisions.com")
+        message["Subject"] = email.subject
+        message["X-Idempotency-Key"] = email.idempotency_key
+        message.set_content(email.text_content or "")
+        message.add_alternative(email.html_content, subtype="html")
+        for filename, mime_type, content in email.attachments:
+            maintype, _, subtype = mime_type.partition("/")
+            message.add_attachment(content, maintype=maintype, subtype=subtype, filename=filename)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".eml")
+        with os.fdopen(fd, "wb") as f:
+            f.write(message.as_bytes())
+        os.replace(tmp_name, self.path_for(email.idempotency_key))
+
+
+def get_transport():
+    if settings.EMAIL_TRANSPORT == "file":
+        return FileSinkTransport(Path(settings.EMAIL_FILE_SINK_DIR or DEFAULT_FILE_SINK_DIR))
+    return SendGridTransport()
+
+
+def enqueue_email(
+    db: Session,
+    idempotency_key: str,
+    kind: str,
+    to_email: str,
+    subject: str,
+    html_content: str,
+    text_content: Optional[str] = None,
+    attachments: Optional[List[Dict]] = None,
+) -> EmailOutbox:
+    """
+    Queue an email in the caller's transaction (the caller commits)
+
+    attachments are references resolved at send time, e.g.
+    ``{"type": "quotation_pdf", "quote_id": 1, "document_type": "quotation", "filename": "q.pdf"}``
+    or ``{"type": "file", "path": "...", "filename": "...", "mime_type": "..."}``.
+    Returns the existing row if the idempotency key was already queued.
+    """
+    for pending in db.new:
+        if isinstance(pending, EmailOutbox) and pending.idempotency_key == idempotency_key:
+            return pending
+    existing = db.query(EmailOutbox).filter(EmailOutbox.idempotency_key == idempotency_key).first()
+    if existing:
+        return existing
+    row = EmailOutbox(
+        idempotency_key=idempotency_key,
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        html_content=html_content,
+        text_content=text_content,
+        attachments=attachments or None,
+        status=OUTBOX_PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(row)
+    _dispatcher.wake_after_commit(db)
+    return row
+
+
+def claim_due(db: Session, batch_size: int, now: Optional[datetime] = None) -> List[EmailOutbox]:
+    """Lease up to batch_size due rows (pending, or sending with an expired lease) and commit."""
+    now = now or datetime.utcnow()
+    rows = db.query(EmailOutbox).filter(
+        or_(
+            and_(EmailOutbox.status == OUTBOX_PENDING, EmailOutbox.next_attempt_at <= now),
+            and_(EmailOutbox.status == OUTBOX_SENDING, EmailOutbox.locked_until < now),
+        )
+    ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(batch_size).with_for_update(skip_locked=True).all()
+    for row in rows:
+        row.status = OUTBOX_SENDING
+        row.locked_until = now + timedelta(seconds=CLAIM_LEASE_SEC)
+        row.attempts = (row.attempts or 0) + 1
+    db.commit()
+    return rows
+
+
+def retry_delay_sec(attempts: int) -> float:
+    return backoff_delay_sec(attempts, settings.EMAIL_OUTBOX_BACKOFF_BASE_SEC, settings.EMAIL_OUTBOX_BACKOFF_MAX_SEC)
+
+
+def _mark_sent(row: EmailOutbox) -> None:
+    row.status = OUTBOX_SENT
+    row.sent_at = datetime.utcnow()
+    row.locked_until = None
+    row.last_error = None
+
+
+def _quote_emailed(db: Session, row: EmailOutbox) -> None:
+    """
+    The quotation reached the provider: record when, and a draft quote now counts as sent
+
+    Delivery can come long after queueing (retries back off for up to an
+    hour), so a quote accepted or rejected meanwhile keeps its status.
+    """
+    quote_ids = [spec["quote_id"] for spec in row.attachments or [] if spec.get("type") == "quotation_pdf"]
+    for quote in db.query(Quote).filter(Quote.id.in_(quote_ids)).all():
+        if quote.status == QuoteStatus.DRAFT:
+            quote.status = QuoteStatus.SENT
+        quote.emailed_at = row.sent_at
+
+
+# kind -> follow-up applied with a successful delivery
+_ON_SENT = {"quotation": _quote_emailed}
+
+
+def _mark_failed_attempt(row: EmailOutbox, error: Exception) -> None:
+    row.last_error = f"{type(error).__name__}: {error}"[:2000]
+    row.locked_until = None
+    if row.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        row.status = OUTBOX_FAILED
+        logger.error("Email %s (%s) failed permanently: %s", row.id, row.idempotency_key, row.last_error)
+    else:
+        row.status = OUTBOX_PENDING
+        row.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay_sec(row.attempts))
+        logger.warning("Email %s (%s) attempt %d failed: %s", row.id, row.idempotency_key, row.attempts, row.last_error)
+
+
+async def _load_attachments(db: Session, specs: Sequence[Dict]) -> Tuple[Tuple[str, str, bytes], ...]:
+    loaded = []
+    for spec in specs:
+        if spec.get("type") == "quotation_pdf":
+            from app.services.pdf_generator import get_quotation_pdf
+            path = await get_quotation_pdf(db, spec["quote_id"], spec.get("document_type") or "quotation")
+            loaded.append((spec.get("filename") or path.name, "application/pdf", path.read_bytes()))
+        elif spec.get("type") == "file":
+            path = Path(spec["path"])
+            loaded.append((spec.get("filename") or path.name, spec.get("mime_type") or "application/octet-stream", path.read_bytes()))
+        else:
+            raise ValueError(f"Unknown attachment type {spec.get('type')!r}")
+    return tuple(loaded)
+
+
+async def deliver(db: Session, row: EmailOutbox, transport) -> None:
+    """Send one claimed row and record the outcome (the caller commits)."""
+    try:
+        email = OutgoingEmail(
+            idempotency_key=row.idempotency_key,
+            to_email=row.to_email,
+            subject=row.subject,
+            html_content=row.html_content,
+            text_content=row.text_content,
+            attachments=await _load_attachments(db, row.attachments or []),
+        )
+        await asyncio.to_thread(transport.send, email)
+    except Exception as e:
+        _mark_failed_attempt(row, e)
+    else:
+        _mark_sent(row)
+        on_sent = _ON_SENT.get(row.kind)
+        if on_sent is not None:
+            on_sent(db, row)
+
+
+async def dispatch_once(transport=None, batch_size: Optional[int] = None) -> int:
+    """Deliver one batch of due emails. Returns how many rows were claimed."""
+    from app.database import SessionLocal
+
+    transport = transport or get_transport()
+    db = SessionLocal()
+    try:
+        claimed = 0
+        for _ in range(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE):
+            # Lease each row just before sending it, so the lease covers one delivery
+            rows = claim_due(db, 1)
+            if not rows:
+                break
+            claimed += 1
+            await deliver(db, rows[0], transport)
+            db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+class OutboxDispatcher(PollingWorker):
+    """Background task draining the outbox; woken early after a commit that queued email."""
+
+    name = "Email outbox dispatcher"
+
+    def __init__(self, poll_sec: float):
+        super().__init__(poll_sec)
+        self._transport = None
+
+    @property
+    def batch_size(self) -> int:
+        return settings.EMAIL_OUTBOX_BATCH_SIZE
+
+    def on_start(self) -> None:
+        self._transport = get_transport()
+        logger.info("Email outbox transport: %s", self._transport.name)
+
+    async def run_batch(self) -> int:
+        return await dispatch_once(self._transport)
+
+
+_dispatcher = OutboxDispatcher(poll_sec=settings.EMAIL_OUTBOX_POLL_SEC)
+
+
+def get_outbox_dispatcher() -> OutboxDispatcher:
+    return _dispatcher
@@ -3,7 +3,7 @@ SendGrid Email Service
 Handles transactional emails for orders and notifications
 """
 import os
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Sequence, Tuple
 
 # Lazy import SendGrid - only import when actually needed
 try:
@@ -60,8 +60,53 @@ class EmailService:
             print(f"❌ Error sending email: {e}")
             return False
 
+    def deliver(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None,
+        attachments: Sequence[Tuple[str, str, bytes]] = (),
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """
+        Send one email, raising on failure (used by the outbox dispatcher)
+
+        attachments: (filename, mime type, content) tuples.
+        """
+        if not self.sg:
+            raise RuntimeError("SendGrid is not configured (SENDGRID_API_KEY)")
+        import base64
+        from sendgrid.helpers.mail import Attachment, Header
+
+        message = Mail(
+            from_email=Email(self.from_email, self.from_name),
+            to_emails=To(to_email),
+            subject=subject,
+            html_content=Content("text/html", html_content)
+        )
+        if text_content:
+            message.add_content(Content("text/plain", text_content))
+        for name, value in (headers or {}).items():
+            message.add_header(Header(name, value))
+        for filename, mime_type, content in attachments:
+            attachment = Attachment()
+            attachment.file_content = base64.b64encode(content).decode('utf-8')
+            attachment.file_type = mime_type
+            attachment.file_name = filename
+            attachment.disposition = "attachment"
+            message.add_attachment(attachment)
+
+        response = self.sg.send(message)
+        if response.status_code != 202:
+            raise RuntimeError(f"SendGrid returned HTTP {response.status_code}")
+
     def send_order_confirmation(self, order: Dict, customer_email: str) -> bool:
         """Send order confirmation email"""
+        return self.send_email(customer_email, *self.compose_order_confirmation(order))
+
+    def compose_order_confirmation(self, order: Dict) -> Tuple[str, str]:
+        """(subject, html) of the order confirmation email"""
         subject = f"Order Confirmation - {order.get('order_number', 'N/A')}"
         
         items_html = ""
@@ -142,10 +187,14 @@ class EmailService:
         </html>
         """
 
-        return self.send_email(customer_email, subject, html_content)
+        return subject, html_content
 
     def send_order_shipped(self, order: Dict, customer_email: str, tracking_number: str) -> bool:
         """Send shipping notification email"""
+        return self.send_email(customer_email, *self.compose_order_shipped(order, tracking_number))
+
+    def compose_order_shipped(self, order: Dict, tracking_number: str) -> Tuple[str, str]:
+        """(subject, html) of the shipping notification email"""
         subject = f"Your Order #{order.get('order_number', 'N/A')} Has Shipped"
         
         html_content = f"""
@@ -181,10 +230,14 @@ class EmailService:
         </html>
         """
 
-        return self.send_email(customer_email, subject, html_content)
+        return subject, html_content
 
     def send_admin_notification(self, order: Dict, admin_email: str) -> bool:
         """Send new order notification to admin"""
+        return self.send_email(admin_email, *self.compose_admin_notification(order))
+
+    def compose_admin_notification(self, order: Dict) -> Tuple[str, str]:
+        """(subject, html) of the new order notification to admin"""
         subject = f"New Order Received - {order.get('order_number', 'N/A')}"
         
         html_content = f"""
@@ -216,10 +269,14 @@ class EmailService:
         </html>
         """
 
-        return self.send_email(admin_email, subject, html_content)
+        return subject, html_content
 
     def send_contact_inquiry(self, admin_email: str, payload: Dict) -> bool:
         """Notify admin of a website contact form submission."""
+        return self.send_email(admin_email, *self.compose_contact_inquiry(payload))
+
+    def compose_contact_inquiry(self, payload: Dict) -> Tuple[str, str]:
+        """(subject, html) of the contact form notification"""
         topic = (payload.get("topic") or "").strip()
         subject = f"Website contact: {payload.get('name', 'Visitor')}"
         if topic:
@@ -242,33 +299,16 @@ class EmailService:
             <p style="white-space: pre-wrap;">{safe(payload.get('message'))}</p>
         </body></html>
         """
-        return self.send_email(admin_email, subject, html_content)
+        return subject, html_content
 
 
 # Singleton instance
 email_service = EmailService()
 
 
-def send_quotation_email(quote, customer, pdf_bytes, recipient_email: Optional[str] = None) -> bool:
-    """
-    Send quotation PDF via email
-    Args:
-        quote: Quote model instance
-        customer: Customer model instance
-        pdf_bytes: BytesIO or bytes containing PDF
-        recipient_email: Optional email address (defaults to customer email)
-    Returns:
-        bool: True if sent successfully, False otherwise
-    """
-    if not SENDGRID_AVAILABLE or not email_service.sg:
-        print(f"⚠️  Email service not available. Would send quote #{quote.id} to {recipient_email or customer.email}")
-        return False
-    
-    recipient = recipient_email or customer.email
-    if not recipient:
-        print("❌ No recipient email address provided")
-        return False
-    
+def compose_quotation_email(document) -> Tuple[str, str]:
+    """(subject, html) of the email carrying a quotation PDF; document is a QuoteDocument"""
+    quote, customer = document.quote, document.customer
     subject = f"Quotation #{quote.quote_number or quote.id} - {customer.name}"
     
     html_content = f"""
@@ -298,39 +338,4 @@ def send_quotation_email(quote, customer, pdf_bytes, recipient_email: Optional[s
     </body>
     </html>
     """
-    
-    try:
-        import base64
-        
-        message = Mail(
-            from_email=Email(email_service.from_email, email_service.from_name),
-            to_emails=To(recipient),
-            subject=subject,
-            html_content=Content("text/html", html_content)
-        )
-        
-        # Attach PDF
-        if hasattr(pdf_bytes, 'read'):
-            pdf_bytes.seek(0)
-            pdf_data = pdf_bytes.read()
-        else:
-            pdf_data = pdf_bytes
-        
-        # Encode PDF to base64
-        encoded_pdf = base64.b64encode(pdf_data).decode('utf-8')
-        
-        # Add attachment using SendGrid's Attachment class
-        from sendgrid.helpers.mail import Attachment
-        attachment = Attachment()
-        attachment.file_content = encoded_pdf
-        attachment.file_type = "application/pdf"
-        attachment.file_name = f"quotation_{quote.quote_number or quote.id}.pdf"
-        attachment.disposition = "attachment"
-        
-        message.add_attachment(attachment)
-        
-        response = email_service.sg.send(message)
-        return response.status_code == 202
-    except Exception as e:
-        print(f"❌ Error sending quotation email: {e}")
-        return False
+    return subject, html_content
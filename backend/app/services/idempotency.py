@@ -0,0 +1,142 @@
+"""
+Idempotency Keys
+
+Checkout on a flaky mobile connection often submits twice. Endpoints that
+create something (an order, a Paystack transaction) accept an
+``Idempotency-Key`` header; the first request with a key reserves it and
+stores its JSON response, and retries with the same key get that response
+back (``Idempotent-Replayed: true``) without redoing any work:
+
+- same key, same request, finished      -> stored response replayed
+- same key, same request, still running -> 409 (retry shortly)
+- same key, different request           -> 422
+- a request that fails releases its key, so the client can retry it
+
+The reservation is committed before the work starts, so concurrent duplicates
+see it. The stored response is written in the same transaction as the work
+(the caller commits both together). Keys live for IDEMPOTENCY_KEY_TTL_HOURS;
+an attempt that never finished (process died) stops blocking retries after
+IDEMPOTENCY_LOCK_SEC.
+"""
+import hashlib
+import itertools
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import insert_ignore
+from app.models_ecommerce import IdempotencyKey
+
+KEY_IN_PROGRESS = "in_progress"
+KEY_COMPLETED = "completed"
+
+MAX_KEY_LENGTH = 255
+_PURGE_EVERY = 200  # Delete expired keys on every Nth reservation
+
+_reservations = itertools.count(1)
+
+
+def request_fingerprint(scope: str, request_data: Any) -> str:
+    """SHA-256 of the endpoint scope and the canonical JSON of the request"""
+    canonical = json.dumps(request_data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{scope}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+@dataclass(slots=True)
+class IdempotentRequest:
+    scope: str
+    key: str
+    request_hash: str
+    replay: Optional[Response] = None  # Set when the key already has a stored response
+
+    def _query(self, db: Session):
+        return db.query(IdempotencyKey).filter(IdempotencyKey.scope == self.scope, IdempotencyKey.key == self.key)
+
+    def complete(self, db: Session, body: Any, status_code: int = 200) -> None:
+        """Store the response in the caller's transaction (the caller commits it with the work)"""
+        self._query(db).update({
+            IdempotencyKey.status: KEY_COMPLETED,
+            IdempotencyKey.response_status: status_code,
+            IdempotencyKey.response_body: json.dumps(body, separators=(",", ":"), default=str),
+            IdempotencyKey.locked_until: None,
+        }, synchronize_session=False)
+
+    def release(self, db: Session) -> None:
+        """Forget an unfinished reservation after the request failed, and commit"""
+        self._query(db).filter(IdempotencyKey.status == KEY_IN_PROGRESS).delete(synchronize_session=False)
+        db.commit()
+
+
+def _replay(row: IdempotencyKey) -> Response:
+    return Response(
+        content=row.response_body,
+        status_code=row.response_status or 200,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def begin_idempotent_request(
+    db: Session,
+    scope: str,
+    key: Optional[str],
+    request_data: Any,
+) -> Optional[IdempotentRequest]:
+    """
+    Reserve ``key`` for this request and commit, or load what an earlier request with it left
+
+    Returns None when no key was sent (no idempotency). When the result has
+    ``replay`` set, return it as the response. Raises HTTPException 400 / 409 / 422.
+    """
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+    request_hash = request_fingerprint(scope, request_data)
+    now = datetime.utcnow()
+    if next(_reservations) % _PURGE_EVERY == 0:
+        db.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= now).delete(synchronize_session=False)
+
+    # An expired key, or an attempt that never finished, no longer blocks this one
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        or_(
+            IdempotencyKey.expires_at <= now,
+            and_(IdempotencyKey.status == KEY_IN_PROGRESS, IdempotencyKey.locked_until < now),
+        ),
+    ).delete(synchronize_session=False)
+    inserted = insert_ignore(db, IdempotencyKey, {
+        "scope": scope,
+        "key": key,
+        "request_hash": request_hash,
+        "status": KEY_IN_PROGRESS,
+        "locked_until": now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SEC),
+        "expires_at": now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+    }, ["scope", "key"])
+    db.commit()
+
+    request = IdempotentRequest(scope=scope, key=key, request_hash=request_hash)
+    if inserted:
+        return request
+
+    row = request._query(db).first()
+    if row is not None and row.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if row is not None and row.status == KEY_COMPLETED:
+        request.replay = _replay(row)
+        return request
+    raise HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is still being processed. Retry shortly.",
+        headers={"Retry-After": "1"},
+    )
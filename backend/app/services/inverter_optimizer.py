@@ -0,0 +1,182 @@
+"""
+Mixed-Size Parallel Inverter Optimizer
+
+``calculate_parallel_inverters`` only considers N identical units. This module
+searches multisets of the available sizes (e.g. 20 kW + 10 kW) and picks the
+configuration with the least excess capacity, then the lowest catalog cost,
+then the fewest units.
+
+Search is a dynamic program over total capacity on a 0.1 kW grid: for each
+unit count n <= max_parallel it keeps the cheapest way to reach every total.
+Those tables depend only on (sizes, costs, max_parallel), so they are built
+once per catalog and cached; a solve is then a lookup per n plus a short
+back-pointer walk. Solutions are memoized on
+(required_kw rounded, sizes, costs, max_parallel, prefer_parallel_above_kw).
+
+Benchmark: ``python -m app.scripts.benchmark_inverter_optimizer``.
+"""
+import math
+from functools import lru_cache
+from statistics import median
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.ecommerce_pricing import catalog_unit_price_from_fields
+from app.services.product_catalog import CatalogSnapshot
+
+# Capacity grid: 10 units per kW (0.1 kW resolution)
+GRID_PER_KW = 10
+
+
+def _to_units(kw: float) -> int:
+    return int(round(kw * GRID_PER_KW))
+
+
+def inverter_costs(catalog: CatalogSnapshot, sizes: Sequence[float]) -> Tuple[float, ...]:
+    """
+    Unit cost for each size: cheapest active catalog inverter of that capacity.
+
+    Sizes with no product (e.g. standard sizes from settings) are costed at the
+    catalog's median price per kW, or 1 per kW when the catalog has no inverters.
+    """
+    cheapest: Dict[float, float] = {}
+    for p in catalog.inverters.products:
+        price = catalog_unit_price_from_fields(p.base_price, p.price_type, capacity_kw=p.capacity_kw)
+        cap = float(p.capacity_kw)
+        if cap not in cheapest or price < cheapest[cap]:
+            cheapest[cap] = price
+    per_kw = median(price / cap for cap, price in cheapest.items()) if cheapest else 1.0
+    return tuple(cheapest.get(float(s), per_kw * s) for s in sizes)
+
+
+class _MixTables:
+    """Cheapest-cost DP tables for every unit count up to max_parallel."""
+
+    __slots__ = ("units", "sizes", "cost", "back", "next_reachable", "limit")
+
+    def __init__(self, sizes: Tuple[float, ...], costs: Tuple[float, ...], max_parallel: int):
+        self.sizes = sizes
+        self.units = [_to_units(s) for s in sizes]
+        self.limit = max_parallel * max(self.units) + 1
+        prev = np.full(self.limit, np.inf)
+        prev[0] = 0.0
+        self.cost: List[np.ndarray] = [prev]
+        self.back: List[np.ndarray] = [np.full(self.limit, -1, dtype=np.int32)]
+        self.next_reachable: List[np.ndarray] = [self._next_reachable(prev)]
+        for _ in range(max_parallel):
+            cur = np.full(self.limit, np.inf)
+            back = np.full(self.limit, -1, dtype=np.int32)
+            for j, (u, c) in enumerate(zip(self.units, costs)):
+                cand = prev[:-u] + c
+                better = cand < cur[u:]
+                cur[u:][better] = cand[better]
+                back[u:][better] = j
+            self.cost.append(cur)
+            self.back.append(back)
+            self.next_reachable.append(self._next_reachable(cur))
+            prev = cur
+
+    def _next_reachable(self, cost: np.ndarray) -> np.ndarray:
+        """For each total t, the smallest reachable total >= t (limit if none)."""
+        idx = np.where(np.isfinite(cost), np.arange(self.limit), self.limit)
+        return np.minimum.accumulate(idx[::-1])[::-1]
+
+    def solve(self, required_units: int, max_parallel: int) -> Optional[List[float]]:
+        if required_units >= self.limit:
+            return None
+        required_units = max(required_units, 1)
+        best = None  # (waste, cost, count, total)
+        for n in range(1, max_parallel + 1):
+            total = int(self.next_reachable[n][required_units])
+            if total >= self.limit:
+                continue
+            key = (total - required_units, round(float(self.cost[n][total]), 6), n, total)
+            if best is None or key < best:
+                best = key
+        if best is None:
+            return None
+        config = []
+        n, total = best[2], best[3]
+        while n > 0:
+            j = int(self.back[n][total])
+            config.append(self.sizes[j])
+            total -= self.units[j]
+            n -= 1
+        return sorted(config, reverse=True)
+
+
+@lru_cache(maxsize=32)
+def _mix_tables(sizes: Tuple[float, ...], costs: Tuple[float, ...], max_parallel: int) -> _MixTables:
+    return _MixTables(sizes, costs, max_parallel)
+
+
+def _single_config(size: float) -> Dict:
+    return {
+        "count": 1,
+        "unit_size": size,
+        "total_capacity": size,
+        "configuration": [size],
+        "mixed": False,
+    }
+
+
+@lru_cache(maxsize=4096)
+def _solve(
+    required_units: int,
+    sizes: Tuple[float, ...],
+    costs: Tuple[float, ...],
+    max_parallel: int,
+    prefer_parallel_above_kw: float,
+) -> Tuple[float, ...]:
+    required_kw = required_units / GRID_PER_KW
+    if required_kw <= prefer_parallel_above_kw:
+        # Same priority as calculate_parallel_inverters: one unit if a single size fits
+        for size in sizes:
+            if size >= required_kw:
+                return (size,)
+    config = _mix_tables(sizes, costs, max_parallel).solve(required_units, max_parallel)
+    if not config:
+        return ()
+    return tuple(config)
+
+
+def optimize_inverter_mix(
+    required_kw: float,
+    available_sizes: Sequence[float],
+    max_parallel: int = 4,
+    prefer_parallel_above_kw: float = 30.0,
+    costs: Optional[Sequence[float]] = None,
+) -> Dict:
+    """
+    Best mixed-size parallel inverter configuration
+
+    Returns the same dict as calculate_parallel_inverters (count, unit_size = largest
+    unit, total_capacity, configuration = unit sizes largest first) plus ``mixed``.
+    Costs default to proportional to size (i.e. no catalog preference).
+    """
+    if not available_sizes or max_parallel < 1:
+        return _single_config(max(6.5, math.ceil(required_kw * 2) / 2))
+
+    # Drop sizes too small for the capacity grid
+    pairs = sorted(
+        (float(s), float(c))
+        for s, c in zip(available_sizes, costs if costs is not None else available_sizes)
+        if _to_units(s) > 0
+    )
+    if not pairs:
+        return _single_config(max(6.5, math.ceil(required_kw * 2) / 2))
+    sizes = tuple(s for s, _ in pairs)
+    cost_tuple = tuple(c for _, c in pairs)
+    # Round up to the grid so the configuration never falls short of required_kw
+    required_units = math.ceil(round(required_kw * GRID_PER_KW, 6))
+    config = _solve(required_units, sizes, cost_tuple, int(max_parallel), float(prefer_parallel_above_kw))
+    if not config:
+        return _single_config(max(6.5, math.ceil(required_kw * 2) / 2))
+    return {
+        "count": len(config),
+        "unit_size": config[0],
+        "total_capacity": round(sum(config), 3),
+        "configuration": list(config),
+        "mixed": len(set(config)) > 1,
+    }
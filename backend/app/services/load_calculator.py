@@ -3,108 +3,121 @@ Load Calculation Service
 
 Calculates daily energy consumption from appliances.
 Handles unit conversions (HP to Watts) and duty cycles.
+
+The math is pure: ``appliance_daily_kwh`` and ``preview_load`` take a frozen
+``LoadFactors`` bundle (HP->W factors, fridge duty cycle, diversity factor)
+and never touch the database. ``get_load_factors`` derives the bundle from the
+cached settings snapshot and only reads the database when that snapshot is
+stale. The Session-taking functions below are thin wrappers for existing callers.
 """
-from typing import List, Optional
+from dataclasses import dataclass
+from threading import Lock
+from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
-from app.models import Appliance, Setting
+from app.models import Appliance
 from app.schemas import ApplianceCreate
+from app.services.settings_cache import SettingsSnapshot, get_settings_snapshot, peek_settings_snapshot
 
+_AC_TYPES = frozenset(["ac", "air_conditioner", "air conditioner"])
+_FRIDGE_TYPES = frozenset(["fridge", "freezer", "refrigerator"])
 
-def get_setting_value(db: Session, key: str, default: float) -> float:
-    """Get a setting value as float, or return default"""
-    setting = db.query(Setting).filter(Setting.key == key).first()
-    if setting:
-        try:
-            return float(setting.value)
-        except (ValueError, TypeError):
-            return default
-    return default
 
+# Setting key -> default, used when the setting is missing or not numeric
+_FACTOR_DEFAULTS = {
+    "hp_to_watts_ac": 900.0,  # AC compressors: 1 HP ≈ 900W
+    "hp_to_watts_motor": 746.0,  # Motors/pumps: 1 HP = 746W
+    "fridge_duty_cycle": 0.6,
+    "load_diversity_factor": 0.65,  # 65% simultaneous usage
+}
 
-def hp_to_watts(hp: float, db: Session, appliance_type: str = "ac") -> float:
-    """
-    Convert HP to Watts
-    
-    For AC units: 1 HP ≈ 900W (accounts for compressor efficiency)
-    For motors/pumps: 1 HP ≈ 746W (standard conversion)
-    """
-    if appliance_type.lower() in ["ac", "air_conditioner", "air conditioner"]:
-        conversion_factor = get_setting_value(db, "hp_to_watts_ac", 900.0)
-    else:
-        conversion_factor = get_setting_value(db, "hp_to_watts_motor", 746.0)
-    
-    return hp * conversion_factor
 
+@dataclass(frozen=True, slots=True)
+class LoadFactors:
+    """Conversion factors used by the load math; field names are the setting keys."""
+    hp_to_watts_ac: float = _FACTOR_DEFAULTS["hp_to_watts_ac"]
+    hp_to_watts_motor: float = _FACTOR_DEFAULTS["hp_to_watts_motor"]
+    fridge_duty_cycle: float = _FACTOR_DEFAULTS["fridge_duty_cycle"]
+    load_diversity_factor: float = _FACTOR_DEFAULTS["load_diversity_factor"]
 
-def get_duty_cycle(db: Session, appliance_type: str) -> float:
+    @classmethod
+    def from_settings(cls, snapshot: SettingsSnapshot) -> "LoadFactors":
+        return cls(**{key: snapshot.get_float(key, default) for key, default in _FACTOR_DEFAULTS.items()})
+
+
+_factors_lock = Lock()
+_factors: Optional[Tuple[SettingsSnapshot, LoadFactors]] = None
+
+
+def get_load_factors(db: Session) -> LoadFactors:
+    """Factors for the current settings snapshot; the database is read only when the snapshot is stale."""
+    global _factors
+    snapshot = peek_settings_snapshot() or get_settings_snapshot(db)
+    cached = _factors
+    if cached is not None and cached[0] is snapshot:
+        return cached[1]
+    factors = LoadFactors.from_settings(snapshot)
+    with _factors_lock:
+        _factors = (snapshot, factors)
+    return factors
+
+
+def appliance_power_watts(power_value: float, power_unit: str, appliance_type: str, factors: LoadFactors) -> float:
+    """Power in Watts for a rating in HP, kW or W"""
+    unit = power_unit.upper()
+    if unit == "HP":
+        factor = factors.hp_to_watts_ac if appliance_type.lower() in _AC_TYPES else factors.hp_to_watts_motor
+        return power_value * factor
+    if unit == "KW":
+        return power_value * 1000
+    return power_value
+
+
+def appliance_duty_cycle(appliance_type: str, factors: LoadFactors) -> float:
     """
-    Get duty cycle factor for an appliance type
-    
+    Duty cycle factor for an appliance type
+
     Duty cycle accounts for the fact that appliances don't run continuously.
     - Refrigerators: 50-70% (default 0.6)
     - AC units: Based on usage hours (already accounted in hours_per_day)
     - Other: 1.0 (no adjustment)
     """
-    if appliance_type.lower() in ["fridge", "freezer", "refrigerator"]:
-        return get_setting_value(db, "fridge_duty_cycle", 0.6)
-    # AC and other appliances: duty cycle is already reflected in hours_per_day
+    if appliance_type.lower() in _FRIDGE_TYPES:
+        return factors.fridge_duty_cycle
     return 1.0
 
 
-def calculate_appliance_daily_kwh(
+def appliance_daily_kwh(
     power_value: float,
     power_unit: str,
     quantity: int,
     hours_per_day: float,
     appliance_type: str,
-    db: Session
+    factors: LoadFactors,
 ) -> float:
-    """
-    Calculate daily kWh for a single appliance
-    
-    Steps:
-    1. Convert power to Watts (handle HP, kW, W)
-    2. Apply duty cycle if applicable
-    3. Calculate: daily_kwh = (power_w * quantity * hours_per_day * duty_cycle) / 1000
-    """
-    # Convert to Watts
-    if power_unit.upper() == "HP":
-        power_watts = hp_to_watts(power_value, db, appliance_type)
-    elif power_unit.upper() == "KW":
-        power_watts = power_value * 1000
-    else:  # W
-        power_watts = power_value
-    
-    # Get duty cycle
-    duty_cycle = get_duty_cycle(db, appliance_type)
-    
-    # Calculate daily kWh
-    daily_wh = power_watts * quantity * hours_per_day * duty_cycle
-    daily_kwh = daily_wh / 1000
-    
-    return round(daily_kwh, 3)
+    """daily_kwh = power_w * quantity * hours_per_day * duty_cycle / 1000, rounded to 3 places"""
+    power_watts = appliance_power_watts(power_value, power_unit, appliance_type, factors)
+    daily_wh = power_watts * quantity * hours_per_day * appliance_duty_cycle(appliance_type, factors)
+    return round(daily_wh / 1000, 3)
 
 
-def preview_load_from_lines(
-    db: Session,
-    lines: List[dict],
-    apply_diversity_factor: bool = True,
-) -> dict:
+def preview_load(lines: List[dict], factors: LoadFactors, apply_diversity_factor: bool = True) -> dict:
     """
-    Stateless daily kWh preview for anonymous/public tools — same math as project appliances,
-    no DB rows and no commit.
+    Stateless daily kWh preview for anonymous/public tools — same math as project appliances.
     Each line: power_value, power_unit (str), quantity, hours_per_day, appliance_type (str);
     optional label / description for display.
     """
     enriched: List[dict] = []
     total_raw = 0.0
     for i, line in enumerate(lines):
-        pv = float(line["power_value"])
-        pu = str(line["power_unit"])
-        qty = int(line["quantity"])
-        h = float(line["hours_per_day"])
         at = str(line["appliance_type"])
-        dk = calculate_appliance_daily_kwh(pv, pu, qty, h, at, db)
+        dk = appliance_daily_kwh(
+            float(line["power_value"]),
+            str(line["power_unit"]),
+            int(line["quantity"]),
+            float(line["hours_per_day"]),
+            at,
+            factors,
+        )
         total_raw += dk
         label = line.get("label") or line.get("description") or at
         enriched.append(
@@ -114,7 +127,7 @@ def preview_load_from_lines(
                 "daily_kwh": dk,
             }
         )
-    diversity = get_setting_value(db, "load_diversity_factor", 0.65)
+    diversity = factors.load_diversity_factor
     total_div = total_raw * diversity if apply_diversity_factor else total_raw
     out = {
         "lines": enriched,
@@ -127,6 +140,52 @@ def preview_load_from_lines(
     return out
 
 
+def hp_to_watts(hp: float, db: Session, appliance_type: str = "ac") -> float:
+    """
+    Convert HP to Watts
+    
+    For AC units: 1 HP ≈ 900W (accounts for compressor efficiency)
+    For motors/pumps: 1 HP ≈ 746W (standard conversion)
+    """
+    return appliance_power_watts(hp, "HP", appliance_type, get_load_factors(db))
+
+
+def get_duty_cycle(db: Session, appliance_type: str) -> float:
+    """Get duty cycle factor for an appliance type (see appliance_duty_cycle)"""
+    return appliance_duty_cycle(appliance_type, get_load_factors(db))
+
+
+def calculate_appliance_daily_kwh(
+    power_value: float,
+    power_unit: str,
+    quantity: int,
+    hours_per_day: float,
+    appliance_type: str,
+    db: Session
+) -> float:
+    """
+    Calculate daily kWh for a single appliance
+    
+    Steps:
+    1. Convert power to Watts (handle HP, kW, W)
+    2. Apply duty cycle if applicable
+    3. Calculate: daily_kwh = (power_w * quantity * hours_per_day * duty_cycle) / 1000
+    """
+    return appliance_daily_kwh(power_value, power_unit, quantity, hours_per_day, appliance_type, get_load_factors(db))
+
+
+def preview_load_from_lines(
+    db: Session,
+    lines: List[dict],
+    apply_diversity_factor: bool = True,
+) -> dict:
+    """
+    preview_load with the current settings' factors. No DB rows and no commit;
+    the database is read only when the settings snapshot is stale.
+    """
+    return preview_load(lines, get_load_factors(db), apply_diversity_factor=apply_diversity_factor)
+
+
 def calculate_total_daily_kwh(db: Session, project_id: int, apply_diversity_factor: bool = True) -> float:
     """
     Calculate total daily kWh for all appliances in a project
@@ -141,6 +200,7 @@ def calculate_total_daily_kwh(db: Session, project_id: int, apply_diversity_fact
         Total daily kWh consumption (adjusted for diversity if enabled)
     """
     appliances = db.query(Appliance).filter(Appliance.project_id == project_id).all()
+    factors = get_load_factors(db)
     
     total_kwh = 0.0
     for appliance in appliances:
@@ -148,13 +208,13 @@ def calculate_total_daily_kwh(db: Session, project_id: int, apply_diversity_fact
             total_kwh += appliance.daily_kwh
         else:
             # Calculate if not already calculated
-            daily_kwh = calculate_appliance_daily_kwh(
+            daily_kwh = appliance_daily_kwh(
                 appliance.power_value,
                 appliance.power_unit.value,
                 appliance.quantity,
                 appliance.hours_per_day,
                 appliance.appliance_type.value,
-                db
+                factors
             )
             appliance.daily_kwh = daily_kwh
             total_kwh += daily_kwh
@@ -162,7 +222,7 @@ def calculate_total_daily_kwh(db: Session, project_id: int, apply_diversity_fact
     # Apply load diversity factor to account for realistic simultaneous usage
     # Not all appliances will be on at the same time - people manage their usage
     if apply_diversity_factor:
-        diversity_factor = get_setting_value(db, "load_diversity_factor", 0.65)  # Default 65% simultaneous usage
+        diversity_factor = factors.load_diversity_factor  # Default 65% simultaneous usage
         total_kwh = total_kwh * diversity_factor
     
     db.commit()
@@ -0,0 +1,200 @@
+"""
+Peak Sun Hours Location Resolver
+
+Resolves a free-text location ("Accra", "kumasi, ghana", "Tamale ") to a
+``PeakSunHours`` row using an in-memory normalized index instead of
+``ILIKE '%x%'`` scans. Match priority is deterministic:
+
+1. exact city, 2. exact state, 3. exact country,
+4. city prefix, 5. state prefix, 6. country prefix,
+7. city substring, 8. state substring, 9. country substring,
+10. trigram similarity on city, then state (typos such as "Acra").
+
+Ties go to the lowest row id. Resolved strings are kept in an LRU. The index
+is rebuilt after the peak-sun-hours endpoints in ``routers/settings.py`` call
+``bump_location_index_version()``.
+"""
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import PeakSunHours
+from app.services.versioned_cache import VersionedCache
+
+LOCATION_INDEX_MAX_AGE_SEC = 300.0
+LOCATION_LRU_SIZE = 2048
+TRIGRAM_MIN_SIMILARITY = 0.45
+
+_FIELDS = ("city", "state", "country")
+_WS = re.compile(r"\s+")
+
+
+def normalize_location(value: Optional[str]) -> str:
+    """Lowercase, strip accents and collapse whitespace."""
+    if not value:
+        return ""
+    text = unicodedata.normalize("NFKD", value)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _WS.sub(" ", text).strip().lower()
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True, slots=True)
+class LocationMatch:
+    id: int
+    city: Optional[str]
+    state: Optional[str]
+    country: Optional[str]
+    peak_sun_hours: float
+
+
+class _FieldIndex:
+    """Exact, prefix, substring (suffix) and trigram lookups over one normalized column."""
+
+    def __init__(self, rows: List[LocationMatch], field: str):
+        self.exact: Dict[str, int] = {}
+        names: List[Tuple[str, int]] = []
+        for pos, row in enumerate(rows):
+            name = normalize_location(getattr(row, field))
+            if not name:
+                continue
+            self.exact.setdefault(name, pos)
+            names.append((name, pos))
+        names.sort()
+        self.sorted_names = [n for n, _ in names]
+        self.sorted_pos = [p for _, p in names]
+
+        # Every suffix of every name, sorted: a substring is a prefix of some suffix
+        suffixes = sorted(
+            (name[start:], pos) for name, pos in self.exact.items() for start in range(len(name))
+        )
+        self.sorted_suffixes = [sfx for sfx, _ in suffixes]
+        self.suffix_pos = [p for _, p in suffixes]
+
+        # Trigram inverted index: trigram -> {name}
+        self.trigrams: Dict[str, Set[str]] = {}
+        self.name_trigrams: Dict[str, Set[str]] = {}
+        for name in self.exact:
+            grams = _trigrams(name)
+            self.name_trigrams[name] = grams
+            for g in grams:
+                self.trigrams.setdefault(g, set()).add(name)
+
+    def prefix(self, query: str) -> Optional[int]:
+        start = bisect_left(self.sorted_names, query)
+        best = None
+        for i in range(start, len(self.sorted_names)):
+            if not self.sorted_names[i].startswith(query):
+                break
+            pos = self.sorted_pos[i]
+            best = pos if best is None else min(best, pos)
+        return best
+
+    def substring(self, query: str) -> Optional[int]:
+        start = bisect_left(self.sorted_suffixes, query)
+        best = None
+        for i in range(start, len(self.sorted_suffixes)):
+            if not self.sorted_suffixes[i].startswith(query):
+                break
+            pos = self.suffix_pos[i]
+            best = pos if best is None else min(best, pos)
+        return best
+
+    def similar(self, query: str) -> Optional[Tuple[float, int]]:
+        grams = _trigrams(query)
+        shared: Dict[str, int] = {}
+        for g in grams:
+            for name in self.trigrams.get(g, ()):
+                shared[name] = shared.get(name, 0) + 1
+        # Jaccard >= threshold needs at least threshold * |query trigrams| in common
+        min_common = math.ceil(TRIGRAM_MIN_SIMILARITY * len(grams))
+        best: Optional[Tuple[float, int]] = None
+        for name, common in shared.items():
+            if common < min_common:
+                continue
+            score = common / len(grams | self.name_trigrams[name])
+            if score < TRIGRAM_MIN_SIMILARITY:
+                continue
+            pos = self.exact[name]
+            if best is None or score > best[0] or (score == best[0] and pos < best[1]):
+                best = (score, pos)
+        return best
+
+
+class LocationIndex:
+    """Immutable index over the peak sun hours table, with an LRU of resolved strings."""
+
+    def __init__(self, rows: List[LocationMatch]):
+        self.rows = sorted(rows, key=lambda r: r.id)
+        self.fields = {field: _FieldIndex(self.rows, field) for field in _FIELDS}
+        self.resolve = lru_cache(maxsize=LOCATION_LRU_SIZE)(self._resolve)
+
+    def _match(self, query: str) -> Optional[int]:
+        for field in _FIELDS:
+            pos = self.fields[field].exact.get(query)
+            if pos is not None:
+                return pos
+        for lookup in ("prefix", "substring"):
+            for field in _FIELDS:
+                pos = getattr(self.fields[field], lookup)(query)
+                if pos is not None:
+                    return pos
+        for field in ("city", "state"):
+            hit = self.fields[field].similar(query)
+            if hit is not None:
+                return hit[1]
+        return None
+
+    def _resolve(self, location: str) -> Optional[LocationMatch]:
+        query = normalize_location(location)
+        if not query:
+            return None
+        pos = self._match(query)
+        if pos is None and "," in query:
+            # "Kumasi, Ashanti, Ghana": most specific part first
+            for part in query.split(","):
+                part = part.strip()
+                if part:
+                    pos = self._match(part)
+                    if pos is not None:
+                        break
+        return self.rows[pos] if pos is not None else None
+
+
+def load_location_index(db: Session) -> LocationIndex:
+    """Read the peak sun hours table in one query and build the index (no caching)."""
+    rows = db.query(
+        PeakSunHours.id,
+        PeakSunHours.city,
+        PeakSunHours.state,
+        PeakSunHours.country,
+        PeakSunHours.peak_sun_hours,
+    ).all()
+    return LocationIndex([LocationMatch(*row) for row in rows])
+
+
+_CACHE: VersionedCache[LocationIndex] = VersionedCache(
+    load_location_index, max_age_sec=LOCATION_INDEX_MAX_AGE_SEC
+)
+
+
+def bump_location_index_version() -> int:
+    """Invalidate the index after a peak sun hours write. Returns the new version."""
+    return _CACHE.bump()
+
+
+def resolve_location(db: Session, location: Optional[str]) -> Optional[LocationMatch]:
+    """Best peak sun hours row for a free-text location, or None."""
+    if not location:
+        return None
+    return _CACHE.get(db).resolve(location)
@@ -1,6 +1,6 @@
 """
 Idempotent completion of e-commerce orders after Paystack success.
-Validates charged amount (pesewas) matches order total; deducts stock once; sends emails once.
+Validates charged amount (pesewas) matches order total; deducts stock once; queues emails once.
 """
 from __future__ import annotations
 
@@ -49,16 +49,9 @@ def order_amount_matches_paystack_kobo(order: Order, amount_kobo: int | None) ->
     return abs(int(amount_kobo) - expected) <= 1
 
 
-def send_paid_order_emails(order: Order, notify_admin: bool = False) -> None:
-    """
-    Customer confirmation when payment completes.
-    Admin is notified on order create; set notify_admin=True only if you need a second admin ping.
-    """
-    from app.services.email_service import email_service
-    from app.config import settings
-    import os
-
-    order_dict = {
+def order_email_dict(order: Order) -> dict:
+    """Order fields used by the order email templates"""
+    return {
         "order_number": order.order_number,
         "customer_name": order.customer_name or "Customer",
         "customer_email": order.customer_email,
@@ -76,13 +69,43 @@ def send_paid_order_emails(order: Order, notify_admin: bool = False) -> None:
         ],
     }
 
-    if order.customer_email:
-        email_service.send_order_confirmation(order_dict, order.customer_email)
+
+def queue_order_emails(
+    db: Session,
+    order: Order,
+    event: str,
+    notify_customer: bool = True,
+    notify_admin: bool = False,
+) -> None:
+    """
+    Queue the customer confirmation and/or admin notification for an order event
+    ("created", "paid") in the outbox, in the caller's transaction.
+    Idempotency keys are per order and event, so repeats queue nothing.
+    """
+    from app.services.email_service import email_service
+    from app.services.email_outbox import enqueue_email
+    from app.config import settings
+    import os
+
+    order_dict = order_email_dict(order)
+
+    if notify_customer and order.customer_email:
+        subject, html = email_service.compose_order_confirmation(order_dict)
+        enqueue_email(db, f"order-{event}:{order.id}:customer", "order_confirmation", order.customer_email, subject, html)
 
     if notify_admin:
         admin_email = os.getenv("ADMIN_EMAIL", settings.COMPANY_EMAIL)
         if admin_email:
-            email_service.send_admin_notification(order_dict, admin_email)
+            subject, html = email_service.compose_admin_notification(order_dict)
+            enqueue_email(db, f"order-{event}:{order.id}:admin", "admin_order_notification", admin_email, subject, html)
+
+
+def queue_paid_order_emails(db: Session, order: Order, notify_admin: bool = False) -> None:
+    """
+    Customer confirmation when payment completes (delivered by the outbox dispatcher).
+    Admin is notified on order create; set notify_admin=True only if you need a second admin ping.
+    """
+    queue_order_emails(db, order, "paid", notify_admin=notify_admin)
 
 
 def finalize_order_paid_from_paystack(
@@ -92,9 +115,11 @@ def finalize_order_paid_from_paystack(
     amount_kobo: int | None,
 ) -> Tuple[bool, str]:
     """
-    Mark order paid, deduct stock (idempotent), send emails once.
+    Mark order paid, deduct stock (idempotent), queue emails once (same transaction).
     Returns (ok, error_message). On ok=False, caller should not commit payment state.
+    The order row is locked and re-read first, so webhook and verify finalize it once.
     """
+    db.refresh(order, with_for_update=True)
     if order.payment_status == "paid":
         return True, ""
 
@@ -113,6 +138,6 @@ def finalize_order_paid_from_paystack(
     order.paid_at = datetime.now()
 
     deduct_stock_on_order_paid(db, order.id)
-    send_paid_order_emails(order)
+    queue_paid_order_emails(db, order)
 
     return True, ""
@@ -0,0 +1,240 @@
+"""
+Monte Carlo Grid-Outage Autonomy
+
+``calculate_sizing`` sizes the battery for a fixed ``backup_hours``. Real
+outages ("dumsor") vary in start time and length, so this module draws
+thousands of outage schedules and runs each through a battery state-of-charge
+model on the project's essential load:
+
+- start hour: weighted by hour of day (default uniform)
+- duration: lognormal (median, sigma), exponential (median) or uniform
+  (0 to max), capped at max_outage_hours
+- state of charge at the start: uniform between initial_soc_min and _max
+- PV during the outage: daylight hours recharge the battery, scaled by a
+  randomly drawn day of the year (seasonal and cloud variation)
+
+All trials step through the outage hours together as NumPy arrays. Reported:
+the probability that a given battery rides through (no unmet essential load
+before power returns) and the smallest capacity that does so for the target
+share of outages. A trial that starts at or below the depth-of-discharge
+floor and that PV can't carry fails at any capacity; such trials are counted
+as infeasible and need an unbounded capacity in the percentile. When more
+than 1 - target_percentile of trials are infeasible, no battery meets the
+target: the capacities are None and ``target_unreachable`` is set. 10k trials
+run in roughly 0.1 s.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.energy_simulation import (
+    HOURS_PER_DAY,
+    RESIDENTIAL_LOAD_SHAPE,
+    SimulationParams,
+    daily_irradiance_factors,
+    daylight_shape,
+)
+from app.services.settings_cache import SettingsSnapshot
+
+OUTAGE_DISTRIBUTIONS = ("lognormal", "exponential", "uniform")
+BATTERY_SIZE_STEP_KWH = 5.0  # Recommendations round up like calculate_sizing
+_BISECTION_STEPS = 14
+
+
+@dataclass(frozen=True, slots=True)
+class OutageDistribution:
+    """How outage schedules are drawn."""
+
+    kind: str = "lognormal"
+    median_hours: float = 6.0
+    sigma: float = 0.8  # lognormal shape
+    max_hours: float = 48.0
+    start_hour_weights: Tuple[float, ...] = field(default=(1.0,) * HOURS_PER_DAY)
+    initial_soc_min: float = 0.6
+    initial_soc_max: float = 1.0
+
+    @classmethod
+    def from_settings(cls, cfg: SettingsSnapshot, **overrides) -> "OutageDistribution":
+        """Defaults from the outage_* settings; non-None overrides win."""
+        values = {
+            "kind": cfg.get_str("outage_distribution", "lognormal"),
+            "median_hours": cfg.get_float("outage_median_hours", 6.0),
+            "sigma": cfg.get_float("outage_duration_sigma", 0.8),
+            "max_hours": cfg.get_float("outage_max_hours", 48.0),
+            "initial_soc_min": cfg.get_float("outage_initial_soc_min", 0.6),
+            "initial_soc_max": cfg.get_float("outage_initial_soc_max", 1.0),
+        }
+        values.update({k: v for k, v in overrides.items() if v is not None})
+        if "start_hour_weights" in values:
+            values["start_hour_weights"] = tuple(float(w) for w in values["start_hour_weights"])
+        return cls(**values)
+
+    def validate(self) -> None:
+        if self.kind not in OUTAGE_DISTRIBUTIONS:
+            raise ValueError(f"Unknown outage distribution '{self.kind}' (use one of {', '.join(OUTAGE_DISTRIBUTIONS)})")
+        if self.median_hours <= 0 or self.max_hours <= 0:
+            raise ValueError("Outage median and max hours must be positive")
+        if len(self.start_hour_weights) != HOURS_PER_DAY or min(self.start_hour_weights) < 0 \
+                or sum(self.start_hour_weights) <= 0:
+            raise ValueError("start_hour_weights needs 24 non-negative weights with a positive sum")
+        if not 0 <= self.initial_soc_min <= self.initial_soc_max <= 1:
+            raise ValueError("Initial state of charge range must satisfy 0 <= min <= max <= 1")
+
+    def sample(self, rng: np.random.Generator, trials: int) -> Dict[str, np.ndarray]:
+        """Draw start hour, duration (hours), initial SOC and day-of-year irradiance factor per trial."""
+        weights = np.asarray(self.start_hour_weights, dtype=float)
+        start = rng.choice(HOURS_PER_DAY, size=trials, p=weights / weights.sum())
+        if self.kind == "lognormal":
+            duration = self.median_hours * np.exp(self.sigma * rng.standard_normal(trials))
+        elif self.kind == "exponential":
+            duration = rng.exponential(self.median_hours / math.log(2), trials)
+        else:
+            duration = rng.uniform(0.0, self.max_hours, trials)
+        days = daily_irradiance_factors()
+        return {
+            "start_hour": start,
+            "duration": np.minimum(duration, self.max_hours),
+            "initial_soc": rng.uniform(self.initial_soc_min, self.initial_soc_max, trials),
+            "day_factor": days[rng.integers(0, days.shape[0], trials)],
+        }
+
+
+class _OutageTrials:
+    """Per-trial hourly essential load and PV during the outage (trials × hours)."""
+
+    __slots__ = ("load", "pv", "weight", "initial_soc", "duration", "active")
+
+    def __init__(self, samples: Dict[str, np.ndarray], essential_daily_kwh: float, pv_daily_kwh: float):
+        # Longest outages first, so the trials still running at step h are a prefix
+        order = np.argsort(-samples["duration"], kind="stable")
+        samples = {name: values[order] for name, values in samples.items()}
+        self.duration = samples["duration"]
+        self.initial_soc = samples["initial_soc"]
+        steps = max(1, int(math.ceil(float(self.duration.max()))))
+        self.active = [int(np.count_nonzero(self.duration > h)) for h in range(steps)]
+        hours = (samples["start_hour"][:, None] + np.arange(steps)[None, :]) % HOURS_PER_DAY
+        # Fraction of each step inside the outage (last hour may be partial)
+        self.weight = np.clip(self.duration[:, None] - np.arange(steps)[None, :], 0.0, 1.0)
+        shape = np.asarray(RESIDENTIAL_LOAD_SHAPE, dtype=float)
+        self.load = (shape / shape.sum() * essential_daily_kwh)[hours] * self.weight
+        self.pv = (daylight_shape() * pv_daily_kwh)[hours] * samples["day_factor"][:, None] * self.weight
+
+    def ride_through(self, capacity_kwh: np.ndarray, params: SimulationParams) -> np.ndarray:
+        """True per trial if a battery of capacity_kwh (per trial) never runs short."""
+        capacity = np.broadcast_to(np.asarray(capacity_kwh, dtype=float), self.duration.shape)
+        floor = capacity * (1.0 - params.battery_dod)
+        max_power = capacity * params.battery_c_rate
+        level = np.maximum(capacity * self.initial_soc, floor)
+        ok = np.ones(self.duration.shape, dtype=bool)
+        eff_c = params.battery_charge_efficiency
+        eff_d = params.battery_discharge_efficiency
+        for h, n in enumerate(self.active):
+            # Only trials whose outage is still running
+            load = self.load[:n, h]
+            pv = self.pv[:n, h]
+            limit = max_power[:n] * self.weight[:n, h]
+            direct = np.minimum(pv, load)
+            deficit = load - direct
+            cur = level[:n]
+            charge = np.minimum(np.minimum(pv - direct, limit), (capacity[:n] - cur) / eff_c)
+            discharge = np.minimum(np.minimum(deficit, limit), (cur - floor[:n]) * eff_d)
+            level[:n] = cur + charge * eff_c - discharge / eff_d
+            ok[:n] &= deficit - discharge <= 1e-9
+        return ok
+
+    def required_capacity(self, params: SimulationParams) -> np.ndarray:
+        """
+        Smallest capacity per trial that rides through (vectorized bisection);
+        NaN for trials no capacity rides through.
+        """
+        usable_start = self.initial_soc - (1.0 - params.battery_dod)
+        energy = self.load.sum(axis=1) / params.battery_discharge_efficiency
+        peak = (self.load / np.maximum(self.weight, 1e-9)).max(axis=1)
+        # Upper bound ignoring PV: all energy from the initial charge, peak within C-rate.
+        # Starting at the floor there is no initial charge; only PV can carry the
+        # trial, so the bound just leaves room to store a full discharge of it
+        initial = np.where(usable_start > 0, usable_start, params.battery_dod)
+        hi = np.maximum(energy / initial, peak / params.battery_c_rate) * 1.01 + 1e-6
+        feasible = self.ride_through(hi, params)
+        lo = np.zeros_like(hi)
+        for _ in range(_BISECTION_STEPS):
+            mid = (lo + hi) / 2
+            ok = self.ride_through(mid, params)
+            hi = np.where(ok, mid, hi)
+            lo = np.where(ok, lo, mid)
+        return np.where(feasible, hi, np.nan)
+
+
+def run_outage_analysis(
+    essential_daily_kwh: float,
+    pv_kw: float,
+    peak_sun_hours: float,
+    battery_kwh: Optional[float],
+    params: SimulationParams,
+    distribution: OutageDistribution = OutageDistribution(),
+    trials: int = 10000,
+    target_percentile: float = 0.95,
+    seed: Optional[int] = None,
+    min_battery_kwh: float = 0.0,
+    candidate_capacities: Sequence[float] = (),
+) -> Dict:
+    """
+    Ride-through probability for battery_kwh and the capacity needed to reach target_percentile
+
+    pv_kw is the array's DC size; its output on an average day is
+    pv_kw × peak_sun_hours × system_efficiency.
+    """
+    distribution.validate()
+    if not 0 < target_percentile <= 1:
+        raise ValueError("target_percentile must be in (0, 1]")
+    rng = np.random.default_rng(seed)
+    samples = distribution.sample(rng, trials)
+    outage = _OutageTrials(samples, essential_daily_kwh, pv_kw * peak_sun_hours * params.system_efficiency)
+
+    required = outage.required_capacity(params)
+    unbounded = np.isnan(required)
+    infeasible = int(unbounded.sum())
+    # Infeasible trials need an infinite battery, so they count against the target
+    needed = float(np.quantile(np.where(unbounded, np.inf, required), target_percentile, method="higher"))
+    target_unreachable = not math.isfinite(needed)
+    if target_unreachable:
+        needed = recommended = None
+    else:
+        recommended = max(min_battery_kwh, math.ceil(needed / BATTERY_SIZE_STEP_KWH) * BATTERY_SIZE_STEP_KWH)
+
+    durations = samples["duration"]
+    result = {
+        "trials": trials,
+        "distribution": {
+            "kind": distribution.kind,
+            "median_hours": distribution.median_hours,
+            "sigma": distribution.sigma,
+            "max_hours": distribution.max_hours,
+            "initial_soc_min": distribution.initial_soc_min,
+            "initial_soc_max": distribution.initial_soc_max,
+        },
+        "outage_hours_percentiles": {
+            f"p{p}": round(float(np.percentile(durations, p)), 2) for p in (50, 90, 95, 99)
+        },
+        "essential_daily_kwh": round(essential_daily_kwh, 3),
+        "target_percentile": target_percentile,
+        # Over all trials; None when too many fail at any capacity to meet the target
+        "required_capacity_kwh": round(needed, 2) if needed is not None else None,
+        "recommended_capacity_kwh": recommended,
+        "target_unreachable": target_unreachable,
+        "infeasible_trials": infeasible,
+        "infeasible_share": round(infeasible / trials, 4),
+        "battery_capacity_kwh": battery_kwh,
+        "ride_through_probability": None,
+        "candidates": [],
+    }
+    if battery_kwh:
+        result["ride_through_probability"] = round(float(outage.ride_through(battery_kwh, params).mean()), 4)
+    for capacity in candidate_capacities:
+        result["candidates"].append({
+            "capacity_kwh": capacity,
+            "ride_through_probability": round(float(outage.ride_through(capacity, params).mean()), 4),
+        })
+    return result
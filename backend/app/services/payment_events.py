@@ -0,0 +1,186 @@
+"""
+Payment Events
+
+The Paystack webhook answers as soon as the event is safely stored: after
+verifying the signature it inserts the raw body into the append-only
+``payment_events`` table and returns 200, without touching orders, stock or
+email. A background worker started with the app applies stored events in
+arrival order.
+
+Each event has a unique key (provider, event type and reference), and the
+insert is ``ON CONFLICT DO NOTHING``. A redelivery of an event already
+received therefore costs one indexed insert and never wakes the worker, so
+repeated deliveries collapse to a single state change. Applying an event
+locks the order row and goes through ``finalize_order_paid_from_paystack``,
+which is idempotent against the verify endpoint finalizing the same order.
+
+Outcomes: ``processed`` (order paid, or it already was), ``ignored`` (event
+type we don't act on, unknown reference) or ``rejected`` (amount mismatch).
+Unexpected errors roll back and are retried with backoff until
+``PAYMENT_EVENTS_MAX_ATTEMPTS``, then the event is marked ``failed``.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import insert_ignore
+from app.models_ecommerce import Order, PaymentEvent
+from app.services.background_worker import PollingWorker, backoff_delay_sec
+from app.services.order_payment import finalize_order_paid_from_paystack
+
+logger = logging.getLogger(__name__)
+
+EVENT_RECEIVED = "received"
+EVENT_PROCESSING = "processing"
+EVENT_PROCESSED = "processed"
+EVENT_IGNORED = "ignored"
+EVENT_REJECTED = "rejected"
+EVENT_FAILED = "failed"
+
+CLAIM_LEASE_SEC = 120
+
+
+def paystack_event_key(event_type: str, data: dict, body: bytes) -> str:
+    """One key per Paystack event: type plus transaction reference (or id, or body hash)."""
+    identity = data.get("reference") or data.get("id") or hashlib.sha256(body).hexdigest()
+    return f"paystack:{event_type}:{identity}"
+
+
+def record_paystack_event(db: Session, body: bytes, payload: dict) -> bool:
+    """
+    Store a verified webhook body and commit. Returns False if the event was already stored.
+    """
+    event_type = str(payload.get("event") or "unknown")
+    data = payload.get("data") or {}
+    if not isinstance(data, dict):
+        data = {}
+    reference = data.get("reference")
+    values = {
+        "provider": "paystack",
+        "event_key": paystack_event_key(event_type, data, body),
+        "event_type": event_type,
+        "reference": str(reference) if reference is not None else None,
+        "payload": body.decode("utf-8"),
+        "status": EVENT_RECEIVED,
+        "attempts": 0,
+        "next_attempt_at": datetime.utcnow(),
+    }
+
+    inserted = insert_ignore(db, PaymentEvent, values, ["event_key"])
+    if inserted:
+        _worker.wake_after_commit(db)
+    db.commit()
+    return inserted
+
+
+def claim_due(db: Session, batch_size: int, now: Optional[datetime] = None) -> List[PaymentEvent]:
+    """Lease up to batch_size due events, oldest first, and commit."""
+    now = now or datetime.utcnow()
+    events = db.query(PaymentEvent).filter(
+        or_(
+            and_(PaymentEvent.status == EVENT_RECEIVED, PaymentEvent.next_attempt_at <= now),
+            and_(PaymentEvent.status == EVENT_PROCESSING, PaymentEvent.locked_until < now),
+        )
+    ).order_by(PaymentEvent.id).limit(batch_size).with_for_update(skip_locked=True).all()
+    for event in events:
+        event.status = EVENT_PROCESSING
+        event.locked_until = now + timedelta(seconds=CLAIM_LEASE_SEC)
+        event.attempts = (event.attempts or 0) + 1
+    db.commit()
+    return events
+
+
+def apply_paystack_event(db: Session, event: PaymentEvent) -> Tuple[str, str]:
+    """Apply one event in the caller's transaction. Returns (status, result)."""
+    if event.event_type != "charge.success":
+        return EVENT_IGNORED, f"Event type {event.event_type} not handled"
+    if not event.reference:
+        return EVENT_IGNORED, "No reference"
+
+    order = db.query(Order).filter(Order.order_number == event.reference).with_for_update().first()
+    if not order:
+        return EVENT_IGNORED, "No order for reference"
+    if order.payment_status == "paid":
+        return EVENT_PROCESSED, "Order already paid"
+
+    data = json.loads(event.payload).get("data") or {}
+    ok, err = finalize_order_paid_from_paystack(db, order, event.reference, data.get("amount"))
+    if not ok:
+        logger.error("Paystack event %s: could not finalize order %s: %s", event.id, event.reference, err)
+        return EVENT_REJECTED, err
+    return EVENT_PROCESSED, "Payment confirmed"
+
+
+def _mark_failed_attempt(event: PaymentEvent, error: Exception) -> None:
+    event.result = f"{type(error).__name__}: {error}"[:2000]
+    event.locked_until = None
+    if event.attempts >= settings.PAYMENT_EVENTS_MAX_ATTEMPTS:
+        event.status = EVENT_FAILED
+        logger.error("Payment event %s (%s) failed permanently: %s", event.id, event.event_key, event.result)
+    else:
+        event.status = EVENT_RECEIVED
+        event.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_delay_sec(
+            event.attempts, settings.PAYMENT_EVENTS_BACKOFF_BASE_SEC, settings.PAYMENT_EVENTS_BACKOFF_MAX_SEC,
+        ))
+        logger.warning("Payment event %s (%s) attempt %d failed: %s", event.id, event.event_key, event.attempts, event.result)
+
+
+def process_event(db: Session, event: PaymentEvent) -> str:
+    """Apply one claimed event and commit its outcome with the order changes. Returns the status."""
+    event_id = event.id
+    try:
+        status, result = apply_paystack_event(db, event)
+        event.status = status
+        event.result = result
+        event.locked_until = None
+        event.processed_at = datetime.utcnow()
+        db.commit()
+        return status
+    except Exception as e:
+        db.rollback()
+        event = db.get(PaymentEvent, event_id)
+        _mark_failed_attempt(event, e)
+        db.commit()
+        return event.status
+
+
+def process_once(batch_size: Optional[int] = None) -> int:
+    """Apply one batch of due events. Returns how many were claimed."""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        events = claim_due(db, batch_size or settings.PAYMENT_EVENTS_BATCH_SIZE)
+        for event in events:
+            process_event(db, event)
+        return len(events)
+    finally:
+        db.close()
+
+
+class PaymentEventWorker(PollingWorker):
+    """Background task applying stored payment events; woken when the webhook stores a new one."""
+
+    name = "Payment event worker"
+
+    @property
+    def batch_size(self) -> int:
+        return settings.PAYMENT_EVENTS_BATCH_SIZE
+
+    async def run_batch(self) -> int:
+        # Order locks and stock updates block; keep them off the event loop serving webhooks
+        return await asyncio.to_thread(process_once)
+
+
+_worker = PaymentEventWorker(poll_sec=settings.PAYMENT_EVENTS_POLL_SEC)
+
+
+def get_payment_event_worker() -> PaymentEventWorker:
+    return _worker
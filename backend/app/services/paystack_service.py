@@ -1,18 +1,150 @@
 """
 Paystack Payment Service
 Handles Paystack payment integration for Ghana
+
+API calls share one keep-alive ``requests.Session`` (pooled TLS connections)
+and always run with connect/read timeouts. A circuit breaker counts
+consecutive connection errors, timeouts and 5xx responses: after
+``PAYSTACK_BREAKER_FAILURES`` of them calls fail fast with
+``PaystackUnavailable`` for ``PAYSTACK_BREAKER_RESET_SEC`` before one trial
+call is let through. Verify results are cached briefly per reference, so the
+success page polling ``/paystack/verify/{reference}`` doesn't call Paystack on
+every poll.
 """
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
 import requests
-from typing import Dict, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from app.config import settings
 
 PAYSTACK_BASE_URL = "https://api.paystack.co"
 
+_VERIFY_CACHE_MAX_ENTRIES = 1024
+
+
+class PaystackError(Exception):
+    """Paystack API call failed"""
+
+
+class PaystackUnavailable(PaystackError):
+    """Paystack is failing or the circuit breaker is open; try again shortly"""
+
+
+class CircuitBreaker:
+    """Closed -> open after failure_threshold consecutive failures -> half-open (one trial) after reset_sec"""
+
+    def __init__(self, failure_threshold: int, reset_sec: float):
+        self.failure_threshold = failure_threshold
+        self.reset_sec = reset_sec
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_sec else "open"
+
+    def before_call(self) -> None:
+        """Raise PaystackUnavailable if calls are currently short-circuited."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_sec or self._trial_in_flight:
+                raise PaystackUnavailable("Paystack is temporarily unavailable. Please try again shortly.")
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """Free the half-open trial slot without recording an outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class _TTLCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: Dict, ttl_sec: float) -> None:
+        if ttl_sec <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_sec, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
 
 class PaystackService:
     def __init__(self):
-        self.base_url = PAYSTACK_BASE_URL
+        self.base_url = (settings.PAYSTACK_BASE_URL or PAYSTACK_BASE_URL).rstrip("/")
+        self.timeout = (settings.PAYSTACK_CONNECT_TIMEOUT_SEC, settings.PAYSTACK_READ_TIMEOUT_SEC)
+        self.breaker = CircuitBreaker(settings.PAYSTACK_BREAKER_FAILURES, settings.PAYSTACK_BREAKER_RESET_SEC)
+        self.verify_cache = _TTLCache(_VERIFY_CACHE_MAX_ENTRIES)
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """Shared keep-alive session, created on first use"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # Retry only a connection that dropped before the request was sent
+                    retry = Retry(total=1, connect=1, read=0, status=0, redirect=0)
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=settings.PAYSTACK_POOL_SIZE,
+                        max_retries=retry,
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def close(self) -> None:
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
 
     @property
     def secret_key(self) -> str:
@@ -35,6 +167,34 @@ class PaystackService:
                 "PAYSTACK_SECRET_KEY is not set. Add it to environment (e.g. Render backend env vars)."
             )
 
+    def _request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        """
+        Call the Paystack API through the pooled session and circuit breaker.
+        Connection errors, timeouts and 5xx count against the breaker; 4xx don't.
+        """
+        self._require_secret()
+        self.breaker.before_call()
+        try:
+            try:
+                response = self.session.request(
+                    method, f"{self.base_url}{path}", json=payload, headers=self.headers, timeout=self.timeout
+                )
+            except requests.exceptions.RequestException as e:
+                self.breaker.record_failure()
+                raise PaystackUnavailable(f"Paystack API error: {str(e)}")
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+                raise PaystackUnavailable(f"Paystack API error: {response.status_code} {response.reason}")
+            self.breaker.record_success()
+        finally:
+            # Any other exception must not leave the half-open trial taken forever
+            self.breaker.release_trial()
+        try:
+            response.raise_for_status()
+            return response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise PaystackError(f"Paystack API error: {str(e)}")
+
     def initialize_transaction(
         self,
         email: str,
@@ -56,9 +216,6 @@ class PaystackService:
         Returns:
             Dict with authorization_url and access_code
         """
-        self._require_secret()
-        url = f"{self.base_url}/transaction/initialize"
-        
         payload = {
             "email": email,
             "amount": amount,
@@ -66,33 +223,32 @@ class PaystackService:
             "callback_url": callback_url,
             "metadata": metadata or {}
         }
-        
-        try:
-            response = requests.post(url, json=payload, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Paystack API error: {str(e)}")
+        return self._request("POST", "/transaction/initialize", payload)
 
     def verify_transaction(self, reference: str) -> Dict:
         """
         Verify a Paystack transaction
         
+        Successful verifications are cached for PAYSTACK_VERIFY_CACHE_SEC and
+        other outcomes (pending, abandoned, failed) for PAYSTACK_VERIFY_PENDING_CACHE_SEC.
+        
         Args:
             reference: Transaction reference
         
         Returns:
             Transaction details
         """
-        self._require_secret()
-        url = f"{self.base_url}/transaction/verify/{reference}"
-        
-        try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Paystack API error: {str(e)}")
+        cached = self.verify_cache.get(reference)
+        if cached is not None:
+            return cached
+        response = self._request("GET", f"/transaction/verify/{quote(reference, safe='')}")
+        succeeded = bool(response.get("status")) and (response.get("data") or {}).get("status") == "success"
+        self.verify_cache.set(
+            reference,
+            response,
+            settings.PAYSTACK_VERIFY_CACHE_SEC if succeeded else settings.PAYSTACK_VERIFY_PENDING_CACHE_SEC,
+        )
+        return response
 
     def verify_webhook_signature(self, payload: bytes, signature: str) -> bool:
         """
@@ -128,22 +284,13 @@ class PaystackService:
         phone: Optional[str] = None
     ) -> Dict:
         """Create a Paystack customer"""
-        self._require_secret()
-        url = f"{self.base_url}/customer"
-        
         payload = {
             "email": email,
             "first_name": first_name or "",
             "last_name": last_name or "",
             "phone": phone or ""
         }
-        
-        try:
-            response = requests.post(url, json=payload, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Paystack API error: {str(e)}")
+        return self._request("POST", "/customer", payload)
 
 
 # Singleton instance
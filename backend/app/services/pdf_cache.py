@@ -0,0 +1,121 @@
+"""
+Content-Addressed PDF Cache
+
+Rendered PDFs are stored on disk under ``<static root>/pdf_cache`` and named
+by a SHA-256 of everything that goes into the document (see
+``pdf_generator.quotation_pdf_cache_key``). Any change to the inputs gives a
+new key, so entries never need invalidating; stale ones simply stop being read
+and are evicted, least recently used first, once the directory grows past
+``PDF_CACHE_MAX_MB``.
+
+Files are written to a temporary name and renamed into place, so concurrent
+workers never read a partial PDF.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.storage import get_static_root
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_SUBDIR = "pdf_cache"
+# After eviction the cache is trimmed to this share of the limit
+EVICT_TO_FRACTION = 0.8
+
+
+def row_values(row) -> Optional[Dict[str, Any]]:
+    """Column values of an ORM row (None for a missing row)."""
+    if row is None:
+        return None
+    return {c.key: getattr(row, c.key) for c in row.__table__.columns}
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable SHA-256 hex digest of JSON-serializable parts (dates, enums, etc. via str)."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PdfCache:
+    """Size-bounded directory of ``<key>.pdf`` files."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Path of the cached PDF, or None. A hit refreshes its mtime (LRU order)."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes) -> Path:
+        """Store data under key atomically, then evict if over the size limit."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(key)
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except Exception:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+        self.evict()
+        return path
+
+    def evict(self) -> int:
+        """Delete least recently used files until under the limit. Returns files removed."""
+        with self._lock:
+            try:
+                entries = [
+                    (e.stat().st_mtime, e.stat().st_size, e.path)
+                    for e in os.scandir(self.directory)
+                    if e.is_file() and e.name.endswith(".pdf") and not e.name.startswith(".tmp-")
+                ]
+            except FileNotFoundError:
+                return 0
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return 0
+            target = self.max_bytes * EVICT_TO_FRACTION
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                    removed += 1
+                except FileNotFoundError:
+                    total -= size
+            if removed:
+                logger.info("PDF cache evicted %d file(s), %.1f MB remain", removed, total / 1e6)
+            return removed
+
+
+_cache: Optional[PdfCache] = None
+
+
+def get_pdf_cache() -> PdfCache:
+    global _cache
+    if _cache is None:
+        _cache = PdfCache(get_static_root() / PDF_CACHE_SUBDIR, settings.PDF_CACHE_MAX_MB * 1024 * 1024)
+    return _cache
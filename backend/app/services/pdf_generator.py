@@ -6,19 +6,13 @@ Generates professional quotation PDFs using WeasyPrint.
 from io import BytesIO
 from typing import Optional
 from pathlib import Path
-import base64
-from jinja2 import Template, Environment
-from weasyprint import HTML
 from sqlalchemy.orm import Session
-from app.models import Quote, Customer, Project, SizingResult as SizingResultModel, Setting, Product, ProductType
-from app.config import settings
-
-
-def format_currency(value):
-    """Format number with commas and 2 decimal places"""
-    if value is None:
-        return "0.00"
-    return f"{float(value):,.2f}"
+from app.services.document_rendering import (
+    RenderedDocument, company_logo_data_uri, find_company_logo, register_template, write_pdf
+)
+from app.services.pdf_cache import fingerprint, get_pdf_cache, row_values
+from app.services.pdf_renderer import render_pdf
+from app.services.quote_document import CompanyProfile, QuoteDocument, load_quote_document
 
 
 QUOTATION_TEMPLATE = """
@@ -512,17 +506,17 @@ QUOTATION_TEMPLATE = """
                 <div class="spec-item">
                     <div class="spec-label">PV Array Capacity</div>
                     <div class="spec-value-container">
-                        <div class="spec-value">{{ ((sizing_result.number_of_panels * sizing_result.panel_wattage) / 1000.0)|round(2) }}</div>
+                        <div class="spec-value">{{ ((sizing_result.number_of_panels * panel_wattage) / 1000.0)|round(2) }}</div>
                         <span>kW</span>
                     </div>
-                    <div class="spec-subtext">{{ sizing_result.number_of_panels }} × {{ sizing_result.panel_wattage }}W panels</div>
+                    <div class="spec-subtext">{{ sizing_result.number_of_panels }} × {{ panel_wattage }}W panels</div>
                 </div>
                 <div class="spec-item">
                     <div class="spec-label">Panel Brand</div>
                     <div class="spec-value-container">
-                        <div class="spec-value">{{ sizing_result.panel_brand }}</div>
+                        <div class="spec-value">{{ panel_brand }}</div>
                     </div>
-                    <div class="spec-subtext">{{ sizing_result.panel_wattage }}W model</div>
+                    <div class="spec-subtext">{{ panel_wattage }}W model</div>
                 </div>
                 <div class="spec-item">
                     <div class="spec-label">Inverter Capacity</div>
@@ -607,6 +601,60 @@ QUOTATION_TEMPLATE = """
 """
 
 
+QUOTATION = register_template("quotation", QUOTATION_TEMPLATE)
+_TEMPLATE_FINGERPRINT = fingerprint(QUOTATION_TEMPLATE)
+
+
+def render_quotation_document(
+    document: QuoteDocument,
+    document_type: str = "quotation"
+) -> RenderedDocument:
+    """
+    Render a loaded quote (body HTML + stylesheet): Quotation or Proforma Invoice.
+    document_type: "quotation" | "proforma_invoice"
+    Proforma Invoice shows the same content with title "PROFORMA INVOICE" and bank details.
+    No database access; layout happens separately (see pdf_renderer.py).
+    """
+    company = document.company
+
+    # Document title and whether to show bank details (Proforma Invoice only)
+    is_proforma = normalize_document_type(document_type) == "proforma_invoice"
+    document_title = "PROFORMA INVOICE" if is_proforma else "QUOTATION"
+
+    # Render template (compiled once at import)
+    return QUOTATION.render(
+        quote=document.quote,
+        sorted_items=document.items,
+        customer=document.customer,
+        project=document.project,
+        sizing_result=document.sizing_result,
+        panel_brand=document.panel_brand,
+        panel_wattage=document.panel_wattage,
+        company_name=company.name,
+        company_address=company.address,
+        company_phone=company.phone,
+        company_email=company.email,
+        # Logo as a base64 data URI for WeasyPrint (cached by file mtime/size)
+        logo_data_uri=company_logo_data_uri(company.logo_url),
+        document_title=document_title,
+        show_bank_details=is_proforma,
+        company_bank_name=company.bank_name,
+        company_account_name=company.account_name,
+        company_account_number=company.account_number,
+        company_bank_branch=company.bank_branch,
+        company_swift_code=company.swift_code,
+    )
+
+
+def build_quotation_document(
+    db: Session,
+    quote_id: int,
+    document_type: str = "quotation"
+) -> RenderedDocument:
+    """Load a quote (see quote_document.py) and render it. Raises ValueError if it doesn't exist."""
+    return render_quotation_document(load_quote_document(db, quote_id), document_type)
+
+
 def generate_quotation_pdf(
     db: Session,
     quote_id: int,
@@ -614,217 +662,70 @@ def generate_quotation_pdf(
 ) -> BytesIO:
     """
     Generate a PDF for a quote: Quotation or Proforma Invoice.
-    document_type: "quotation" | "proforma_invoice"
-    Proforma Invoice shows the same content with title "PROFORMA INVOICE" and bank details.
-    Returns a BytesIO object containing the PDF.
+    Returns a BytesIO object containing the PDF (renders in the calling thread).
     """
-    # Fetch quote with relationships (eagerly load items)
-    from sqlalchemy.orm import joinedload
-    quote = db.query(Quote).options(joinedload(Quote.items)).filter(Quote.id == quote_id).first()
-    if not quote:
-        raise ValueError(f"Quote {quote_id} not found")
-    
-    project = db.query(Project).filter(Project.id == quote.project_id).first()
-    if not project:
-        raise ValueError(f"Project {quote.project_id} not found")
-    
-    customer = db.query(Customer).filter(Customer.id == project.customer_id).first()
-    if not customer:
-        raise ValueError(f"Customer {project.customer_id} not found")
-    
-    sizing_result = db.query(SizingResultModel).filter(
-        SizingResultModel.project_id == project.id
-    ).first()
-    
-    # Get actual panel brand from quote items (source of truth)
-    # This ensures PDF shows what's actually in the quote, not what was in sizing
-    # This prevents mismatches when sizing was done with one brand but quote uses another
-    panel_brand_from_quote = None
-    panel_wattage_from_quote = None
-    if quote.items:
-        for item in quote.items:
-            if item.product_id:
-                product = db.query(Product).filter(Product.id == item.product_id).first()
-                if product and product.product_type == ProductType.PANEL:
-                    # Use product brand first (most reliable)
-                    panel_brand_from_quote = product.brand
-                    panel_wattage_from_quote = product.wattage
-                    
-                    # If product brand is not set, try to extract from description
-                    if not panel_brand_from_quote and item.description:
-                        # Try to extract brand from description like "JA Solar 570W Panel" or "Jinko 580W Panel"
-                        desc_upper = item.description.upper()
-                        # Check for common brands
-                        if 'JA' in desc_upper or 'JA SOLAR' in desc_upper:
-                            panel_brand_from_quote = 'JA'
-                        elif 'JINKO' in desc_upper:
-                            panel_brand_from_quote = 'Jinko'
-                        elif 'LONGI' in desc_upper:
-                            panel_brand_from_quote = 'Longi'
-                        elif 'CANADIAN' in desc_upper:
-                            panel_brand_from_quote = 'Canadian'
-                        elif 'TRINA' in desc_upper:
-                            panel_brand_from_quote = 'Trina'
-                        else:
-                            # Fallback: use first word of description
-                            parts = item.description.split()
-                            if len(parts) > 0:
-                                panel_brand_from_quote = parts[0]
-                    break
-    
-    # Update sizing_result temporarily for PDF display if we found panel info in quote
-    # This ensures System Specifications section shows what's actually in the quote
-    if sizing_result:
-        if panel_brand_from_quote:
-            sizing_result.panel_brand = panel_brand_from_quote
-        if panel_wattage_from_quote:
-            sizing_result.panel_wattage = panel_wattage_from_quote
-    
-    # Document title and whether to show bank details (Proforma Invoice only)
-    is_proforma = (document_type or "").strip().lower() == "proforma_invoice"
-    document_title = "PROFORMA INVOICE" if is_proforma else "QUOTATION"
-    show_bank_details = is_proforma
+    document = build_quotation_document(db, quote_id, document_type)
+    return BytesIO(write_pdf(document.html, document.css, presentational_hints=document.presentational_hints))
+
 
-    # Fetch company settings from database
-    company_name_setting = db.query(Setting).filter(Setting.key == "company_name").first()
-    company_address_setting = db.query(Setting).filter(Setting.key == "company_address").first()
-    company_phone_setting = db.query(Setting).filter(Setting.key == "company_phone").first()
-    company_email_setting = db.query(Setting).filter(Setting.key == "company_email").first()
-    company_logo_url_setting = db.query(Setting).filter(Setting.key == "company_logo_url").first()
-    company_bank_name_setting = db.query(Setting).filter(Setting.key == "company_bank_name").first()
-    company_account_name_setting = db.query(Setting).filter(Setting.key == "company_account_name").first()
-    company_account_number_setting = db.query(Setting).filter(Setting.key == "company_account_number").first()
-    company_bank_branch_setting = db.query(Setting).filter(Setting.key == "company_bank_branch").first()
-    company_swift_code_setting = db.query(Setting).filter(Setting.key == "company_swift_code").first()
+def normalize_document_type(document_type: Optional[str]) -> str:
+    return "proforma_invoice" if (document_type or "").strip().lower() == "proforma_invoice" else "quotation"
 
-    # Get company details (prefer database settings, fallback to config)
-    company_name = company_name_setting.value if company_name_setting else settings.COMPANY_NAME
-    company_address = company_address_setting.value if company_address_setting else settings.COMPANY_ADDRESS
-    company_phone = company_phone_setting.value if company_phone_setting else settings.COMPANY_PHONE
-    company_email = company_email_setting.value if company_email_setting else settings.COMPANY_EMAIL
-    company_bank_name = (company_bank_name_setting.value or "").strip() if company_bank_name_setting else ""
-    company_account_name = (company_account_name_setting.value or "").strip() if company_account_name_setting else ""
-    company_account_number = (company_account_number_setting.value or "").strip() if company_account_number_setting else ""
-    company_bank_branch = (company_bank_branch_setting.value or "").strip() if company_bank_branch_setting else ""
-    company_swift_code = (company_swift_code_setting.value or "").strip() if company_swift_code_setting else ""
-    
-    # Find and encode logo for PDF
-    logo_data_uri = None
-    logo_path = None
-    
-    # First, try to get logo from settings
-    if company_logo_url_setting and company_logo_url_setting.value:
-        logo_url = company_logo_url_setting.value
-        # Remove leading slash if present
-        if logo_url.startswith('/'):
-            logo_url = logo_url[1:]
-        
-        # Try static directory first
-        static_logo = Path("static") / logo_url.split('/')[-1]
-        if static_logo.exists():
-            logo_path = static_logo
-        else:
-            # Try the full path from settings
-            full_path = Path(logo_url)
-            if full_path.exists():
-                logo_path = full_path
-    
-    # If no logo from settings, try default locations
-    if not logo_path:
-        static_dir = Path("static")
-        if static_dir.exists():
-            for logo_file in ["logo.jpg", "logo.png", "logo.jpeg"]:
-                logo_file_path = static_dir / logo_file
-                if logo_file_path.exists():
-                    logo_path = logo_file_path
-                    break
-    
-    # If still no logo, try frontend public directory (mounted in container)
-    if not logo_path:
-        # Try multiple possible paths
-        possible_paths = [
-            Path("frontend_public/logo.jpg"),  # Mounted volume
-            Path("static/logo.jpg"),  # Backend static directory
-            Path("../frontend/public/logo.jpg"),  # Relative path (if not in container)
-            Path("logo.jpg"),  # Current directory
-        ]
-        for possible_path in possible_paths:
-            if possible_path.exists():
-                logo_path = possible_path
-                break
-    
-    # Convert logo to base64 data URI for WeasyPrint
-    if logo_path and logo_path.exists():
+
+def quotation_pdf_cache_key(document: QuoteDocument, document_type: str = "quotation") -> str:
+    """
+    Content hash of everything a quotation PDF is rendered from
+
+    Covers the quote row, its items and their products, project, customer, sizing
+    result, company settings values, the logo file (path, size, mtime), the
+    template and document_type.
+    """
+    company = document.company
+    logo_path = find_company_logo(company.logo_url)
+    logo_stat = None
+    if logo_path:
         try:
-            with open(logo_path, 'rb') as f:
-                logo_data = f.read()
-                # Determine MIME type from extension
-                ext = logo_path.suffix.lower()
-                mime_type = {
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.png': 'image/png',
-                    '.gif': 'image/gif'
-                }.get(ext, 'image/jpeg')
-                logo_base64 = base64.b64encode(logo_data).decode('utf-8')
-                logo_data_uri = f"data:{mime_type};base64,{logo_base64}"
-        except Exception as e:
-            print(f"Error reading logo file: {e}")
-            logo_data_uri = None
-    
-    # Fixed display order: Panel, Inverter, Battery, Mounting, BOS, Transport, Installation (Installation last)
-    def _quote_item_display_order(item):
-        d = (item.description or "").upper()
-        if "PANEL" in d:
-            return 0
-        if "INVERTER" in d:
-            return 1
-        if "BATTERY" in d:
-            return 2
-        if "MOUNTING" in d:
-            return 3
-        if "BOS" in d or "BALANCE OF SYSTEM" in d:
-            return 4
-        if "TRANSPORT" in d or "LOGISTICS" in d:
-            return 5
-        if "INSTALLATION" in d:
-            return 6
-        return 7
+            stat = logo_path.stat()
+            logo_stat = (str(logo_path), stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            pass
 
-    sorted_items = sorted(
-        quote.items or [],
-        key=lambda x: (_quote_item_display_order(x), x.sort_order if x.sort_order is not None else 0),
+    items = sorted(document.items, key=lambda i: i.id)
+    return fingerprint(
+        "quotation-pdf",
+        normalize_document_type(document_type),
+        _TEMPLATE_FINGERPRINT,
+        row_values(document.quote),
+        [row_values(i) for i in items],
+        [row_values(i.product) for i in items],
+        row_values(document.project),
+        row_values(document.customer),
+        row_values(document.sizing_result),
+        [getattr(company, name) for name in CompanyProfile.__slots__],
+        logo_stat,
     )
 
-    # Render template
-    # Create Jinja2 environment with custom filter
-    env = Environment()
-    env.filters['format_currency'] = format_currency
-    template = env.from_string(QUOTATION_TEMPLATE)
-    html_content = template.render(
-        quote=quote,
-        sorted_items=sorted_items,
-        customer=customer,
-        project=project,
-        sizing_result=sizing_result,
-        company_name=company_name,
-        company_address=company_address,
-        company_phone=company_phone,
-        company_email=company_email,
-        logo_data_uri=logo_data_uri,
-        document_title=document_title,
-        show_bank_details=show_bank_details,
-        company_bank_name=company_bank_name,
-        company_account_name=company_account_name,
-        company_account_number=company_account_number,
-        company_bank_branch=company_bank_branch,
-        company_swift_code=company_swift_code,
-    )
-    
-    # Generate PDF
-    pdf_bytes = BytesIO()
-    HTML(string=html_content).write_pdf(pdf_bytes)
-    pdf_bytes.seek(0)
-    
-    return pdf_bytes
 
+async def get_quotation_pdf(
+    db: Session,
+    quote_id: int,
+    document_type: str = "quotation",
+    document: Optional[QuoteDocument] = None,
+) -> Path:
+    """
+    Path of the quotation PDF in the disk cache, rendering it only on a miss
+
+    Pass an already loaded ``document`` to skip the load. The HTML is built
+    here; layout runs in the PDF render pool. Raises ValueError if the quote
+    (or its project/customer) doesn't exist, and RenderQueueFull /
+    RenderTimeout from the render pool.
+    """
+    if document is None:
+        document = load_quote_document(db, quote_id)
+    document_type = normalize_document_type(document_type)
+    key = quotation_pdf_cache_key(document, document_type)
+    cache = get_pdf_cache()
+    path = cache.get(key)
+    if path is not None:
+        return path
+    return cache.put(key, await render_pdf(render_quotation_document(document, document_type)))
@@ -0,0 +1,151 @@
+"""
+PDF Rendering Service
+
+WeasyPrint layout is CPU-bound and takes hundreds of milliseconds, so running
+``HTML(...).write_pdf`` inside an ``async def`` route stalls every other
+request on the worker. Generators therefore build their HTML in the request
+(cheap, needs the database session) and hand only the ``RenderedDocument``
+(HTML + stylesheet text) to ``render_pdf``, which runs the layout in a bounded
+``ProcessPoolExecutor``. Each worker keeps its parsed stylesheets and font
+configuration between renders (see ``document_rendering.py``).
+
+- Workers are started and warmed (fonts, CSS machinery) at app startup.
+- At most ``PDF_RENDER_MAX_QUEUE`` renders may be queued or running per app
+  process; beyond that ``RenderQueueFull`` is raised (map to 503).
+- Each render is awaited for ``PDF_RENDER_TIMEOUT_SEC``; on timeout
+  ``RenderTimeout`` is raised (map to 504). A render already running in a
+  worker cannot be interrupted and finishes in the background; it keeps its
+  queue slot until it does, so hung workers can't let in more work than
+  ``PDF_RENDER_MAX_QUEUE``.
+
+With ``PDF_RENDER_WORKERS=0`` renders run in a thread instead (development,
+scripts).
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Optional
+
+from app.config import settings
+from app.services.document_rendering import RenderedDocument, write_pdf
+
+logger = logging.getLogger(__name__)
+
+_WARMUP_HTML = "<html><body><p>warm-up</p></body></html>"
+
+
+class RenderQueueFull(Exception):
+    """Too many PDF renders queued; the caller should retry later."""
+
+
+class RenderTimeout(Exception):
+    """A PDF render did not finish within PDF_RENDER_TIMEOUT_SEC."""
+
+
+def render_pdf_sync(html: str, css: str = "", presentational_hints: bool = False) -> bytes:
+    """Lay out html and return the PDF bytes (runs inside a pool worker)."""
+    return write_pdf(html, css, presentational_hints=presentational_hints)
+
+
+def _warm_worker() -> None:
+    """Pool initializer: import WeasyPrint and render once so fonts are loaded."""
+    try:
+        render_pdf_sync(_WARMUP_HTML)
+    except Exception as e:  # A broken warm-up shouldn't kill the worker
+        logger.warning("PDF worker warm-up failed: %s", e)
+
+
+def _noop() -> None:
+    return None
+
+
+class PdfRenderer:
+    """Process pool plus the in-flight counter used for backpressure."""
+
+    def __init__(self, workers: int, max_queue: int, timeout_sec: float):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout_sec = timeout_sec
+        self._pool: Optional[Executor] = None
+        self._lock = Lock()
+        self._inflight = 0
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.workers <= 0:
+                        self._pool = ThreadPoolExecutor(thread_name_prefix="pdf-render")
+                    else:
+                        # spawn: workers must not inherit the parent's DB connections or threads
+                        self._pool = ProcessPoolExecutor(
+                            max_workers=self.workers,
+                            mp_context=multiprocessing.get_context("spawn"),
+                            initializer=_warm_worker,
+                        )
+        return self._pool
+
+    def start(self) -> None:
+        """Create the pool and start every worker now rather than on the first download."""
+        if self.workers <= 0:
+            return
+        pool = self._get_pool()
+        for _ in range(self.workers):
+            pool.submit(_noop)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, _future: Optional[Future] = None) -> None:
+        with self._lock:
+            self._inflight -= 1
+
+    async def render(self, document: RenderedDocument) -> bytes:
+        with self._lock:
+            if self._inflight >= self.max_queue:
+                raise RenderQueueFull(f"{self._inflight} PDF renders already queued")
+            self._inflight += 1
+        job = (document.html, document.css, document.presentational_hints)
+        try:
+            future = self._get_pool().submit(render_pdf_sync, *job)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the worker is done with the job, not when this
+        # request stops waiting: a timed-out render still occupies its worker
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout_sec)
+        except asyncio.TimeoutError:
+            raise RenderTimeout(f"PDF render exceeded {self.timeout_sec:.0f}s")
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool for the next render
+            logger.error("PDF render pool broken; restarting it")
+            self.shutdown()
+            raise
+
+
+_renderer = PdfRenderer(
+    workers=settings.PDF_RENDER_WORKERS,
+    max_queue=settings.PDF_RENDER_MAX_QUEUE,
+    timeout_sec=settings.PDF_RENDER_TIMEOUT_SEC,
+)
+
+
+def get_pdf_renderer() -> PdfRenderer:
+    return _renderer
+
+
+async def render_pdf(document: RenderedDocument) -> bytes:
+    """Lay out a rendered document off the event loop (see module docstring for errors)."""
+    return await _renderer.render(document)
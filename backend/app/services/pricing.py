@@ -6,21 +6,12 @@ Falls back to settings values when products are not found.
 """
 from typing import List
 from sqlalchemy.orm import Session
-from app.models import Product, QuoteItem, SizingResult as SizingResultModel, ProductType, Setting
+from app.models import QuoteItem, SizingResult as SizingResultModel, ProductType
+from app.services.product_catalog import get_catalog_snapshot
+from app.services.settings_cache import get_setting_value
 import math
 
 
-def get_setting_value(db: Session, key: str, default: float) -> float:
-    """Get a setting value as float, or return default"""
-    setting = db.query(Setting).filter(Setting.key == key).first()
-    if setting:
-        try:
-            return float(setting.value)
-        except (ValueError, TypeError):
-            return default
-    return default
-
-
 def generate_quote_items_from_sizing(
     db: Session,
     sizing_result: SizingResultModel,
@@ -37,33 +28,30 @@ def generate_quote_items_from_sizing(
     - BOS (Balance of System)
     - Installation
     - Transport
+    
+    Products come from the in-memory catalog snapshot, so no catalog queries
+    are made per quote.
+    """
+    return [QuoteItem(quote_id=quote_id, **line) for line in build_quote_lines(db, sizing_result)]
+
+
+def indicative_price(db: Session, sizing_result) -> float:
+    """Quote total (before tax/discount) for a sizing result, without creating QuoteItems"""
+    return sum(line["total_price"] for line in build_quote_lines(db, sizing_result))
+
+
+def build_quote_lines(db: Session, sizing_result) -> List[dict]:
+    """
+    Quote line values (product_id, description, quantity, unit_price, total_price,
+    sort_order) for a sizing result. Accepts any object with SizingResult attributes.
     """
     items = []
     sort_order = 0
+    catalog = get_catalog_snapshot(db)
     
     # 1. PV Panels
-    # Try exact match first
-    panel_product = db.query(Product).filter(
-        Product.product_type == ProductType.PANEL,
-        Product.brand.ilike(f"%{sizing_result.panel_brand}%"),
-        Product.wattage == sizing_result.panel_wattage,
-        Product.is_active == True
-    ).first()
-    
-    # If no exact match, try brand match only (case-insensitive)
-    if not panel_product:
-        panel_product = db.query(Product).filter(
-            Product.product_type == ProductType.PANEL,
-            Product.brand.ilike(f"%{sizing_result.panel_brand}%"),
-            Product.is_active == True
-        ).first()
-    
-    # If still no match, get any active panel product
-    if not panel_product:
-        panel_product = db.query(Product).filter(
-            Product.product_type == ProductType.PANEL,
-            Product.is_active == True
-        ).first()
+    # Exact brand + wattage match first, then brand only (case-insensitive), then any active panel
+    panel_product = catalog.find_panel(sizing_result.panel_brand, sizing_result.panel_wattage)
     
     if panel_product:
         if panel_product.price_type == "per_panel":
@@ -75,8 +63,7 @@ def generate_quote_items_from_sizing(
         
         # Use sizing result wattage if product wattage is not set
         panel_wattage = panel_product.wattage or sizing_result.panel_wattage
-        items.append(QuoteItem(
-            quote_id=quote_id,
+        items.append(dict(
             product_id=panel_product.id,
             description=f"{panel_product.brand or sizing_result.panel_brand} {panel_wattage}W Panel",
             quantity=sizing_result.number_of_panels,
@@ -94,40 +81,39 @@ def generate_quote_items_from_sizing(
     # Priority: exact match > closest smaller > closest larger
     target_size = inverter_unit_size if inverter_count > 1 else sizing_result.inverter_size_kw
     
-    # First, try to find exact match
-    inverter_product = db.query(Product).filter(
-        Product.product_type == ProductType.INVERTER,
-        Product.capacity_kw == target_size,
-        Product.is_active == True
-    ).first()
-    
-    # If no exact match, try closest smaller (can use more units if needed)
-    if not inverter_product:
-        inverter_product = db.query(Product).filter(
-            Product.product_type == ProductType.INVERTER,
-            Product.capacity_kw <= target_size,
-            Product.is_active == True
-        ).order_by(Product.capacity_kw.desc()).first()
-    
-    # If still no match, try closest larger (but prefer not to oversize)
-    if not inverter_product:
-        inverter_product = db.query(Product).filter(
-            Product.product_type == ProductType.INVERTER,
-            Product.capacity_kw >= target_size,
-            Product.is_active == True
-        ).order_by(Product.capacity_kw.asc()).first()
-    
-    # Last resort: get any available inverter
-    if not inverter_product:
-        inverter_product = db.query(Product).filter(
-            Product.product_type == ProductType.INVERTER,
-            Product.is_active == True
-        ).order_by(Product.capacity_kw.asc()).first()
+    # Mixed-size parallel banks (e.g. 20kW + 10kW) get one line per distinct unit size
+    configuration = getattr(sizing_result, 'inverter_configuration', None) or []
+    mixed = len(set(configuration)) > 1
+    if mixed:
+        inverter_groups = [
+            (size, configuration.count(size), size)
+            for size in sorted(set(configuration), reverse=True)
+        ]
+    else:
+        inverter_groups = [(inverter_unit_size, inverter_count, target_size)]
     
-    if inverter_product:
+    for unit_size, unit_count, group_target in inverter_groups:
+        # First, try to find exact match
+        inverter_product = catalog.inverters.exact(group_target)
+        
+        # If no exact match, try closest smaller (can use more units if needed)
+        if not inverter_product:
+            inverter_product = catalog.inverters.at_most(group_target)
+        
+        # If still no match, try closest larger (but prefer not to oversize)
+        if not inverter_product:
+            inverter_product = catalog.inverters.at_least(group_target)
+        
+        # Last resort: get any available inverter
+        if not inverter_product:
+            inverter_product = catalog.inverters.smallest()
+        
+        if not inverter_product:
+            continue
+        
         # Calculate unit price based on price type
         if inverter_product.price_type == "per_kw":
-            unit_price = inverter_product.base_price * inverter_unit_size
+            unit_price = inverter_product.base_price * unit_size
         elif inverter_product.price_type == "fixed":
             unit_price = inverter_product.base_price
         else:
@@ -135,21 +121,23 @@ def generate_quote_items_from_sizing(
         
         # Use the calculated unit size from sizing result (not product capacity)
         # This ensures we use the size that was calculated, not what's in the product catalog
-        inverter_capacity = inverter_unit_size
+        inverter_capacity = unit_size
         
         # Create description based on parallel or single inverter
-        if inverter_count > 1:
-            description = f"{inverter_product.brand or 'Energy Precisions'} {inverter_product.model or ''} {inverter_capacity}kW Inverter (×{inverter_count} parallel)"
+        name = f"{inverter_product.brand or 'Energy Precisions'} {inverter_product.model or ''} {inverter_capacity}kW Inverter"
+        if mixed:
+            description = f"{name} (×{unit_count}, mixed parallel bank of {len(configuration)})"
+        elif unit_count > 1:
+            description = f"{name} (×{unit_count} parallel)"
         else:
-            description = f"{inverter_product.brand or 'Energy Precisions'} {inverter_product.model or ''} {inverter_capacity}kW Inverter"
+            description = name
         
-        items.append(QuoteItem(
-            quote_id=quote_id,
+        items.append(dict(
             product_id=inverter_product.id,
             description=description,
-            quantity=inverter_count,
+            quantity=unit_count,
             unit_price=unit_price,
-            total_price=unit_price * inverter_count,
+            total_price=unit_price * unit_count,
             sort_order=sort_order
         ))
         sort_order += 1
@@ -162,11 +150,7 @@ def generate_quote_items_from_sizing(
         
         # Strategy: Prefer larger batteries to minimize quantity and cost
         # First, try to find a single battery that meets the requirement
-        single_battery = db.query(Product).filter(
-            Product.product_type == ProductType.BATTERY,
-            Product.capacity_kwh >= sizing_result.battery_capacity_kwh,
-            Product.is_active == True
-        ).order_by(Product.capacity_kwh.asc()).first()
+        single_battery = catalog.batteries.at_least(sizing_result.battery_capacity_kwh)
         
         if single_battery:
             # Use single large battery
@@ -175,27 +159,15 @@ def generate_quote_items_from_sizing(
         else:
             # No single battery large enough, find the largest available battery
             # Prefer 16kWh batteries specifically for cost efficiency in Ghana
-            battery_product = db.query(Product).filter(
-                Product.product_type == ProductType.BATTERY,
-                Product.capacity_kwh == 16.0,  # Prefer 16kWh specifically
-                Product.is_active == True
-            ).first()
+            battery_product = catalog.batteries.exact(16.0)  # Prefer 16kWh specifically
             
             # If 16kWh not available, try other large batteries (10kWh+)
             if not battery_product:
-                battery_product = db.query(Product).filter(
-                    Product.product_type == ProductType.BATTERY,
-                    Product.capacity_kwh >= 10.0,
-                    Product.is_active == True
-                ).order_by(Product.capacity_kwh.desc()).first()  # Get largest first
+                battery_product = catalog.batteries.largest(min_capacity=10.0)  # Get largest first
             
             # Fallback to any battery >= 5kWh if no larger available
             if not battery_product:
-                battery_product = db.query(Product).filter(
-                    Product.product_type == ProductType.BATTERY,
-                    Product.capacity_kwh >= 5.0,
-                    Product.is_active == True
-                ).order_by(Product.capacity_kwh.desc()).first()  # Get largest available
+                battery_product = catalog.batteries.largest(min_capacity=5.0)  # Get largest available
             
             if battery_product:
                 # Calculate number of battery units needed
@@ -205,11 +177,9 @@ def generate_quote_items_from_sizing(
                 # If more needed, suggest larger battery or reduce backup hours
                 if num_batteries > 20:
                     # Try to find a larger battery to reduce quantity
-                    larger_battery = db.query(Product).filter(
-                        Product.product_type == ProductType.BATTERY,
-                        Product.capacity_kwh >= (sizing_result.battery_capacity_kwh / 20),
-                        Product.is_active == True
-                    ).order_by(Product.capacity_kwh.desc()).first()
+                    larger_battery = catalog.batteries.largest(
+                        min_capacity=sizing_result.battery_capacity_kwh / 20
+                    )
                     
                     if larger_battery:
                         battery_product = larger_battery
@@ -223,8 +193,7 @@ def generate_quote_items_from_sizing(
             else:
                 unit_price = battery_product.base_price
             
-            items.append(QuoteItem(
-                quote_id=quote_id,
+            items.append(dict(
                 product_id=battery_product.id,
                 description=f"{battery_product.brand or ''} {battery_product.capacity_kwh}kWh Battery",
                 quantity=num_batteries,
@@ -235,10 +204,7 @@ def generate_quote_items_from_sizing(
             sort_order += 1
     
     # 4. Mounting Structure
-    mounting_product = db.query(Product).filter(
-        Product.product_type == ProductType.MOUNTING,
-        Product.is_active == True
-    ).first()
+    mounting_product = catalog.first(ProductType.MOUNTING)
     
     if mounting_product:
         if mounting_product.price_type == "per_kw":
@@ -250,8 +216,7 @@ def generate_quote_items_from_sizing(
         else:
             unit_price = mounting_product.base_price
         
-        items.append(QuoteItem(
-            quote_id=quote_id,
+        items.append(dict(
             product_id=mounting_product.id,
             description="Mounting Structure",
             quantity=1,
@@ -263,12 +228,9 @@ def generate_quote_items_from_sizing(
     
     # 5. BOS (Balance of System)
     # Calculate equipment total first (panels, inverter, battery)
-    equipment_total = sum(item.total_price for item in items)
+    equipment_total = sum(item["total_price"] for item in items)
     
-    bos_product = db.query(Product).filter(
-        Product.product_type == ProductType.BOS,
-        Product.is_active == True
-    ).first()
+    bos_product = catalog.first(ProductType.BOS)
     
     if bos_product:
         # Use product pricing
@@ -281,8 +243,7 @@ def generate_quote_items_from_sizing(
         else:
             unit_price = bos_product.base_price
         
-        items.append(QuoteItem(
-            quote_id=quote_id,
+        items.append(dict(
             product_id=bos_product.id,
             description="Balance of System (BOS)",
             quantity=1,
@@ -296,8 +257,7 @@ def generate_quote_items_from_sizing(
         bos_percentage = get_setting_value(db, "bos_percentage", 10.0)
         unit_price = equipment_total * (bos_percentage / 100)
         
-        items.append(QuoteItem(
-            quote_id=quote_id,
+        items.append(dict(
             product_id=None,  # No product, using setting
             description=f"Balance of System (BOS) - {bos_percentage}% of equipment",
             quantity=1,
@@ -308,17 +268,13 @@ def generate_quote_items_from_sizing(
         sort_order += 1
     
     # Equipment total for installation % (panels, inverter, battery, mounting, BOS only – exclude transport)
-    total_equipment_cost = sum(item.total_price for item in items)
+    total_equipment_cost = sum(item["total_price"] for item in items)
     
     # 6. Transport & Logistics (before Installation – display order: Panel, Inverter, Battery, BOS, Transport, Installation)
-    transport_product = db.query(Product).filter(
-        Product.product_type == ProductType.TRANSPORT,
-        Product.is_active == True
-    ).first()
+    transport_product = catalog.first(ProductType.TRANSPORT)
     
     if transport_product:
-        items.append(QuoteItem(
-            quote_id=quote_id,
+        items.append(dict(
             product_id=transport_product.id,
             description="Transport & Logistics",
             quantity=1,
@@ -329,8 +285,7 @@ def generate_quote_items_from_sizing(
         sort_order += 1
     else:
         transport_cost = get_setting_value(db, "transport_cost_fixed", 1000.0)
-        items.append(QuoteItem(
-            quote_id=quote_id,
+        items.append(dict(
             product_id=None,
             description="Transport & Logistics",
             quantity=1,
@@ -341,10 +296,7 @@ def generate_quote_items_from_sizing(
         sort_order += 1
     
     # 7. Installation (percentage of total_equipment_cost – panels, inverter, battery, mounting, BOS only)
-    installation_product = db.query(Product).filter(
-        Product.product_type == ProductType.INSTALLATION,
-        Product.is_active == True
-    ).first()
+    installation_product = catalog.first(ProductType.INSTALLATION)
     
     if installation_product:
         if installation_product.price_type == "percentage":
@@ -355,8 +307,7 @@ def generate_quote_items_from_sizing(
             unit_price = installation_product.base_price
         else:
             unit_price = installation_product.base_price
-        items.append(QuoteItem(
-            quote_id=quote_id,
+        items.append(dict(
             product_id=installation_product.id,
             description="Installation",
             quantity=1,
@@ -368,8 +319,7 @@ def generate_quote_items_from_sizing(
     else:
         installation_cost_percent = get_setting_value(db, "installation_cost_percent", 10.0)
         unit_price = total_equipment_cost * (installation_cost_percent / 100)
-        items.append(QuoteItem(
-            quote_id=quote_id,
+        items.append(dict(
             product_id=None,
             description=f"Installation ({installation_cost_percent:.1f}% of total equipment cost)",
             quantity=1,
@@ -0,0 +1,202 @@
+"""
+Product Catalog Snapshot
+
+In-memory copy of the active product catalog used by quote generation and
+sizing. Built in one query and indexed by ``ProductType``:
+- inverters sorted by ``capacity_kw`` and batteries sorted by ``capacity_kwh``
+  (bisect lookups for exact / closest-smaller / closest-larger matches)
+- panels indexed by lowercased brand and by (brand, wattage)
+
+Product writes in ``routers/products.py`` call ``bump_catalog_version()`` so
+the next reader rebuilds the snapshot. Stock changes (``services/stock.py``)
+bump a separate stock version instead: they don't affect pricing or search,
+only the public catalog responses, which are keyed on both
+(``get_public_catalog_version()``).
+"""
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import Product, ProductType
+from app.services.versioned_cache import VersionedCache
+
+CATALOG_SNAPSHOT_MAX_AGE_SEC = 60.0
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogProduct:
+    """Detached, read-only copy of the product fields used for pricing."""
+
+    id: int
+    product_type: ProductType
+    brand: Optional[str]
+    model: Optional[str]
+    wattage: Optional[int]
+    capacity_kw: Optional[float]
+    capacity_kwh: Optional[float]
+    price_type: Optional[str]
+    base_price: float
+
+
+class _CapacityIndex:
+    """Products sorted by one capacity field; ties keep the lowest id first."""
+
+    def __init__(self, products: List[CatalogProduct], attr: str):
+        rated = sorted(
+            (p for p in products if getattr(p, attr)),
+            key=lambda p: (float(getattr(p, attr)), p.id),
+        )
+        self.capacities: Tuple[float, ...] = tuple(float(getattr(p, attr)) for p in rated)
+        self.products: Tuple[CatalogProduct, ...] = tuple(rated)
+        # Products without a capacity are only used as a last resort
+        self.unrated: Tuple[CatalogProduct, ...] = tuple(p for p in products if not getattr(p, attr))
+
+    def _first_of_capacity(self, idx: int) -> CatalogProduct:
+        # Step back to the first product with the same capacity (lowest id)
+        return self.products[bisect_left(self.capacities, self.capacities[idx])]
+
+    def exact(self, capacity: float) -> Optional[CatalogProduct]:
+        idx = bisect_left(self.capacities, capacity)
+        if idx < len(self.capacities) and self.capacities[idx] == capacity:
+            return self.products[idx]
+        return None
+
+    def at_most(self, capacity: float) -> Optional[CatalogProduct]:
+        """Largest capacity <= ``capacity``."""
+        idx = bisect_right(self.capacities, capacity) - 1
+        return self._first_of_capacity(idx) if idx >= 0 else None
+
+    def at_least(self, capacity: float) -> Optional[CatalogProduct]:
+        """Smallest capacity >= ``capacity``."""
+        idx = bisect_left(self.capacities, capacity)
+        return self.products[idx] if idx < len(self.products) else None
+
+    def largest(self, min_capacity: float = 0.0) -> Optional[CatalogProduct]:
+        """Largest product, provided it is >= ``min_capacity``."""
+        if not self.products or self.capacities[-1] < min_capacity:
+            return None
+        return self._first_of_capacity(len(self.products) - 1)
+
+    def smallest(self) -> Optional[CatalogProduct]:
+        if self.products:
+            return self.products[0]
+        return self.unrated[0] if self.unrated else None
+
+
+class CatalogSnapshot:
+    """Immutable indexes over the active catalog at a given version."""
+
+    def __init__(self, version: int, products: List[CatalogProduct]):
+        self.version = version
+        by_type: Dict[ProductType, List[CatalogProduct]] = {}
+        for p in products:
+            by_type.setdefault(p.product_type, []).append(p)
+        self.by_type: Dict[ProductType, Tuple[CatalogProduct, ...]] = {
+            t: tuple(items) for t, items in by_type.items()
+        }
+        self.by_id: Dict[int, CatalogProduct] = {p.id: p for p in products}
+
+        self.inverters = _CapacityIndex(by_type.get(ProductType.INVERTER, []), "capacity_kw")
+        self.batteries = _CapacityIndex(by_type.get(ProductType.BATTERY, []), "capacity_kwh")
+        # Distinct active inverter sizes in kW, ascending
+        self.inverter_sizes: Tuple[float, ...] = tuple(sorted(set(self.inverters.capacities)))
+
+        # Panel brand index: lowercased brand -> panels, and (brand, wattage) -> first panel
+        self._panels_by_brand: Dict[str, List[CatalogProduct]] = {}
+        self._panels_by_brand_wattage: Dict[Tuple[str, Optional[int]], CatalogProduct] = {}
+        for p in by_type.get(ProductType.PANEL, []):
+            brand = (p.brand or "").lower()
+            self._panels_by_brand.setdefault(brand, []).append(p)
+            self._panels_by_brand_wattage.setdefault((brand, p.wattage), p)
+
+    def first(self, product_type: ProductType) -> Optional[CatalogProduct]:
+        items = self.by_type.get(product_type)
+        return items[0] if items else None
+
+    def find_panel(self, brand: Optional[str], wattage: Optional[int]) -> Optional[CatalogProduct]:
+        """Brand + wattage match, then brand only, then any panel.
+
+        Brand matching is a case-insensitive substring match, like ``ILIKE '%brand%'``.
+        """
+        needle = (brand or "").lower()
+        candidates = [b for b in self._panels_by_brand if needle in b]
+        matches = [
+            self._panels_by_brand_wattage[(b, wattage)]
+            for b in candidates
+            if (b, wattage) in self._panels_by_brand_wattage
+        ]
+        if matches:
+            return min(matches, key=lambda p: p.id)
+        brand_matches = [self._panels_by_brand[b][0] for b in candidates]
+        if brand_matches:
+            return min(brand_matches, key=lambda p: p.id)
+        return self.first(ProductType.PANEL)
+
+
+def load_catalog_snapshot(db: Session) -> CatalogSnapshot:
+    """Read the active catalog in one query and build the indexes (no caching)."""
+    rows = db.query(
+        Product.id,
+        Product.product_type,
+        Product.brand,
+        Product.model,
+        Product.wattage,
+        Product.capacity_kw,
+        Product.capacity_kwh,
+        Product.price_type,
+        Product.base_price,
+    ).filter(Product.is_active == True).order_by(Product.id.asc()).all()
+    return CatalogSnapshot(_CACHE.version, [CatalogProduct(*row) for row in rows])
+
+
+_CACHE: VersionedCache[CatalogSnapshot] = VersionedCache(
+    load_catalog_snapshot, max_age_sec=CATALOG_SNAPSHOT_MAX_AGE_SEC
+)
+
+
+def bump_catalog_version() -> int:
+    """Invalidate the cached catalog after a product write. Returns the new version."""
+    return _CACHE.bump()
+
+
+def get_catalog_version() -> int:
+    return _CACHE.version
+
+
+_stock_lock = Lock()
+_stock_version = 0
+
+
+def bump_stock_version() -> int:
+    """Invalidate public catalog responses after stock levels changed. Returns the new version."""
+    global _stock_version
+    with _stock_lock:
+        _stock_version += 1
+        return _stock_version
+
+
+def bump_stock_version_after_commit(db: Session) -> None:
+    """Bump the stock version once the session's current transaction commits."""
+    if db.info.get("stock_version_bump_pending"):
+        return
+    db.info["stock_version_bump_pending"] = True
+
+    def _bump(session: Session) -> None:
+        session.info.pop("stock_version_bump_pending", None)
+        bump_stock_version()
+
+    event.listen(db, "after_commit", _bump, once=True)
+
+
+def get_public_catalog_version() -> Tuple[int, int]:
+    """(catalog version, stock version): changes whenever anything the storefront shows changes."""
+    return _CACHE.version, _stock_version
+
+
+def get_catalog_snapshot(db: Session) -> CatalogSnapshot:
+    """Current catalog snapshot; rebuilt only after a product write (or max age)."""
+    return _CACHE.get(db)
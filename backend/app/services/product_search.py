@@ -0,0 +1,336 @@
+"""
+Product Search
+
+Ranked, typo-tolerant search for the shop (``GET /api/ecommerce/products?search=``).
+
+On PostgreSQL it uses the generated ``products.search_vector`` (tsvector) and
+``products.search_text`` (trigram) columns and their GIN indexes, so cost
+depends on the number of matches, not the catalog size:
+
+- full text: every query word as a prefix (``solar:* & pan:*``), OR the
+  English-stemmed query (``batteries`` finds ``battery``)
+- typos: trigram word similarity (``<%``) against name, brand and model
+- rank: ``ts_rank_cd`` (names weigh more than descriptions) plus word similarity
+- snippets: ``ts_headline`` over the description, for the returned page only
+
+Elsewhere (SQLite in development and tests, or PostgreSQL before the
+migration ran) it uses an in-memory inverted index with the same behaviour:
+postings per word with field weights, prefix lookups over the sorted
+vocabulary, and trigram similarity between words for typos. The index is
+rebuilt when the catalog version changes.
+
+Snippets are HTML-escaped; only the ``<mark>`` highlights are markup.
+"""
+import heapq
+import html
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import func, inspect, literal, literal_column, or_
+from sqlalchemy.orm import Query, Session
+
+from app.models import Product
+from app.services.product_catalog import get_catalog_version
+from app.services.versioned_cache import VersionedCache
+
+SEARCH_INDEX_MAX_AGE_SEC = 300.0
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# Field weights, matching the tsvector weights A / B / C
+_WEIGHT_NAME = 1.0  # name, brand, model, sku
+_WEIGHT_SUMMARY = 0.4  # category, short description
+_WEIGHT_DESCRIPTION = 0.2
+
+_PREFIX_FACTOR = 0.9
+_FUZZY_MIN_SIMILARITY = 0.4
+_FUZZY_FACTOR = 0.8
+_COMMON_TRIGRAM_TERMS = 500
+
+_SNIPPET_WORDS = 24
+_SNIPPET_LEAD_WORDS = 4
+
+# ts_headline markers, swapped for <mark> after escaping
+_SEL_START = "⟦"
+_SEL_STOP = "⟧"
+_HEADLINE_OPTIONS = f"StartSel={_SEL_START}, StopSel={_SEL_STOP}, MaxWords={_SNIPPET_WORDS}, MinWords=10, MaxFragments=2"
+
+
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    product: Product
+    rank: float
+    snippet: Optional[str]
+
+
+def search_words(text: str) -> List[str]:
+    """Lowercased words of a query or document (letters and digits)"""
+    return [w.lower() for w in _WORD_RE.findall(text or "")]
+
+
+def _mark_selected(text: str) -> str:
+    escaped = html.escape(text)
+    return escaped.replace(_SEL_START, "<mark>").replace(_SEL_STOP, "</mark>")
+
+
+def _trigrams(word: str) -> FrozenSet[str]:
+    """pg_trgm-style trigrams: the word padded with two spaces before and one after"""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+# ---------------------------------------------------------------------------
+# In-memory index
+# ---------------------------------------------------------------------------
+
+class ProductSearchIndex:
+    """Inverted index over every product's searchable fields (filters are applied in SQL)."""
+
+    def __init__(self, catalog_version: int, rows):
+        self.catalog_version = catalog_version
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.snippet_source: Dict[int, str] = {}
+        for product_id, name, brand, model, sku, category, short_description, description in rows:
+            fields = (
+                (_WEIGHT_NAME, " ".join(filter(None, (name, brand, model, sku)))),
+                (_WEIGHT_SUMMARY, " ".join(filter(None, (category, short_description)))),
+                (_WEIGHT_DESCRIPTION, description or ""),
+            )
+            for weight, text in fields:
+                for word in search_words(text):
+                    docs = self.postings.setdefault(word, {})
+                    # Best field wins; repeats add a little
+                    docs[product_id] = max(docs.get(product_id, 0.0), weight) + 0.01
+            self.snippet_source[product_id] = description or short_description or name or ""
+        self.vocabulary: List[str] = sorted(self.postings)
+        self.term_trigrams: Dict[str, FrozenSet[str]] = {}
+        self.trigram_terms: Dict[str, Set[str]] = {}
+        for word in self.vocabulary:
+            if len(word) >= 3:
+                grams = _trigrams(word)
+                self.term_trigrams[word] = grams
+                for gram in grams:
+                    self.trigram_terms.setdefault(gram, set()).add(word)
+
+    def expand(self, word: str) -> Dict[str, float]:
+        """Index terms a query word matches, with a match factor: exact 1, prefix 0.9, typo <= 0.8"""
+        terms: Dict[str, float] = {}
+        if word in self.postings:
+            terms[word] = 1.0
+        if len(word) >= 2:
+            start = bisect_left(self.vocabulary, word)
+            for term in self.vocabulary[start:]:
+                if not term.startswith(word):
+                    break
+                terms.setdefault(term, _PREFIX_FACTOR)
+        if len(word) >= 3:
+            grams = _trigrams(word)
+            # Candidates come from the rarer trigrams: a leading "  m" or "sku" is shared
+            # by thousands of model numbers and would make every lookup scan them all
+            by_rarity = sorted((g for g in grams if g in self.trigram_terms), key=lambda g: len(self.trigram_terms[g]))
+            sources = [g for g in by_rarity if len(self.trigram_terms[g]) <= _COMMON_TRIGRAM_TERMS] or by_rarity[:2]
+            candidates: Set[str] = set()
+            for gram in sources:
+                candidates.update(self.trigram_terms[gram])
+            for term in candidates:
+                term_grams = self.term_trigrams[term]
+                shared = len(grams & term_grams)
+                similarity = shared / (len(grams) + len(term_grams) - shared)
+                if similarity >= _FUZZY_MIN_SIMILARITY:
+                    factor = similarity * _FUZZY_FACTOR
+                    if factor > terms.get(term, 0.0):
+                        terms[term] = factor
+        return terms
+
+    def search(self, text: str) -> Tuple[Dict[int, float], Set[str]]:
+        """Scores of products matching every query word, and the index terms matched"""
+        words = list(dict.fromkeys(search_words(text)))
+        if not words:
+            return {}, set()
+        expansions = [self.expand(word) for word in words]
+        matched_terms = {term for terms in expansions for term in terms}
+        # Rarest word first: later words only need checking against the surviving products
+        expansions.sort(key=lambda terms: sum(len(self.postings[t]) for t in terms))
+        scores: Optional[Dict[int, float]] = None
+        for terms in expansions:
+            postings = [(self.postings[term], factor) for term, factor in terms.items()]
+            if scores is None or sum(len(docs) for docs, _ in postings) <= len(scores) * len(postings):
+                word_scores: Dict[int, float] = {}
+                for docs, factor in postings:
+                    for product_id, weight in docs.items():
+                        score = weight * factor
+                        if score > word_scores.get(product_id, 0.0):
+                            word_scores[product_id] = score
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {pid: s + word_scores[pid] for pid, s in scores.items() if pid in word_scores}
+            else:
+                # Few candidates left: probe them instead of walking long posting lists
+                narrowed: Dict[int, float] = {}
+                for pid, s in scores.items():
+                    best = max((docs.get(pid, 0.0) * factor for docs, factor in postings), default=0.0)
+                    if best:
+                        narrowed[pid] = s + best
+                scores = narrowed
+            if not scores:
+                break
+        return scores or {}, matched_terms
+
+    def snippet(self, product_id: int, matched_terms: Set[str]) -> Optional[str]:
+        """A window of the description around the first matched word, highlighted"""
+        source = self.snippet_source.get(product_id) or ""
+        words = list(_WORD_RE.finditer(source))
+        if not words:
+            return None
+        first = next((i for i, m in enumerate(words) if m.group().lower() in matched_terms), 0)
+        start_word = max(0, first - _SNIPPET_LEAD_WORDS)
+        end_word = min(len(words), start_word + _SNIPPET_WORDS)
+        start = words[start_word].start()
+        end = words[end_word - 1].end()
+        parts = []
+        pos = start
+        for m in words[start_word:end_word]:
+            parts.append(html.escape(source[pos:m.start()]))
+            word = html.escape(m.group())
+            parts.append(f"<mark>{word}</mark>" if m.group().lower() in matched_terms else word)
+            pos = m.end()
+        text = "".join(parts)
+        if start > 0:
+            text = "… " + text
+        if end < len(source.rstrip()):
+            text += " …"
+        return text
+
+
+def load_search_index(db: Session) -> ProductSearchIndex:
+    rows = db.query(
+        Product.id, Product.name, Product.brand, Product.model, Product.sku,
+        Product.category, Product.short_description, Product.description,
+    ).order_by(Product.id).all()
+    return ProductSearchIndex(get_catalog_version(), rows)
+
+
+_INDEX_CACHE: VersionedCache[ProductSearchIndex] = VersionedCache(
+    load_search_index, max_age_sec=SEARCH_INDEX_MAX_AGE_SEC
+)
+
+
+def get_search_index(db: Session) -> ProductSearchIndex:
+    """Current in-memory index; rebuilt after a catalog change"""
+    index = _INDEX_CACHE.get(db)
+    if index.catalog_version != get_catalog_version():
+        _INDEX_CACHE.bump()
+        index = _INDEX_CACHE.get(db)
+    return index
+
+
+def _search_in_memory(db: Session, base_query: Query, text: str, skip: int, limit: int) -> List[SearchHit]:
+    index = get_search_index(db)
+    scores, matched_terms = index.search(text)
+    if not scores:
+        return []
+    wanted = skip + limit
+    # Usually the best few hundred hold the page; sort everything only if the filters reject too many
+    top_n = max(wanted * 4, 200)
+    if len(scores) > top_n:
+        ranked = heapq.nsmallest(top_n, scores.items(), key=lambda item: (-item[1], item[0]))
+    else:
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    eligible = _filter_ranked(base_query, ranked, wanted)
+    if len(eligible) < wanted and len(ranked) < len(scores):
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        eligible = _filter_ranked(base_query, ranked, wanted)
+
+    page = eligible[skip:wanted]
+    if not page:
+        return []
+    products = {p.id: p for p in base_query.filter(Product.id.in_([pid for pid, _ in page]))}
+    return [
+        SearchHit(products[pid], score, index.snippet(pid, matched_terms))
+        for pid, score in page
+        if pid in products
+    ]
+
+
+def _filter_ranked(base_query: Query, ranked: List[Tuple[int, float]], wanted: int) -> List[Tuple[int, float]]:
+    """Apply the caller's filters to ranked ids a chunk at a time until ``wanted`` pass"""
+    eligible: List[Tuple[int, float]] = []
+    chunk_size = max(wanted * 2, 200)
+    for start in range(0, len(ranked), chunk_size):
+        chunk = ranked[start:start + chunk_size]
+        allowed = {
+            row[0] for row in base_query.with_entities(Product.id).filter(Product.id.in_([pid for pid, _ in chunk]))
+        }
+        eligible.extend(item for item in chunk if item[0] in allowed)
+        if len(eligible) >= wanted:
+            break
+    return eligible
+
+
+# ---------------------------------------------------------------------------
+# PostgreSQL
+# ---------------------------------------------------------------------------
+
+_postgres_columns: Optional[bool] = None
+
+
+def _postgres_search_available(db: Session) -> bool:
+    """True on PostgreSQL once the search columns exist (checked once per process)"""
+    global _postgres_columns
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    if _postgres_columns is None:
+        columns = {c["name"] for c in inspect(db.get_bind()).get_columns("products")}
+        _postgres_columns = {"search_vector", "search_text"} <= columns
+    return _postgres_columns
+
+
+def _search_postgres(db: Session, base_query: Query, text: str, skip: int, limit: int) -> List[SearchHit]:
+    words = search_words(text)
+    if not words:
+        return []
+    vector = literal_column("products.search_vector")
+    search_text = literal_column("products.search_text")
+    phrase = " ".join(words)
+    tsquery = func.to_tsquery("simple", " & ".join(f"{w}:*" for w in words)).op("||")(
+        func.plainto_tsquery("english", phrase)
+    )
+    matches = or_(
+        vector.op("@@", is_comparison=True)(tsquery),
+        literal(phrase).op("<%", is_comparison=True)(search_text),
+    )
+    rank = (func.ts_rank_cd(vector, tsquery, 32) + func.word_similarity(phrase, search_text)).label("search_rank")
+    rows = base_query.add_columns(rank).filter(matches).order_by(
+        rank.desc(), Product.id
+    ).offset(skip).limit(limit).all()
+    if not rows:
+        return []
+
+    # Headlines for the returned page only (ts_headline reads the whole document)
+    headline = func.ts_headline(
+        "english",
+        func.coalesce(Product.description, Product.short_description, Product.name, ""),
+        tsquery,
+        _HEADLINE_OPTIONS,
+    )
+    snippets = dict(
+        db.query(Product.id, headline).filter(Product.id.in_([product.id for product, _ in rows])).all()
+    )
+    return [
+        SearchHit(product, float(score), _mark_selected(snippets[product.id]) if snippets.get(product.id) else None)
+        for product, score in rows
+    ]
+
+
+def search_products(db: Session, base_query: Query, text: str, skip: int = 0, limit: int = 100) -> List[SearchHit]:
+    """
+    Products from ``base_query`` (a filtered Product query) matching ``text``, best match first
+
+    Every query word must match (as a word, a prefix, or with a typo).
+    """
+    if _postgres_search_available(db):
+        return _search_postgres(db, base_query, text, skip, limit)
+    return _search_in_memory(db, base_query, text, skip, limit)
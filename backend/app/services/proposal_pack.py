@@ -0,0 +1,62 @@
+"""
+Proposal Pack
+
+One PDF holding the quotation, the system sizing report and the appliance
+load report for a quote's project, each section bookmarked. The quote
+document (see quote_document.py) already carries the project, customer,
+sizing result and company profile, so the reports reuse it and only the
+appliances need one extra query. The three sections are merged into a
+single HTML document and laid out in one WeasyPrint pass.
+"""
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Appliance
+from app.services.appliance_pdf_generator import render_appliance_report
+from app.services.document_rendering import RenderedDocument, combine_documents
+from app.services.pdf_generator import normalize_document_type, render_quotation_document
+from app.services.quote_document import QuoteDocument, load_quote_document
+from app.services.sizing_pdf_generator import render_sizing_report
+
+
+def render_proposal_pack(document: QuoteDocument, appliances, document_type: str = "quotation") -> RenderedDocument:
+    """Combine the quote and the project's reports; reports without data are left out"""
+    is_proforma = normalize_document_type(document_type) == "proforma_invoice"
+    sections = [(
+        "quotation",
+        f"{'Proforma Invoice' if is_proforma else 'Quotation'} {document.quote_number}",
+        render_quotation_document(document, document_type),
+    )]
+    if document.sizing_result:
+        sections.append((
+            "sizing",
+            "System Sizing Report",
+            render_sizing_report(document.project, document.customer, document.sizing_result, document.company),
+        ))
+    if appliances:
+        sections.append((
+            "appliances",
+            "Appliance Load Analysis",
+            render_appliance_report(document.project, document.customer, appliances, document.company),
+        ))
+    return combine_documents(sections, title=f"Proposal {document.quote_number} - {document.customer.name}")
+
+
+def build_proposal_pack_document(
+    db: Session,
+    quote_id: int,
+    document_type: str = "quotation",
+    document: Optional[QuoteDocument] = None,
+) -> RenderedDocument:
+    """
+    Load the project's appliances (and the quote, unless ``document`` is given) and render the pack
+
+    Raises ValueError if the quote doesn't exist.
+    """
+    if document is None:
+        document = load_quote_document(db, quote_id)
+    appliances = db.query(Appliance).filter(
+        Appliance.project_id == document.project.id
+    ).order_by(Appliance.category, Appliance.id).all()
+    return render_proposal_pack(document, appliances, document_type)
@@ -0,0 +1,108 @@
+"""
+Public Catalog Response Cache
+
+The storefront endpoints (``/api/ecommerce/products``, ``/products/{id}``,
+``/categories``) serve the same catalog to every visitor, and it changes a few
+times a week. Their response bodies are serialized once per
+(catalog version, stock version, endpoint + query parameters) and kept as
+bytes together with a strong ETag (SHA-256 of the bytes). A repeat request is
+answered from memory, and a conditional one (``If-None-Match``) gets a 304,
+neither touching the database.
+
+Versions bump on product writes and committed stock changes (see
+``product_catalog``). They are per process, so entries also expire after
+PUBLIC_CATALOG_MAX_AGE_SEC to pick up writes made by other workers. The ETag
+hashes the content, not the version, so it is valid across workers.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.http_cache import PUBLIC_SHORT_LIVED, etag_matches, strong_etag
+from app.services.product_catalog import get_public_catalog_version
+
+PUBLIC_CATALOG_MAX_AGE_SEC = 60.0
+PUBLIC_CATALOG_MAX_ENTRIES = 512  # Distinct parameter sets (searches, pages) kept per version
+
+
+@dataclass(frozen=True, slots=True)
+class CachedBody:
+    body: bytes
+    etag: str
+    headers: Tuple[Tuple[str, str], ...]  # Extra response headers, e.g. pagination
+    built_at: float
+
+
+class PublicCatalogCache:
+    """LRU of serialized responses for the current catalog version; older versions are dropped."""
+
+    def __init__(self, max_entries: int = PUBLIC_CATALOG_MAX_ENTRIES, max_age_sec: float = PUBLIC_CATALOG_MAX_AGE_SEC):
+        self._max_entries = max_entries
+        self._max_age_sec = max_age_sec
+        self._lock = Lock()
+        self._version: Optional[Hashable] = None
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+
+    def get(self, version: Hashable, key: Hashable) -> Optional[CachedBody]:
+        with self._lock:
+            if version != self._version:
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.built_at >= self._max_age_sec:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, version: Hashable, key: Hashable, body: bytes, headers: Optional[Dict[str, str]] = None) -> CachedBody:
+        entry = CachedBody(body, strong_etag(body), tuple((headers or {}).items()), time.monotonic())
+        with self._lock:
+            if version != self._version:
+                if version != get_public_catalog_version():
+                    return entry  # Built for a version already superseded; serve it once, don't keep it
+                self._version = version
+                self._entries.clear()
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version = None
+            self._entries.clear()
+
+
+_cache = PublicCatalogCache()
+
+
+def get_public_catalog_cache() -> PublicCatalogCache:
+    return _cache
+
+
+def cached_catalog_response(
+    request: Request,
+    key: Hashable,
+    build: Callable[[], Tuple[bytes, Dict[str, str]]],
+) -> Response:
+    """
+    Serve the response for key from the cache (304 if the client's ETag matches),
+    or call build() -> (JSON body bytes, extra headers) and cache it.
+    """
+    version = get_public_catalog_version()
+    entry = _cache.get(version, key)
+    if entry is None:
+        body, headers = build()
+        entry = _cache.put(version, key, body, headers)
+    headers = {"ETag": entry.etag, "Cache-Control": PUBLIC_SHORT_LIVED, **dict(entry.headers)}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
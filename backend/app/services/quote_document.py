@@ -0,0 +1,206 @@
+"""
+Quote Document Loader
+
+Everything a quotation is rendered or emailed from, loaded in a fixed number
+of queries however many lines the quote has:
+
+1. the quote joined to its project, customer and sizing result
+2. its items with their products (``selectinload``, one ``IN`` query)
+
+The company profile comes from the settings snapshot (no query while the
+snapshot is warm). The result is a ``QuoteDocument`` used by the PDF
+generator, its cache key, the quote preview and the email composer. It holds
+the loaded ORM rows themselves, so it is only valid while their session is.
+
+Display-only values (panel brand/wattage taken from the quote's panel line)
+are computed here instead of being written onto the sizing result row, so
+rendering never leaves dirty ORM objects in the session.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.config import settings
+from app.models import Customer, Project, ProductType, Quote, QuoteItem, SizingResult
+from app.services.settings_cache import SettingsSnapshot, get_settings_snapshot
+
+# Eager-load options shared by every quote document read
+QUOTE_DOCUMENT_OPTIONS = (
+    joinedload(Quote.project).joinedload(Project.customer),
+    joinedload(Quote.project).joinedload(Project.sizing_result),
+    selectinload(Quote.items).joinedload(QuoteItem.product),
+)
+
+# Panel brands recognised in free-text item descriptions (checked in order)
+_DESCRIPTION_BRANDS = (
+    (("JA", "JA SOLAR"), "JA"),
+    (("JINKO",), "Jinko"),
+    (("LONGI",), "Longi"),
+    (("CANADIAN",), "Canadian"),
+    (("TRINA",), "Trina"),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class CompanyProfile:
+    """Company details printed on quotations (settings table, falling back to config)."""
+
+    name: Optional[str]
+    address: Optional[str]
+    phone: Optional[str]
+    email: Optional[str]
+    logo_url: Optional[str]
+    bank_name: str
+    account_name: str
+    account_number: str
+    bank_branch: str
+    swift_code: str
+
+    @classmethod
+    def from_settings(cls, cfg: SettingsSnapshot) -> "CompanyProfile":
+        def bank(key: str) -> str:
+            return (cfg.get_str(key) or "").strip()
+
+        return cls(
+            name=cfg.strings.get("company_name", settings.COMPANY_NAME),
+            address=cfg.strings.get("company_address", settings.COMPANY_ADDRESS),
+            phone=cfg.strings.get("company_phone", settings.COMPANY_PHONE),
+            email=cfg.strings.get("company_email", settings.COMPANY_EMAIL),
+            logo_url=cfg.get_str("company_logo_url"),
+            bank_name=bank("company_bank_name"),
+            account_name=bank("company_account_name"),
+            account_number=bank("company_account_number"),
+            bank_branch=bank("company_bank_branch"),
+            swift_code=bank("company_swift_code"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class QuoteDocument:
+    """
+    A quote and everything rendered alongside it
+
+    Frozen only in that its fields can't be rebound; quote, items, project,
+    customer and sizing_result are the session's ORM rows, not copies.
+    """
+
+    quote: Quote
+    items: Tuple[QuoteItem, ...]  # display order
+    project: Project
+    customer: Customer
+    sizing_result: Optional[SizingResult]
+    company: CompanyProfile
+    panel_brand: Optional[str]
+    panel_wattage: Optional[float]
+
+    @property
+    def quote_id(self) -> int:
+        return self.quote.id
+
+    @property
+    def quote_number(self) -> str:
+        return self.quote.quote_number or str(self.quote.id)
+
+
+def item_display_order(item: QuoteItem) -> int:
+    """Fixed order: Panel, Inverter, Battery, Mounting, BOS, Transport, Installation, other"""
+    d = (item.description or "").upper()
+    if "PANEL" in d:
+        return 0
+    if "INVERTER" in d:
+        return 1
+    if "BATTERY" in d:
+        return 2
+    if "MOUNTING" in d:
+        return 3
+    if "BOS" in d or "BALANCE OF SYSTEM" in d:
+        return 4
+    if "TRANSPORT" in d or "LOGISTICS" in d:
+        return 5
+    if "INSTALLATION" in d:
+        return 6
+    return 7
+
+
+def _panel_from_items(items) -> Tuple[Optional[str], Optional[float]]:
+    """
+    Brand and wattage of the first panel line in the quote (source of truth)
+
+    This keeps the PDF consistent with what is actually quoted when sizing was
+    done with a different panel brand.
+    """
+    for item in items:
+        product = item.product
+        if not item.product_id or product is None or product.product_type != ProductType.PANEL:
+            continue
+        brand = product.brand
+        if not brand and item.description:
+            # Extract brand from a description like "JA Solar 570W Panel"
+            desc_upper = item.description.upper()
+            for needles, name in _DESCRIPTION_BRANDS:
+                if any(n in desc_upper for n in needles):
+                    brand = name
+                    break
+            else:
+                parts = item.description.split()
+                brand = parts[0] if parts else None
+        return brand, product.wattage
+    return None, None
+
+
+def _build_document(quote: Quote, company: CompanyProfile) -> QuoteDocument:
+    project = quote.project
+    if not project:
+        raise ValueError(f"Project {quote.project_id} not found")
+    customer = project.customer
+    if not customer:
+        raise ValueError(f"Customer {project.customer_id} not found")
+    sizing_result = project.sizing_result
+
+    panel_brand, panel_wattage = _panel_from_items(quote.items or [])
+    if sizing_result:
+        panel_brand = panel_brand or sizing_result.panel_brand
+        panel_wattage = panel_wattage or sizing_result.panel_wattage
+
+    items = tuple(sorted(
+        quote.items or [],
+        key=lambda x: (item_display_order(x), x.sort_order if x.sort_order is not None else 0),
+    ))
+    return QuoteDocument(
+        quote=quote,
+        items=items,
+        project=project,
+        customer=customer,
+        sizing_result=sizing_result,
+        company=company,
+        panel_brand=panel_brand,
+        panel_wattage=panel_wattage,
+    )
+
+
+def load_quote_document(db: Session, quote_id: int) -> QuoteDocument:
+    """Load a quote document. Raises ValueError if the quote, project or customer is missing."""
+    quote = db.query(Quote).options(*QUOTE_DOCUMENT_OPTIONS).filter(Quote.id == quote_id).first()
+    if not quote:
+        raise ValueError(f"Quote {quote_id} not found")
+    return _build_document(quote, CompanyProfile.from_settings(get_settings_snapshot(db)))
+
+
+def load_quote_documents(db: Session, quote_ids: Iterable[int], chunk_size: int = 500) -> List[QuoteDocument]:
+    """
+    Load many quote documents, two queries per chunk of quote_ids, in the order given
+
+    Quotes that don't exist or lack a project/customer are skipped.
+    """
+    quote_ids = list(quote_ids)
+    company = CompanyProfile.from_settings(get_settings_snapshot(db))
+    by_id: Dict[int, QuoteDocument] = {}
+    for start in range(0, len(quote_ids), chunk_size):
+        chunk = quote_ids[start:start + chunk_size]
+        for quote in db.query(Quote).options(*QUOTE_DOCUMENT_OPTIONS).filter(Quote.id.in_(chunk)).all():
+            try:
+                by_id[quote.id] = _build_document(quote, company)
+            except ValueError:
+                continue
+    return [by_id[quote_id] for quote_id in quote_ids if quote_id in by_id]
@@ -0,0 +1,199 @@
+"""
+Bulk Quote PDF Export
+
+Streams a ZIP of quotation / proforma invoice PDFs for a filtered set of
+quotes:
+
+- Documents are loaded in batches (``load_quote_documents``), a constant
+  number of queries per 500 quotes.
+- PDFs come from the disk cache or are rendered in the PDF process pool
+  (``get_quotation_pdf``). Renders run concurrently, bounded so an export
+  never takes more than half of the render queue from interactive downloads.
+- Each PDF is appended to the archive as soon as it is ready, in completion
+  order, and the ZIP bytes written so far are yielded straight away. The
+  archive is never held in memory (ZIP entries use data descriptors, so no
+  seeking back is needed).
+- Quotes that fail to render are listed in ``errors.txt`` at the end of the
+  archive instead of aborting the download.
+- A filter matching more than ``QUOTE_EXPORT_MAX_QUOTES`` quotes raises
+  ``ExportTooLarge`` (map to 400) rather than silently exporting a subset.
+
+Progress (total / completed / failed) is kept per export ID in this process
+and read through ``GET /api/quotes/export/{export_id}/progress``.
+"""
+import asyncio
+import logging
+import shutil
+import time
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import AsyncIterator, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Quote
+from app.schemas import QuoteExportRequest
+from app.services.pdf_generator import get_quotation_pdf, normalize_document_type
+from app.services.pdf_renderer import get_pdf_renderer
+from app.services.quote_document import QuoteDocument, load_quote_documents
+
+logger = logging.getLogger(__name__)
+
+_COPY_CHUNK_BYTES = 256 * 1024
+_MAX_TRACKED_EXPORTS = 100
+
+
+class ExportTooLarge(Exception):
+    """The export filter matches more than QUOTE_EXPORT_MAX_QUOTES quotes."""
+
+
+@dataclass(slots=True)
+class ExportProgress:
+    export_id: str
+    total: int
+    completed: int = 0
+    failed: int = 0
+    done: bool = False
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def as_dict(self) -> Dict:
+        end = self.finished_at or time.time()
+        return {
+            "export_id": self.export_id,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "done": self.done,
+            "percent": round(100.0 * (self.completed + self.failed) / self.total, 1) if self.total else 100.0,
+            "elapsed_sec": round(end - self.started_at, 1),
+        }
+
+
+_progress: "OrderedDict[str, ExportProgress]" = OrderedDict()
+_progress_lock = Lock()
+
+
+def start_progress(export_id: str, total: int) -> ExportProgress:
+    progress = ExportProgress(export_id=export_id, total=total)
+    with _progress_lock:
+        _progress[export_id] = progress
+        _progress.move_to_end(export_id)
+        while len(_progress) > _MAX_TRACKED_EXPORTS:
+            _progress.popitem(last=False)
+    return progress
+
+
+def get_progress(export_id: str) -> Optional[ExportProgress]:
+    with _progress_lock:
+        return _progress.get(export_id)
+
+
+def select_export_quote_ids(db: Session, export: QuoteExportRequest) -> List[int]:
+    """IDs of quotes matching the filter, oldest first. Raises ExportTooLarge past QUOTE_EXPORT_MAX_QUOTES."""
+    query = db.query(Quote.id)
+    if export.quote_ids:
+        query = query.filter(Quote.id.in_(export.quote_ids))
+    if export.status:
+        query = query.filter(Quote.status == export.status)
+    if export.start_date:
+        query = query.filter(Quote.created_at >= export.start_date)
+    if export.end_date:
+        end = export.end_date
+        if end.time() == datetime.min.time():
+            # Date only: include the whole day
+            query = query.filter(Quote.created_at < end + timedelta(days=1))
+        else:
+            query = query.filter(Quote.created_at <= end)
+    cap = settings.QUOTE_EXPORT_MAX_QUOTES
+    rows = query.order_by(Quote.created_at, Quote.id).limit(cap + 1).all()
+    if len(rows) > cap:
+        raise ExportTooLarge(
+            f"More than {cap} quotes match the export filter; narrow the filter or date range"
+        )
+    return [row[0] for row in rows]
+
+
+class _ZipStream:
+    """Write-only, unseekable sink for ZipFile; drain() hands back what was written."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_concurrency() -> int:
+    """Renders an export keeps in flight: enough to fill the workers, at most half the queue."""
+    renderer = get_pdf_renderer()
+    return max(1, min(max(renderer.workers, 1) * 2, renderer.max_queue // 2))
+
+
+def _entry_name(document: QuoteDocument, document_type: str) -> str:
+    prefix = "proforma_invoice" if document_type == "proforma_invoice" else "quotation"
+    safe_number = document.quote_number.replace("/", "_").replace("\\", "_")
+    return f"{prefix}_{safe_number}.pdf"
+
+
+async def stream_quote_export(
+    db: Session,
+    documents: List[QuoteDocument],
+    document_type: str,
+    progress: ExportProgress,
+) -> AsyncIterator[bytes]:
+    """Yield a ZIP archive of the documents' PDFs, each added as soon as it is ready."""
+    document_type = normalize_document_type(document_type)
+    semaphore = asyncio.Semaphore(export_concurrency())
+
+    async def produce(document: QuoteDocument):
+        async with semaphore:
+            try:
+                return document, await get_quotation_pdf(db, document.quote_id, document_type, document=document), None
+            except Exception as e:  # Reported in errors.txt; the rest of the export continues
+                return document, None, e
+
+    tasks = [asyncio.ensure_future(produce(document)) for document in documents]
+    sink = _ZipStream()
+    errors: List[str] = []
+    try:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            for next_done in asyncio.as_completed(tasks):
+                document, path, error = await next_done
+                if error is None:
+                    try:
+                        # PDFs are already compressed: stored, copied in chunks
+                        with open(path, "rb") as src, archive.open(_entry_name(document, document_type), "w") as dst:
+                            shutil.copyfileobj(src, dst, _COPY_CHUNK_BYTES)
+                    except OSError as e:  # e.g. evicted from the cache in between
+                        error = e
+                if error is None:
+                    progress.completed += 1
+                else:
+                    progress.failed += 1
+                    errors.append(f"{document.quote_number} (id {document.quote_id}): {error}")
+                    logger.warning("Quote export %s: quote %s failed: %s", progress.export_id, document.quote_id, error)
+                data = sink.drain()
+                if data:
+                    yield data
+            if errors:
+                archive.writestr("errors.txt", "\n".join(errors) + "\n")
+        yield sink.drain()
+    finally:
+        for task in tasks:
+            task.cancel()
+        progress.done = True
+        progress.finished_at = time.time()
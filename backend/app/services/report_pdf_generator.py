@@ -2,18 +2,12 @@
 PDF Generation Service for Reports & Analytics
 """
 from io import BytesIO
-from jinja2 import Template, Environment
-from weasyprint import HTML
 from datetime import datetime
 from sqlalchemy.orm import Session
 from app.models import Setting
-
-
-def format_currency(value):
-    """Format currency value"""
-    if value is None:
-        return "0.00"
-    return f"{float(value):,.2f}"
+from app.services.document_rendering import (
+    RenderedDocument, format_currency, register_template, write_pdf
+)
 
 
 REPORT_TEMPLATE = """
@@ -352,14 +346,17 @@ REPORT_TEMPLATE = """
 """
 
 
-def generate_report_pdf(
+ANALYTICS_REPORT = register_template("analytics_report", REPORT_TEMPLATE, presentational_hints=True)
+
+
+def build_report_document(
     db: Session,
     analytics_data: dict
-) -> BytesIO:
+) -> RenderedDocument:
     """
-    Generate a PDF report from analytics data
+    Render the analytics report (body HTML + stylesheet)
     
-    Returns a BytesIO object containing the PDF
+    Needs the database session; layout happens separately (see pdf_renderer.py)
     """
     # Fetch company settings
     company_name_setting = db.query(Setting).filter(Setting.key == "company_name").first()
@@ -373,12 +370,8 @@ def generate_report_pdf(
     period_end = datetime.fromisoformat(analytics_data['period']['end'].replace('Z', '+00:00')).strftime('%B %d, %Y')
     generated_date = datetime.now().strftime('%B %d, %Y at %I:%M %p')
     
-    # Render template
-    env = Environment()
-    env.filters['format_currency'] = format_currency
-    
-    template = env.from_string(REPORT_TEMPLATE)
-    html_content = template.render(
+    # Render template (compiled once at import)
+    document = ANALYTICS_REPORT.render(
         company_name=company_name,
         company_email=company_email,
         period_start=period_start,
@@ -387,10 +380,18 @@ def generate_report_pdf(
         **analytics_data
     )
     
-    # Generate PDF
-    pdf_bytes = BytesIO()
-    HTML(string=html_content).write_pdf(pdf_bytes, presentational_hints=True)
-    pdf_bytes.seek(0)
+    return document
+
+
+def generate_report_pdf(
+    db: Session,
+    analytics_data: dict
+) -> BytesIO:
+    """
+    Generate a PDF report from analytics data
     
-    return pdf_bytes
+    Returns a BytesIO object containing the PDF
+    """
+    document = build_report_document(db, analytics_data)
+    return BytesIO(write_pdf(document.html, document.css, presentational_hints=document.presentational_hints))
 
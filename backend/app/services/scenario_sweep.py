@@ -0,0 +1,168 @@
+"""
+Sizing Scenario Sweep
+
+Evaluates the full Cartesian grid of backup hours × panel brand × essential
+load % × peak sun hours × design factor for one daily load, in one vectorized
+pass over ``size_arrays``. Nothing is persisted.
+
+Results come back as a compact matrix: the axis values, the grid shape, and
+one flat (row-major, C order) list per metric.
+"""
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import SystemType
+from app.services.batch_sizing import size_arrays
+from app.services.pricing import indicative_price
+from app.services.sizing import get_panel_wattage, get_peak_sun_hours, get_sizing_factors, resolve_backup_hours
+
+MAX_SWEEP_CELLS = 20000  # Largest grid one request may evaluate
+
+SWEEP_METRICS = (
+    "system_size_kw",
+    "number_of_panels",
+    "inverter_count",
+    "inverter_unit_size_kw",
+    "inverter_size_kw",
+    "battery_capacity_kwh",
+    "indicative_price",
+)
+
+
+def _price_grid(
+    db: Session,
+    cells: Dict[str, np.ndarray],
+    brands: np.ndarray,
+    wattages: np.ndarray,
+    configurations: Optional[List[List[float]]] = None,
+) -> np.ndarray:
+    """Indicative quote total per cell; identical sizing outcomes are priced once."""
+    prices = np.empty(brands.size, dtype=float)
+    memo: Dict[tuple, float] = {}
+    batteries = [None if v != v else v for v in cells["battery_capacity_kwh"].ravel().tolist()]  # NaN = no battery
+    if configurations is None:
+        configurations = [None] * brands.size
+    columns = zip(
+        brands.ravel().tolist(),
+        wattages.ravel().tolist(),
+        cells["number_of_panels"].ravel().tolist(),
+        cells["inverter_count"].ravel().tolist(),
+        cells["inverter_unit_size_kw"].ravel().tolist(),
+        cells["inverter_size_kw"].ravel().tolist(),
+        batteries,
+        cells["system_size_kw"].ravel().tolist(),
+        (tuple(c) if c else None for c in configurations),
+    )
+    for k, key in enumerate(columns):
+        price = memo.get(key)
+        if price is None:
+            brand, wattage, panels, inv_count, inv_unit, inv_total, battery, system_kw, config = key
+            sizing = SimpleNamespace(
+                panel_brand=brand,
+                panel_wattage=int(wattage),
+                number_of_panels=panels,
+                inverter_count=inv_count,
+                inverter_unit_size_kw=inv_unit,
+                inverter_size_kw=inv_total,
+                inverter_configuration=list(config) if config else None,
+                battery_capacity_kwh=battery,
+                system_size_kw=system_kw,
+            )
+            price = memo[key] = round(indicative_price(db, sizing), 2)
+        prices[k] = price
+    return prices.reshape(brands.shape)
+
+
+def run_sizing_sweep(
+    db: Session,
+    total_daily_kwh: float,
+    backup_hours: Sequence[Optional[float]],
+    panel_brands: Sequence[str],
+    essential_load_percent: Sequence[float],
+    peak_sun_hours: Sequence[float],
+    design_factor: Sequence[float],
+    system_type: Optional[SystemType] = None,
+    location: Optional[str] = None,
+) -> dict:
+    """
+    Size every combination of the given axis values
+
+    Empty axes fall back to what calculate_sizing would use: system-type default
+    backup hours, 50% essential load, the location's peak sun hours and the
+    design factor from settings.
+    """
+    factors = get_sizing_factors(db)
+    axes = {
+        "backup_hours": list(backup_hours) or [None],
+        "panel_brand": list(panel_brands) or ["Jinko"],
+        "essential_load_percent": list(essential_load_percent) or [0.5],
+        "peak_sun_hours": list(peak_sun_hours)
+        or [get_peak_sun_hours(db, location) or factors.default_peak_sun_hours],
+        "design_factor": list(design_factor) or [factors.design_factor],
+    }
+
+    # Resolve per-axis values to numbers before building the grid
+    resolved_backup = [resolve_backup_hours(system_type, b) for b in axes["backup_hours"]]
+    battery_hours = [hours if needs and hours > 0 else 0.0 for needs, hours in resolved_backup]
+    axes["backup_hours"] = [hours for _, hours in resolved_backup]
+    wattages = [get_panel_wattage(b) for b in axes["panel_brand"]]
+
+    bh, w_idx, ess, psh, df = np.meshgrid(
+        np.array(battery_hours, dtype=float),
+        np.arange(len(wattages)),
+        np.array(axes["essential_load_percent"], dtype=float),
+        np.array(axes["peak_sun_hours"], dtype=float),
+        np.array(axes["design_factor"], dtype=float),
+        indexing="ij",
+    )
+    wattage = np.array(wattages, dtype=float)[w_idx]
+    out = size_arrays(
+        factors,
+        np.full(bh.shape, float(total_daily_kwh)),
+        psh,
+        wattage,
+        bh,
+        ess,
+        design_factor=df,
+    )
+
+    # Round like stored SizingResult values, so prices match a saved sizing
+    cells = {
+        "system_size_kw": np.round(out.system_size_kw, 2),
+        "number_of_panels": out.number_of_panels,
+        "inverter_count": out.inverter_count,
+        "inverter_unit_size_kw": np.round(out.inverter_unit_size_kw, 1),
+        "inverter_size_kw": np.round(out.inverter_size_kw, 1),
+        "battery_capacity_kwh": np.round(out.battery_capacity_kwh, 1),
+    }
+    brands = np.array(axes["panel_brand"], dtype=object)[w_idx]
+    cells["indicative_price"] = _price_grid(db, cells, brands, wattage, out.inverter_configuration)
+
+    values: Dict[str, List] = {}
+    for name in SWEEP_METRICS:
+        flat = cells[name].ravel()
+        if name == "battery_capacity_kwh":
+            values[name] = [None if v != v else v for v in flat.tolist()]
+        else:
+            values[name] = flat.tolist()
+
+    return {
+        "total_daily_kwh": total_daily_kwh,
+        "axes": axes,
+        "shape": list(bh.shape),
+        "cells": int(bh.size),
+        "metrics": list(SWEEP_METRICS),
+        "values": values,
+    }
+
+
+def sweep_cell_count(*axes: Sequence) -> int:
+    """Number of grid cells (empty axes count as one value)."""
+    total = 1
+    for axis in axes:
+        total *= max(1, len(axis))
+    return total
+
@@ -0,0 +1,105 @@
+"""
+Settings Snapshot Cache
+
+Loads the whole ``settings`` table in one query and parses every value once.
+Sizing, load and pricing code read from the in-memory snapshot instead of
+running a ``SELECT ... WHERE key = ?`` per lookup.
+
+The snapshot carries a version counter. Admin writes (``routers/settings.py``,
+``routers/content.py``) call ``bump_settings_version()`` so the next reader
+reloads. Each worker process keeps its own snapshot, so a short max age also
+applies: changes made through another worker are picked up within
+``SETTINGS_SNAPSHOT_MAX_AGE_SEC`` seconds.
+"""
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Setting
+from app.services.versioned_cache import VersionedCache
+
+SETTINGS_SNAPSHOT_MAX_AGE_SEC = 60.0
+
+DEFAULT_STANDARD_INVERTER_SIZES: Tuple[float, ...] = (10.0, 15.0, 20.0, 25.0, 30.0)
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_float_list(value: Optional[str]) -> Optional[Tuple[float, ...]]:
+    if not value:
+        return None
+    try:
+        return tuple(sorted(float(x.strip()) for x in value.split(",")))
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Immutable, pre-parsed view of the settings table at a given version."""
+
+    version: int
+    strings: Mapping[str, str] = field(default_factory=dict)
+    floats: Mapping[str, float] = field(default_factory=dict)
+    standard_inverter_sizes: Tuple[float, ...] = DEFAULT_STANDARD_INVERTER_SIZES
+
+    def get_float(self, key: str, default: float) -> float:
+        """Setting value as float, or ``default`` when missing or not numeric."""
+        return self.floats.get(key, default)
+
+    def get_str(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self.strings.get(key, default)
+
+
+def load_settings_snapshot(db: Session) -> SettingsSnapshot:
+    """Read every setting in one query and parse it (no caching)."""
+    rows = db.query(Setting.key, Setting.value).all()
+    strings = {key: value for key, value in rows if key is not None}
+    floats = {}
+    for key, value in strings.items():
+        parsed = _parse_float(value)
+        if parsed is not None:
+            floats[key] = parsed
+    inverter_sizes = _parse_float_list(strings.get("standard_inverter_sizes"))
+    return SettingsSnapshot(
+        version=_CACHE.version,
+        strings=MappingProxyType(strings),
+        floats=MappingProxyType(floats),
+        standard_inverter_sizes=inverter_sizes or DEFAULT_STANDARD_INVERTER_SIZES,
+    )
+
+
+_CACHE: VersionedCache[SettingsSnapshot] = VersionedCache(
+    load_settings_snapshot, max_age_sec=SETTINGS_SNAPSHOT_MAX_AGE_SEC
+)
+
+
+def bump_settings_version() -> int:
+    """Invalidate the cached snapshot after a settings write. Returns the new version."""
+    return _CACHE.bump()
+
+
+def get_settings_version() -> int:
+    return _CACHE.version
+
+
+def get_settings_snapshot(db: Session) -> SettingsSnapshot:
+    """Current snapshot; reloads only after a settings write (or max age)."""
+    return _CACHE.get(db)
+
+
+def peek_settings_snapshot() -> Optional[SettingsSnapshot]:
+    """Current snapshot if loaded and fresh, without touching the database."""
+    return _CACHE.peek()
+
+
+def get_setting_value(db: Session, key: str, default: float) -> float:
+    """Get a setting value as float, or return default"""
+    return get_settings_snapshot(db).get_float(key, default)
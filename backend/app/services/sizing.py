@@ -11,22 +11,100 @@ References:
 - Spacing factor: 1.1-1.2 (accounts for mounting structure spacing)
 - Battery DoD: 80% for lithium batteries
 """
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from sqlalchemy.orm import Session
-from app.models import Setting, PeakSunHours, Product, ProductType
+from app.models import SystemType
 from app.schemas import SizingInput, SizingResult
+from app.services.inverter_optimizer import inverter_costs, optimize_inverter_mix
+from app.services.location_resolver import resolve_location
+from app.services.product_catalog import CatalogSnapshot, get_catalog_snapshot
+from app.services.settings_cache import SettingsSnapshot, get_setting_value, get_settings_snapshot
 import math
 
 
-def get_setting_value(db: Session, key: str, default: float) -> float:
-    """Get a setting value as float, or return default"""
-    setting = db.query(Setting).filter(Setting.key == key).first()
-    if setting:
-        try:
-            return float(setting.value)
-        except (ValueError, TypeError):
-            return default
-    return default
+class SizingFactors:
+    """Sizing factors resolved from the settings and catalog snapshots."""
+
+    __slots__ = (
+        "system_efficiency",
+        "design_factor",
+        "max_dc_ac_ratio",
+        "panel_area_m2",
+        "spacing_factor",
+        "battery_dod",
+        "battery_c_rate",
+        "battery_discharge_efficiency",
+        "battery_charge_efficiency",
+        "min_battery_size_kwh",
+        "default_peak_sun_hours",
+        "use_parallel_inverters",
+        "max_parallel_inverters",
+        "prefer_parallel_above_kw",
+        "inverter_sizes",
+        "allow_mixed_inverter_sizes",
+        "inverter_costs",
+    )
+
+    def __init__(self, cfg: SettingsSnapshot, catalog: CatalogSnapshot):
+        self.system_efficiency = cfg.get_float("system_efficiency", 0.72)  # 72% default for Ghana
+        self.design_factor = cfg.get_float("design_factor", 1.20)  # 20% safety margin for Ghana
+        self.max_dc_ac_ratio = cfg.get_float("max_dc_ac_ratio", 1.3)
+        self.panel_area_m2 = cfg.get_float("panel_area_m2", 2.6)
+        self.spacing_factor = cfg.get_float("spacing_factor", 1.15)
+        self.battery_dod = cfg.get_float("battery_dod", 0.85)  # 85% depth of discharge for modern LiFePO4
+        self.battery_c_rate = cfg.get_float("battery_c_rate", 0.5)  # 0.5C = can discharge 50% of capacity per hour (typical for LiFePO4)
+        self.battery_discharge_efficiency = cfg.get_float("battery_discharge_efficiency", 0.90)  # 90% efficiency for battery → inverter → load (accounts for inverter losses)
+        self.battery_charge_efficiency = cfg.get_float("battery_charge_efficiency", 0.95)  # Charger → battery (hourly simulation)
+        self.min_battery_size_kwh = cfg.get_float("min_battery_size_kwh", 5.0)
+        self.default_peak_sun_hours = cfg.get_float("default_peak_sun_hours", 5.2)  # Ghana average default
+        self.use_parallel_inverters = cfg.get_float("use_parallel_inverters", 1.0) > 0  # 1.0 = enabled
+        self.max_parallel_inverters = int(cfg.get_float("max_parallel_inverters", 4.0))  # Maximum inverters in parallel
+        self.prefer_parallel_above_kw = cfg.get_float("prefer_parallel_above_kw", 30.0)  # Prefer parallel above this threshold
+        # Combine actual product sizes with standard sizes, remove duplicates, and sort
+        # This ensures we check real products, but can also use standard sizes for parallel config
+        self.inverter_sizes = tuple(sorted(set(catalog.inverter_sizes) | set(cfg.standard_inverter_sizes)))
+        # Mixed-size parallel banks (e.g. 20kW + 10kW) via the inverter optimizer; off by default
+        self.allow_mixed_inverter_sizes = cfg.get_float("allow_mixed_inverter_sizes", 0.0) > 0
+        self.inverter_costs = inverter_costs(catalog, self.inverter_sizes)
+
+
+def select_inverter_configuration(factors: SizingFactors, required_kw: float) -> Dict:
+    """Parallel inverter configuration for required_kw using the configured strategy"""
+    if factors.allow_mixed_inverter_sizes and factors.use_parallel_inverters:
+        return optimize_inverter_mix(
+            required_kw=required_kw,
+            available_sizes=factors.inverter_sizes,
+            max_parallel=factors.max_parallel_inverters,
+            prefer_parallel_above_kw=factors.prefer_parallel_above_kw,
+            costs=factors.inverter_costs,
+        )
+    return calculate_parallel_inverters(
+        required_kw=required_kw,
+        available_sizes=list(factors.inverter_sizes),
+        max_parallel=factors.max_parallel_inverters,
+        use_parallel=factors.use_parallel_inverters,
+        prefer_parallel_above_kw=factors.prefer_parallel_above_kw
+    )
+
+
+def get_sizing_factors(db: Session) -> SizingFactors:
+    """Sizing factors from the in-memory settings and product catalog snapshots"""
+    return SizingFactors(get_settings_snapshot(db), get_catalog_snapshot(db))
+
+
+def resolve_backup_hours(system_type: Optional[SystemType], backup_hours: Optional[float]) -> Tuple[bool, float]:
+    """
+    Decide whether a battery is needed and for how many backup hours
+    
+    - HYBRID and OFF_GRID systems always need batteries. Default backup hours if not specified:
+      OFF_GRID 24 hours (full day backup), HYBRID 8 hours (typical backup for grid outages)
+    - GRID_TIED (or unknown system type) only needs a battery if backup_hours > 0
+    """
+    if system_type and system_type.value in ['hybrid', 'off_grid']:
+        if not backup_hours:
+            return True, 24.0 if system_type.value == 'off_grid' else 8.0
+        return True, backup_hours
+    return bool(backup_hours and backup_hours > 0), backup_hours or 0
 
 
 def get_peak_sun_hours(db: Session, location: Optional[str]) -> Optional[float]:
@@ -34,16 +112,10 @@ def get_peak_sun_hours(db: Session, location: Optional[str]) -> Optional[float]:
     if not location:
         return None
     
-    # Try to find by city, state, or country
-    location_lower = location.lower()
-    psd = db.query(PeakSunHours).filter(
-        (PeakSunHours.city.ilike(f"%{location_lower}%")) |
-        (PeakSunHours.state.ilike(f"%{location_lower}%")) |
-        (PeakSunHours.country.ilike(f"%{location_lower}%"))
-    ).first()
-    
-    if psd:
-        return psd.peak_sun_hours
+    # Exact city/state/country, then prefix/substring/trigram match (in-memory index)
+    match = resolve_location(db, location)
+    if match:
+        return match.peak_sun_hours
     
     # Default fallback
     return get_setting_value(db, "default_peak_sun_hours", 5.0)
@@ -187,20 +259,15 @@ def calculate_sizing(db: Session, sizing_input: SizingInput) -> SizingResult:
     7. Calculate battery (if needed): battery_kwh = (essential_load_kw * backup_hours) / dod
     """
     # Get configurable factors from settings (Ghana-optimized defaults)
-    system_efficiency = get_setting_value(db, "system_efficiency", 0.72)  # 72% default for Ghana
-    design_factor = get_setting_value(db, "design_factor", 1.20)  # 20% safety margin for Ghana
-    max_dc_ac_ratio = get_setting_value(db, "max_dc_ac_ratio", 1.3)
-    panel_area_m2 = get_setting_value(db, "panel_area_m2", 2.6)
-    spacing_factor = get_setting_value(db, "spacing_factor", 1.15)
-    battery_dod = get_setting_value(db, "battery_dod", 0.85)  # 85% depth of discharge for modern LiFePO4
-    battery_c_rate = get_setting_value(db, "battery_c_rate", 0.5)  # 0.5C = can discharge 50% of capacity per hour (typical for LiFePO4)
-    battery_discharge_efficiency = get_setting_value(db, "battery_discharge_efficiency", 0.90)  # 90% efficiency for battery → inverter → load (accounts for inverter losses)
-    min_battery_size = get_setting_value(db, "min_battery_size_kwh", 5.0)
+    # One in-memory snapshot serves every lookup below
+    factors = get_sizing_factors(db)
+    system_efficiency = factors.system_efficiency
+    design_factor = factors.design_factor
     
     # Get peak sun hours
     peak_sun_hours = get_peak_sun_hours(db, sizing_input.location)
     if not peak_sun_hours:
-        peak_sun_hours = get_setting_value(db, "default_peak_sun_hours", 5.2)  # Ghana average default
+        peak_sun_hours = factors.default_peak_sun_hours
     
     # Get panel wattage
     panel_wattage = get_panel_wattage(sizing_input.panel_brand)
@@ -215,64 +282,19 @@ def calculate_sizing(db: Session, sizing_input: SizingInput) -> SizingResult:
     system_size_kw *= design_factor
     
     # Step 4: Calculate number of panels
-    import math
     number_of_panels = math.ceil(system_size_kw * 1000 / panel_wattage)
     
     # Calculate actual panel array capacity (using actual number of panels)
     panel_array_capacity_kw = (number_of_panels * panel_wattage) / 1000
     
     # Step 5: Calculate roof area
-    roof_area_m2 = number_of_panels * panel_area_m2 * spacing_factor
+    roof_area_m2 = number_of_panels * factors.panel_area_m2 * factors.spacing_factor
     
     # Step 6: Calculate inverter size (with parallel inverter support)
-    min_inverter_kw = system_size_kw / max_dc_ac_ratio
-    
-    # Get parallel inverter configuration settings
-    use_parallel_inverters = get_setting_value(db, "use_parallel_inverters", 1.0)  # 1.0 = enabled
-    
-    # Get standard inverter sizes from settings (for parallel configuration)
-    standard_inverter_sizes_setting = db.query(Setting).filter(Setting.key == "standard_inverter_sizes").first()
-    if standard_inverter_sizes_setting:
-        standard_inverter_sizes_str = standard_inverter_sizes_setting.value
-    else:
-        standard_inverter_sizes_str = "10,15,20,25,30"
-    
-    max_parallel_inverters = get_setting_value(db, "max_parallel_inverters", 4.0)  # Maximum inverters in parallel
-    prefer_parallel_above_kw = get_setting_value(db, "prefer_parallel_above_kw", 30.0)  # Prefer parallel above this threshold
-    
-    # Get actual available inverter sizes from product catalog
-    # This ensures we check real products, not just configured standard sizes
-    actual_inverter_products = db.query(Product).filter(
-        Product.product_type == ProductType.INVERTER,
-        Product.is_active == True
-    ).order_by(Product.capacity_kw.asc()).all()
-    
-    actual_inverter_sizes = [float(p.capacity_kw) for p in actual_inverter_products if p.capacity_kw]
-    
-    # Parse standard inverter sizes (for parallel configuration)
-    try:
-        standard_sizes = [float(x.strip()) for x in standard_inverter_sizes_str.split(",")]
-        standard_sizes.sort()  # Sort ascending
-    except:
-        # Default sizes if parsing fails
-        standard_sizes = [10.0, 15.0, 20.0, 25.0, 30.0]
-    
-    # Combine actual product sizes with standard sizes, remove duplicates, and sort
-    # This ensures we check actual products first, but can also use standard sizes for parallel config
-    all_available_sizes = list(set(actual_inverter_sizes + standard_sizes))
-    all_available_sizes.sort()
-    
-    # Use combined list for inverter selection
-    inverter_sizes = all_available_sizes
+    min_inverter_kw = system_size_kw / factors.max_dc_ac_ratio
     
     # Calculate parallel inverter configuration
-    inverter_config = calculate_parallel_inverters(
-        required_kw=min_inverter_kw,
-        available_sizes=inverter_sizes,
-        max_parallel=int(max_parallel_inverters),
-        use_parallel=use_parallel_inverters > 0,
-        prefer_parallel_above_kw=prefer_parallel_above_kw
-    )
+    inverter_config = select_inverter_configuration(factors, min_inverter_kw)
     
     # Store inverter configuration
     inverter_size_kw = inverter_config["total_capacity"]
@@ -286,30 +308,9 @@ def calculate_sizing(db: Session, sizing_input: SizingInput) -> SizingResult:
     # For HYBRID and OFF_GRID systems, batteries are essential
     # For GRID_TIED systems, only add if backup_hours > 0
     battery_capacity_kwh = None
-    system_type = getattr(sizing_input, 'system_type', None)
-    
-    # Determine if battery is needed
-    needs_battery = False
-    backup_hours_to_use = sizing_input.backup_hours or 0
-    
-    if system_type:
-        # If system type is provided, use it to determine battery need
-        if system_type.value in ['hybrid', 'off_grid']:
-            # HYBRID and OFF_GRID systems always need batteries
-            needs_battery = True
-            # Default backup hours if not specified:
-            # - OFF_GRID: 24 hours (full day backup)
-            # - HYBRID: 8 hours (typical backup for grid outages)
-            if not sizing_input.backup_hours or sizing_input.backup_hours == 0:
-                backup_hours_to_use = 24.0 if system_type.value == 'off_grid' else 8.0
-        elif system_type.value == 'grid_tied':
-            # GRID_TIED only needs battery if backup_hours > 0
-            needs_battery = sizing_input.backup_hours and sizing_input.backup_hours > 0
-            backup_hours_to_use = sizing_input.backup_hours or 0
-    else:
-        # Fallback: use backup_hours if provided
-        needs_battery = sizing_input.backup_hours and sizing_input.backup_hours > 0
-        backup_hours_to_use = sizing_input.backup_hours or 0
+    needs_battery, backup_hours_to_use = resolve_backup_hours(
+        getattr(sizing_input, 'system_type', None), sizing_input.backup_hours
+    )
     
     if needs_battery and backup_hours_to_use > 0:
         # Estimate essential load (use percentage if provided, else assume 50%)
@@ -319,25 +320,25 @@ def calculate_sizing(db: Session, sizing_input: SizingInput) -> SizingResult:
         
         # Account for battery discharge efficiency (battery DC → inverter → AC load)
         # If load needs 5kW AC, battery must provide: 5kW / efficiency = 5.56kW DC (at 90% efficiency)
-        essential_load_kw_dc = essential_load_kw_ac / battery_discharge_efficiency
+        essential_load_kw_dc = essential_load_kw_ac / factors.battery_discharge_efficiency
         
         # Step 1: Calculate battery capacity based on ENERGY requirement
         # Formula: capacity = (load_power_dc × backup_hours) / depth_of_discharge
         # We use DC power because battery stores/discharges DC
-        battery_capacity_kwh_energy = (essential_load_kw_dc * backup_hours_to_use) / battery_dod
+        battery_capacity_kwh_energy = (essential_load_kw_dc * backup_hours_to_use) / factors.battery_dod
         
         # Step 2: Calculate battery capacity based on POWER requirement (C-rate)
         # Formula: capacity = load_power_dc / (C-rate × DOD)
         # The battery must be able to deliver the required DC power continuously
         # Max power battery can deliver = C-rate × Capacity × DOD
         # Therefore: Capacity = load_power_dc / (C-rate × DOD)
-        battery_capacity_kwh_power = essential_load_kw_dc / (battery_c_rate * battery_dod)
+        battery_capacity_kwh_power = essential_load_kw_dc / (factors.battery_c_rate * factors.battery_dod)
         
         # Step 3: Use the LARGER of the two (must satisfy both energy AND power requirements)
         battery_capacity_kwh = max(battery_capacity_kwh_energy, battery_capacity_kwh_power)
         
         # Round to nearest multiple of 5 kWh, minimum min_battery_size
-        battery_capacity_kwh = max(min_battery_size, math.ceil(battery_capacity_kwh / 5) * 5)
+        battery_capacity_kwh = max(factors.min_battery_size_kwh, math.ceil(battery_capacity_kwh / 5) * 5)
     
     # Create sizing result
     sizing_result = SizingResult(
@@ -357,6 +358,7 @@ def calculate_sizing(db: Session, sizing_input: SizingInput) -> SizingResult:
         inverter_size_kw=round(inverter_size_kw, 1),  # Selected product size
         inverter_count=inverter_config["count"],  # Number of parallel inverters
         inverter_unit_size_kw=round(inverter_config["unit_size"], 1),  # Selected product unit size
+        inverter_configuration=inverter_config["configuration"],  # Unit sizes (may mix sizes)
         battery_capacity_kwh=round(battery_capacity_kwh, 1) if battery_capacity_kwh else None,
         system_efficiency=system_efficiency,
         dc_ac_ratio=round(dc_ac_ratio, 2),  # Use actual panel array capacity for accurate ratio
@@ -2,15 +2,29 @@
 Stock management service.
 Deducts stock when project status → ACCEPTED and when e-commerce order payment completes.
 Restores stock when project status ACCEPTED → REJECTED.
+
+Stock changes are set-based: the quantities for all products involved are
+applied in one statement and the StockMovement rows are inserted in one
+batch. On PostgreSQL that statement locks the product rows in id order
+(concurrent checkouts queue instead of deadlocking), checks availability on
+the locked rows and updates them, all in one round trip, so two payments can
+never both pass the check and oversell. Other databases take the same locks
+with SELECT ... FOR UPDATE and update through the ORM.
+
+Committed stock changes bump the stock version, so cached public catalog
+responses (stock_quantity / in_stock) are rebuilt.
 """
 import math
-from typing import List, Tuple, Optional
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple, Optional
+from sqlalchemy import func, insert, text
 from sqlalchemy.orm import Session
 from app.models import (
     Quote, QuoteItem, Product,
     QuoteStatus,
     StockMovement, StockMovementType
 )
+from app.services.product_catalog import bump_stock_version_after_commit
 
 
 def _get_quote_for_project(db: Session, project_id: int) -> Optional[Quote]:
@@ -34,25 +48,141 @@ def _get_quote_for_project(db: Session, project_id: int) -> Optional[Quote]:
     return quote
 
 
-def _items_for_stock_deduction(db: Session, quote_id: int) -> List[Tuple[QuoteItem, int]]:
+def _stock_qty(quantity: float) -> int:
+    """Units to move for a line quantity (at least 1, fractions rounded up)"""
+    return max(1, int(math.ceil(quantity)))
+
+
+def _items_for_stock_deduction(db: Session, quote_id: int) -> List[Tuple[int, int, int]]:
     """
-    Get quote items that have product_id and manage_stock=True.
-    Returns list of (item, qty_to_deduct) where qty is integer (ceil of quantity).
+    Quote items whose product has manage_stock=True, in one query.
+    Returns list of (quote_item_id, product_id, qty_to_deduct).
     """
-    items = db.query(QuoteItem).filter(
+    rows = db.query(QuoteItem.id, QuoteItem.product_id, QuoteItem.quantity).join(
+        Product, Product.id == QuoteItem.product_id
+    ).filter(
         QuoteItem.quote_id == quote_id,
-        QuoteItem.product_id.isnot(None)
-    ).all()
-
-    result = []
-    for item in items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product and product.manage_stock:
-            qty = max(1, int(math.ceil(item.quantity)))
-            result.append((item, qty))
+        Product.manage_stock == True,
+    ).order_by(QuoteItem.id).all()
+    return [(item_id, product_id, _stock_qty(quantity)) for item_id, product_id, quantity in rows]
+
+
+def _totals(lines: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """Sum (product_id, qty) lines per product"""
+    totals: Dict[int, int] = defaultdict(int)
+    for product_id, qty in lines:
+        totals[product_id] += qty
+    return dict(totals)
+
+
+def _shortage_errors(db: Session, required: Dict[int, int]) -> List[str]:
+    """Messages for stock-managed products with less stock than required"""
+    errors = []
+    products = db.query(Product).filter(
+        Product.id.in_(required), Product.manage_stock == True
+    ).order_by(Product.id).all()
+    for product in products:
+        available = product.stock_quantity or 0
+        if available < required[product.id]:
+            errors.append(
+                f"Insufficient stock for '{product.name or product.model or product.brand or 'Product'}': "
+                f"required {required[product.id]}, available {available}"
+            )
+    return errors
+
+
+def _apply_stock_deltas_postgres(
+    db: Session, deltas: Dict[int, int], require_available: bool, managed_only: bool
+) -> Optional[Dict[int, int]]:
+    params = {"require_available": require_available, "managed_only": managed_only}
+    rows_sql = []
+    for i, (product_id, delta) in enumerate(sorted(deltas.items())):
+        params[f"id{i}"] = product_id
+        params[f"d{i}"] = delta
+        rows_sql.append(f"(CAST(:id{i} AS INTEGER), CAST(:d{i} AS INTEGER))")
+    # One statement: lock the rows in id order, check every product has enough
+    # stock (on the locked, current row versions), update all or none
+    stmt = text(f"""
+        WITH v(id, delta) AS (VALUES {", ".join(rows_sql)}),
+        locked AS (
+            SELECT p.id, COALESCE(p.stock_quantity, 0) + v.delta AS new_qty
+            FROM products AS p JOIN v ON v.id = p.id
+            WHERE p.manage_stock OR NOT :managed_only
+            ORDER BY p.id
+            FOR UPDATE OF p
+        ),
+        check_all AS (
+            SELECT COALESCE(bool_and(new_qty >= 0), TRUE) AS ok FROM locked
+        ),
+        updated AS (
+            UPDATE products
+            SET stock_quantity = locked.new_qty, in_stock = locked.new_qty > 0
+            FROM locked, check_all
+            WHERE products.id = locked.id AND (check_all.ok OR NOT :require_available)
+            RETURNING products.id, products.stock_quantity
+        )
+        SELECT check_all.ok, updated.id, updated.stock_quantity
+        FROM check_all LEFT JOIN updated ON TRUE
+    """)
+    rows = db.execute(stmt, params).all()
+    if require_available and not rows[0][0]:
+        return None
+    result = {product_id: qty for _, product_id, qty in rows if product_id is not None}
+
+    # Keep Product objects already loaded in this session in step with the table
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, Product) and obj.id in result:
+            db.expire(obj, ["stock_quantity", "in_stock"])
     return result
 
 
+def _apply_stock_deltas_locked(
+    db: Session, deltas: Dict[int, int], require_available: bool, managed_only: bool
+) -> Optional[Dict[int, int]]:
+    query = db.query(Product).filter(Product.id.in_(deltas))
+    if managed_only:
+        query = query.filter(Product.manage_stock == True)
+    products = query.order_by(Product.id).with_for_update().all()
+    if require_available and any((p.stock_quantity or 0) + deltas[p.id] < 0 for p in products):
+        return None
+    for product in products:
+        product.stock_quantity = (product.stock_quantity or 0) + deltas[product.id]
+        product.in_stock = product.stock_quantity > 0
+    db.flush()
+    return {product.id: product.stock_quantity for product in products}
+
+
+def apply_stock_deltas(
+    db: Session,
+    deltas: Dict[int, int],
+    require_available: bool = False,
+    managed_only: bool = True,
+) -> Optional[Dict[int, int]]:
+    """
+    Add deltas[product_id] to each product's stock_quantity and refresh in_stock, atomically.
+
+    Only products with manage_stock=True change unless managed_only=False.
+    With require_available, nothing changes unless every product can cover its
+    (negative) delta, and None is returned. Otherwise returns
+    {product_id: new stock_quantity} for the products changed.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+    if db.get_bind().dialect.name == "postgresql":
+        changed = _apply_stock_deltas_postgres(db, deltas, require_available, managed_only)
+    else:
+        changed = _apply_stock_deltas_locked(db, deltas, require_available, managed_only)
+    if changed:
+        bump_stock_version_after_commit(db)
+    return changed
+
+
+def _insert_movements(db: Session, movements: List[dict]) -> None:
+    if movements:
+        db.execute(insert(StockMovement), movements)
+
+
 def check_stock_availability(db: Session, project_id: int) -> Tuple[bool, List[str]]:
     """
     Check if sufficient stock exists for project acceptance.
@@ -66,17 +196,7 @@ def check_stock_availability(db: Session, project_id: int) -> Tuple[bool, List[s
     if not items:
         return True, []  # No stock-tracked items, no issue
 
-    errors = []
-    for item, qty in items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product:
-            continue
-        if product.stock_quantity < qty:
-            errors.append(
-                f"Insufficient stock for '{product.name or product.model or product.brand or 'Product'}': "
-                f"required {qty}, available {product.stock_quantity}"
-            )
-
+    errors = _shortage_errors(db, _totals((product_id, qty) for _, product_id, qty in items))
     return len(errors) == 0, errors
 
 
@@ -86,40 +206,36 @@ def deduct_stock_on_project_accept(
     user_id: Optional[int] = None
 ) -> Tuple[bool, List[str]]:
     """
-    Deduct stock when project status changes to ACCEPTED.
+    Check availability and deduct stock when project status changes to ACCEPTED.
+    Nothing is deducted unless every product has enough stock.
     Returns (success, list of error messages).
     """
-    ok, errors = check_stock_availability(db, project_id)
-    if not ok:
-        return False, errors
-
     quote = _get_quote_for_project(db, project_id)
     if not quote:
-        return False, ["No quote found for stock deduction"]
-
-    # Auto-set quote to ACCEPTED when project is accepted
-    quote.status = QuoteStatus.ACCEPTED
+        return False, ["No accepted or sent quote found for this project. Create and send a quote first."]
 
     items = _items_for_stock_deduction(db, quote.id)
-    for item, qty in items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product:
-            continue
+    required = _totals((product_id, qty) for _, product_id, qty in items)
+    changed = apply_stock_deltas(db, {product_id: -qty for product_id, qty in required.items()}, require_available=True)
+    if changed is None:
+        return False, _shortage_errors(db, required)
 
-        product.stock_quantity = max(0, product.stock_quantity - qty)
-        product.in_stock = product.stock_quantity > 0
-
-        movement = StockMovement(
-            product_id=product.id,
-            quantity=-qty,
-            movement_type=StockMovementType.DEDUCTION_ON_ACCEPT,
-            project_id=project_id,
-            quote_id=quote.id,
-            quote_item_id=item.id,
-            created_by=user_id
-        )
-        db.add(movement)
+    # Auto-set quote to ACCEPTED when project is accepted
+    quote.status = QuoteStatus.ACCEPTED
 
+    _insert_movements(db, [
+        {
+            "product_id": product_id,
+            "quantity": -qty,
+            "movement_type": StockMovementType.DEDUCTION_ON_ACCEPT,
+            "project_id": project_id,
+            "quote_id": quote.id,
+            "quote_item_id": item_id,
+            "created_by": user_id,
+        }
+        for item_id, product_id, qty in items
+        if product_id in changed
+    ])
     return True, []
 
 
@@ -130,83 +246,87 @@ def restore_stock_on_project_reject(
 ) -> bool:
     """
     Restore stock when project status changes from ACCEPTED to REJECTED.
-    Reverses previous deductions for this project.
+    Reverses this project's deductions not already restored, so repeated
+    accept/reject cycles never restore the same units twice.
     Returns True if any stock was restored.
     """
-    # Find deductions for this project
-    deductions = db.query(StockMovement).filter(
+    net = func.sum(StockMovement.quantity)
+    outstanding = db.query(
+        StockMovement.product_id, StockMovement.quote_id, StockMovement.quote_item_id, net
+    ).filter(
         StockMovement.project_id == project_id,
-        StockMovement.movement_type == StockMovementType.DEDUCTION_ON_ACCEPT,
-        StockMovement.quantity < 0
-    ).all()
-
-    if not deductions:
+        StockMovement.movement_type.in_([
+            StockMovementType.DEDUCTION_ON_ACCEPT, StockMovementType.RESTORE_ON_REJECT
+        ]),
+    ).group_by(
+        StockMovement.product_id, StockMovement.quote_id, StockMovement.quote_item_id
+    ).having(net < 0).all()
+
+    if not outstanding:
         return False
 
-    for mov in deductions:
-        product = db.query(Product).filter(Product.id == mov.product_id).first()
-        if not product:
-            continue
-
-        restore_qty = abs(mov.quantity)
-        product.stock_quantity = product.stock_quantity + restore_qty
-        product.in_stock = True
-
-        restore_mov = StockMovement(
-            product_id=product.id,
-            quantity=restore_qty,
-            movement_type=StockMovementType.RESTORE_ON_REJECT,
-            project_id=project_id,
-            quote_id=mov.quote_id,
-            quote_item_id=mov.quote_item_id,
-            created_by=user_id
-        )
-        db.add(restore_mov)
-
-    return True
+    changed = apply_stock_deltas(
+        db,
+        _totals((product_id, -quantity) for product_id, _, _, quantity in outstanding),
+        managed_only=False,
+    )
+    _insert_movements(db, [
+        {
+            "product_id": product_id,
+            "quantity": -quantity,
+            "movement_type": StockMovementType.RESTORE_ON_REJECT,
+            "project_id": project_id,
+            "quote_id": quote_id,
+            "quote_item_id": quote_item_id,
+            "created_by": user_id,
+        }
+        for product_id, quote_id, quote_item_id, quantity in outstanding
+        if product_id in changed
+    ])
+    return bool(changed)
 
 
 def deduct_stock_on_order_paid(db: Session, order_id: int) -> bool:
     """
     Deduct stock when an e-commerce order payment is completed.
-    Idempotent: skips if already deducted for this order.
+    Idempotent: skips if already deducted for this order (the order row is
+    locked first, so concurrent webhook/verify calls deduct once).
+    Payment is already taken, so stock may go negative rather than fail.
     Returns True if any stock was deducted.
     """
-    from app.models_ecommerce import Order
+    from app.models_ecommerce import Order, OrderItem
+
+    if db.query(Order.id).filter(Order.id == order_id).with_for_update().first() is None:
+        return False
 
-    existing = db.query(StockMovement).filter(
+    existing = db.query(StockMovement.id).filter(
         StockMovement.order_id == order_id,
         StockMovement.movement_type == StockMovementType.DEDUCTION_ECOM_ORDER
     ).first()
     if existing:
         return False  # Already deducted for this order
 
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order or not order.items:
+    lines = [
+        (product_id, _stock_qty(quantity))
+        for product_id, quantity in db.query(OrderItem.product_id, OrderItem.quantity).filter(
+            OrderItem.order_id == order_id, OrderItem.product_id.isnot(None)
+        ).order_by(OrderItem.id)
+    ]
+    if not lines:
         return False
 
-    deducted = False
-    for item in order.items:
-        if not item.product_id:
-            continue
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product or not product.manage_stock:
-            continue
-
-        qty = max(1, int(math.ceil(item.quantity)))
-        product.stock_quantity = product.stock_quantity - qty
-        product.in_stock = product.stock_quantity > 0
-
-        movement = StockMovement(
-            product_id=product.id,
-            quantity=-qty,
-            movement_type=StockMovementType.DEDUCTION_ECOM_ORDER,
-            project_id=None,
-            quote_id=None,
-            order_id=order_id,
-            created_by=None
-        )
-        db.add(movement)
-        deducted = True
-
-    return deducted
+    changed = apply_stock_deltas(db, {product_id: -qty for product_id, qty in _totals(lines).items()})
+    _insert_movements(db, [
+        {
+            "product_id": product_id,
+            "quantity": -qty,
+            "movement_type": StockMovementType.DEDUCTION_ECOM_ORDER,
+            "project_id": None,
+            "quote_id": None,
+            "order_id": order_id,
+            "created_by": None,
+        }
+        for product_id, qty in lines
+        if product_id in changed
+    ])
+    return bool(changed)
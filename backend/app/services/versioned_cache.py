@@ -0,0 +1,59 @@
+"""
+Versioned in-process cache
+
+Holds one immutable snapshot built by a loader function. Writers call
+``bump()`` after committing a change so the next reader rebuilds. Each worker
+process has its own copy, so snapshots also expire after ``max_age_sec`` to
+pick up writes made through another worker or a script.
+"""
+import time
+from threading import Lock
+from typing import Callable, Generic, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+
+class VersionedCache(Generic[T]):
+    """Version-counter cache around a ``loader(db) -> snapshot`` function."""
+
+    def __init__(self, loader: Callable[[Session], T], max_age_sec: float = 60.0):
+        self._loader = loader
+        self._max_age_sec = max_age_sec
+        self._lock = Lock()
+        self._version = 0
+        # (version, loaded_at, snapshot)
+        self._entry: Optional[Tuple[int, float, T]] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump(self) -> int:
+        """Invalidate the current snapshot. Returns the new version."""
+        with self._lock:
+            self._version += 1
+            return self._version
+
+    def get(self, db: Session) -> T:
+        """Current snapshot; reloads only when the version changed or it aged out."""
+        entry = self._entry
+        now = time.monotonic()
+        if entry is not None and entry[0] == self._version and now - entry[1] < self._max_age_sec:
+            return entry[2]
+
+        version = self._version
+        snapshot = self._loader(db)
+        with self._lock:
+            # Don't overwrite a snapshot loaded concurrently for a newer version
+            if self._entry is None or self._entry[0] <= version:
+                self._entry = (version, now, snapshot)
+        return snapshot
+
+    def peek(self) -> Optional[T]:
+        """Snapshot if loaded and current, without touching the database."""
+        entry = self._entry
+        if entry is not None and entry[0] == self._version and time.monotonic() - entry[1] < self._max_age_sec:
+            return entry[2]
+        return None
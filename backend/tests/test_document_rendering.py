@@ -0,0 +1,70 @@
+"""Document rendering: escaped previews and the memoized company logo lookup"""
+from pathlib import Path
+from types import SimpleNamespace
+
+from app.services import document_rendering
+from app.services.appliance_pdf_generator import render_appliance_report
+from app.services.quote_document import CompanyProfile
+from app.services.settings_cache import bump_settings_version
+
+SCRIPT = "<script>alert(1)</script>"
+
+
+def _company(name="Energy Precisions"):
+    return CompanyProfile(
+        name=name, address=None, phone=None, email=None, logo_url=None,
+        bank_name="", account_name="", account_number="", bank_branch="", swift_code="",
+    )
+
+
+def _customer(name):
+    return SimpleNamespace(name=name, address=None, city=None, country=None, email=None, phone=None)
+
+
+def _appliance(description):
+    return SimpleNamespace(
+        category="lighting", appliance_type="led_bulb", description=description,
+        power_value=10, power_unit="W", quantity=1, hours_per_day=5,
+        daily_kwh=0.05, is_essential=True,
+    )
+
+
+def test_appliance_report_preview_escapes_customer_name():
+    project = SimpleNamespace(name="Project", reference_code="REF-1")
+    html = render_appliance_report(project, _customer(SCRIPT), [], _company()).standalone_html()
+
+    assert SCRIPT not in html
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in html
+
+
+def test_appliance_report_preview_escapes_row_and_company_values():
+    project = SimpleNamespace(name="<img src=x onerror=alert(1)>", reference_code="REF-1")
+    document = render_appliance_report(project, _customer("Ama"), [_appliance(SCRIPT)], _company(SCRIPT))
+    html = document.standalone_html()
+
+    assert "<script>" not in html
+    assert "<img src=x" not in html
+    # Template markup itself is untouched
+    assert "<table" in html and "<style>" in html
+
+
+def test_logo_lookup_sees_a_logo_added_after_a_settings_bump(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert document_rendering.find_company_logo(None) is None
+
+    (tmp_path / "static").mkdir()
+    (tmp_path / "static" / "logo.jpg").write_bytes(b"\xff\xd8\xff")
+    assert document_rendering.find_company_logo(None) is None  # Still memoized
+
+    bump_settings_version()  # What POST /settings/upload-logo does
+    assert document_rendering.find_company_logo(None) == Path("static/logo.jpg")
+
+
+def test_logo_lookup_expires_without_a_settings_bump(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(document_rendering, "LOGO_LOOKUP_MAX_AGE_SEC", 0.0)
+    assert document_rendering.find_company_logo(None) is None
+
+    (tmp_path / "static").mkdir()
+    (tmp_path / "static" / "logo.png").write_bytes(b"\x89PNG")
+    assert document_rendering.find_company_logo(None) == Path("static/logo.png")
@@ -0,0 +1,37 @@
+"""Outage autonomy capacities cover the target share of all trials, infeasible ones included"""
+from app.services.energy_simulation import SimulationParams
+from app.services.outage_autonomy import OutageDistribution, run_outage_analysis
+
+# Outages may start on an empty battery; with no PV those trials fail at any capacity
+EMPTY_START = OutageDistribution(initial_soc_min=0.0)
+
+
+def _analyze(target_percentile, battery_kwh=None):
+    return run_outage_analysis(
+        essential_daily_kwh=20.0,
+        pv_kw=0.0,
+        peak_sun_hours=5.0,
+        battery_kwh=battery_kwh,
+        params=SimulationParams(),
+        distribution=EMPTY_START,
+        trials=5000,
+        target_percentile=target_percentile,
+        seed=1,
+    )
+
+
+def test_target_beyond_feasible_share_is_unreachable():
+    result = _analyze(0.95)
+
+    assert result["infeasible_share"] > 0.05
+    assert result["target_unreachable"] is True
+    assert result["required_capacity_kwh"] is None
+    assert result["recommended_capacity_kwh"] is None
+
+
+def test_recommendation_meets_target_over_all_trials():
+    result = _analyze(0.8)
+
+    assert result["target_unreachable"] is False
+    recommended = result["recommended_capacity_kwh"]
+    assert _analyze(0.8, battery_kwh=recommended)["ride_through_probability"] >= 0.8
@@ -0,0 +1,182 @@
+"""PaystackService against a local stub server (PAYSTACK_BASE_URL): timeouts, breaker, verify cache"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.config import settings
+from app.services.paystack_service import PaystackError, PaystackService, PaystackUnavailable
+
+
+class StubPaystack:
+    """Answers every request with the configured (status, body) after an optional delay."""
+
+    def __init__(self):
+        self.status = 200
+        self.body = {"status": True, "data": {"status": "success"}}
+        self.delay_sec = 0.0
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                stub.hits += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                if stub.delay_sec:
+                    time.sleep(stub.delay_sec)
+                payload = json.dumps(stub.body).encode("utf-8")
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = _respond
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubPaystack()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def paystack(stub, monkeypatch):
+    monkeypatch.setattr(settings, "PAYSTACK_BASE_URL", stub.url)
+    monkeypatch.setattr(settings, "PAYSTACK_SECRET_KEY", "sk_test_stub")
+    monkeypatch.setattr(settings, "PAYSTACK_CONNECT_TIMEOUT_SEC", 1.0)
+    monkeypatch.setattr(settings, "PAYSTACK_READ_TIMEOUT_SEC", 0.3)
+    monkeypatch.setattr(settings, "PAYSTACK_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(settings, "PAYSTACK_BREAKER_RESET_SEC", 0.3)
+    monkeypatch.setattr(settings, "PAYSTACK_VERIFY_CACHE_SEC", 60.0)
+    monkeypatch.setattr(settings, "PAYSTACK_VERIFY_PENDING_CACHE_SEC", 0.3)
+    service = PaystackService()
+    yield service
+    service.close()
+
+
+def test_read_timeout_raises_unavailable_and_counts_against_breaker(stub, paystack):
+    stub.delay_sec = 1.0
+
+    started = time.monotonic()
+    with pytest.raises(PaystackUnavailable):
+        paystack.create_customer("a@example.com")
+
+    assert time.monotonic() - started < 0.9
+    assert paystack.breaker._failures == 1
+
+
+def test_breaker_opens_after_consecutive_5xx_and_fails_fast(stub, paystack):
+    stub.status = 503
+    for _ in range(2):
+        with pytest.raises(PaystackUnavailable):
+            paystack.create_customer("a@example.com")
+    assert paystack.breaker.state == "open"
+
+    hits = stub.hits
+    with pytest.raises(PaystackUnavailable):
+        paystack.create_customer("a@example.com")
+    assert stub.hits == hits  # Short-circuited, Paystack not called
+
+
+def test_half_open_trial_closes_on_success_and_reopens_on_failure(stub, paystack):
+    stub.status = 500
+    for _ in range(2):
+        with pytest.raises(PaystackUnavailable):
+            paystack.create_customer("a@example.com")
+
+    time.sleep(0.35)
+    assert paystack.breaker.state == "half-open"
+    with pytest.raises(PaystackUnavailable):
+        paystack.create_customer("a@example.com")  # Failed trial
+    assert paystack.breaker.state == "open"
+
+    time.sleep(0.35)
+    stub.status = 200
+    assert paystack.create_customer("a@example.com")["status"] is True
+    assert paystack.breaker.state == "closed"
+
+
+def test_half_open_allows_a_single_trial(stub, paystack):
+    stub.status = 500
+    for _ in range(2):
+        with pytest.raises(PaystackUnavailable):
+            paystack.create_customer("a@example.com")
+    time.sleep(0.35)
+
+    stub.status, stub.delay_sec = 200, 0.2
+    trial = threading.Thread(target=paystack.create_customer, args=("a@example.com",))
+    trial.start()
+    time.sleep(0.05)
+    with pytest.raises(PaystackUnavailable):
+        paystack.create_customer("b@example.com")  # Trial still in flight
+    trial.join()
+    assert paystack.breaker.state == "closed"
+
+
+def test_unexpected_error_during_trial_releases_it(stub, paystack, monkeypatch):
+    stub.status = 500
+    for _ in range(2):
+        with pytest.raises(PaystackUnavailable):
+            paystack.create_customer("a@example.com")
+    time.sleep(0.35)
+
+    def broken_request(*args, **kwargs):
+        raise RuntimeError("not a requests error")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(paystack.session, "request", broken_request)
+        with pytest.raises(RuntimeError):
+            paystack.create_customer("a@example.com")
+
+    stub.status = 200
+    assert paystack.create_customer("a@example.com")["status"] is True
+    assert paystack.breaker.state == "closed"
+
+
+def test_4xx_raises_paystack_error_without_tripping_breaker(stub, paystack):
+    stub.status, stub.body = 400, {"status": False, "message": "Invalid key"}
+    for _ in range(3):
+        with pytest.raises(PaystackError) as excinfo:
+            paystack.create_customer("a@example.com")
+        assert not isinstance(excinfo.value, PaystackUnavailable)
+
+    assert paystack.breaker.state == "closed"
+    assert stub.hits == 3
+
+
+def test_verify_caches_success_for_the_long_ttl(stub, paystack):
+    first = paystack.verify_transaction("ref-ok")
+    time.sleep(0.35)  # Past the pending TTL
+    assert paystack.verify_transaction("ref-ok") == first
+    assert stub.hits == 1
+
+
+def test_verify_caches_pending_for_the_short_ttl(stub, paystack):
+    stub.body = {"status": True, "data": {"status": "pending"}}
+    paystack.verify_transaction("ref-pending")
+    paystack.verify_transaction("ref-pending")
+    assert stub.hits == 1
+
+    time.sleep(0.35)
+    stub.body = {"status": True, "data": {"status": "success"}}
+    assert paystack.verify_transaction("ref-pending")["data"]["status"] == "success"
+    assert stub.hits == 2
@@ -23,6 +23,7 @@ import { useNavigate } from 'react-router-dom';
 import { useCart } from '../../contexts/CartContext';
 import api from '../../services/api';
 import { catalogLineUnitPrice } from '../../utils/catalogPrice';
+import { newIdempotencyKey } from '../../utils/idempotencyKey';
 import { Seo } from '../../components/Seo';
 import { trackBeginCheckout } from '../../utils/analytics';
 
@@ -98,6 +99,8 @@ const Checkout: React.FC = () => {
   const [couponError, setCouponError] = useState<string | null>(null);
   const [couponApplying, setCouponApplying] = useState(false);
   const beginCheckoutTracked = useRef(false);
+  // Same order details resubmitted (double tap, retry after a dropped connection) reuse the key
+  const orderAttempt = useRef<{ payload: string; key: string } | null>(null);
 
   useEffect(() => {
     if (!appliedCouponCode.trim() || cartTotal <= 0) {
@@ -270,13 +273,22 @@ const Checkout: React.FC = () => {
         payment_method: paymentMethod === 'paystack' ? 'paystack' : 'cod',
       };
 
-      const orderResponse = await api.post('/ecommerce/orders', orderData);
+      const payload = JSON.stringify(orderData);
+      if (orderAttempt.current?.payload !== payload) {
+        orderAttempt.current = { payload, key: newIdempotencyKey() };
+      }
+      const idempotencyKey = orderAttempt.current.key;
+
+      const orderResponse = await api.post('/ecommerce/orders', orderData, {
+        headers: { 'Idempotency-Key': idempotencyKey },
+      });
       const order = orderResponse.data;
 
       if (paymentMethod === 'paystack') {
         // Initialize Paystack payment
         const paymentResponse = await api.post(`/payments/paystack/initialize`, null, {
           params: { order_id: order.id },
+          headers: { 'Idempotency-Key': `${idempotencyKey}:paystack` },
         });
 
         const { authorization_url } = paymentResponse.data;
@@ -108,12 +108,8 @@ const Shop: React.FC = () => {
     { value: 'Accessories', label: 'Accessories' },
   ];
 
+  // Search is matched and ranked by the API (typo tolerant), so results are not re-filtered by substring here
   const filteredProducts = products.filter((product: any) => {
-    if (searchTerm) {
-      const matchesSearch = (product.name || product.brand || '').toLowerCase().includes(searchTerm.toLowerCase()) ||
-        (product.description || '').toLowerCase().includes(searchTerm.toLowerCase());
-      if (!matchesSearch) return false;
-    }
     if (categoryFilter !== 'all') {
       return product.product_type === categoryFilter || product.category === categoryFilter;
     }
@@ -402,7 +398,12 @@ const Shop: React.FC = () => {
                           overflow: 'hidden',
                         }}
                       >
-                        {product.short_description || product.description || 'Premium quality solar equipment'}
+                        {product.search_snippet ? (
+                          // Escaped by the API; only <mark> highlights are markup
+                          <span dangerouslySetInnerHTML={{ __html: product.search_snippet }} />
+                        ) : (
+                          product.short_description || product.description || 'Premium quality solar equipment'
+                        )}
                       </Typography>
 
                       {/* Features */}